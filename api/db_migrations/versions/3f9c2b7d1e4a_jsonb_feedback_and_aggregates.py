@@ -0,0 +1,89 @@
+"""jsonb feedback and experiment feedback aggregates
+
+Revision ID: 3f9c2b7d1e4a
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2b7d1e4a'
+down_revision: Union[str, None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+JSON_TO_JSONB_COLUMNS = [
+    ('feedbacks', 'feedback_json'),
+    ('queries', 'references'),
+    ('queries', 'experiment_responses'),
+]
+
+
+def upgrade() -> None:
+    for table, column in JSON_TO_JSONB_COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=postgresql.JSONB(astext_type=sa.Text()),
+            postgresql_using=f'"{column}"::jsonb',
+        )
+
+    op.create_index(
+        'ix_feedbacks_configuration_feedbacks', 'feedbacks',
+        [sa.text("(feedback_json -> 'experiment_feedback' -> 'configuration_feedbacks')")],
+        postgresql_using='gin',
+    )
+    op.create_index(
+        'ix_queries_experiment_responses', 'queries', ['experiment_responses'],
+        postgresql_using='gin',
+        postgresql_ops={'experiment_responses': 'jsonb_path_ops'},
+    )
+
+    op.create_table('experiment_feedback_aggregates',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('experiment_id', sa.Uuid(), nullable=False),
+    sa.Column('configuration_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('field_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['experiment_id'], ['experiments.experiment_id'], ),
+    sa.PrimaryKeyConstraint('experiment_id', 'configuration_id', 'field_id', 'value')
+    )
+
+    # Backfill the aggregates from the feedback saved so far
+    op.execute("""
+        INSERT INTO experiment_feedback_aggregates
+            (created_at, updated_at, experiment_id, configuration_id, field_id, value, count)
+        SELECT now(), now(), q.experiment_id, c.key, v ->> 'field_id', (v ->> 'value')::int, count(*)
+        FROM feedbacks f
+        JOIN queries q ON q.query_id = f.query_id
+        CROSS JOIN LATERAL jsonb_each(f.feedback_json -> 'experiment_feedback' -> 'configuration_feedbacks') c
+        CROSS JOIN LATERAL jsonb_array_elements(c.value) v
+        WHERE q.experiment_id IS NOT NULL
+          AND jsonb_typeof(f.feedback_json -> 'experiment_feedback' -> 'configuration_feedbacks') = 'object'
+          AND jsonb_typeof(c.value) = 'array'
+          -- Integral values only, like the counts kept by the API
+          AND jsonb_typeof(v -> 'value') = 'number'
+          AND (v ->> 'value') ~ '^-?[0-9]+$'
+        GROUP BY q.experiment_id, c.key, v ->> 'field_id', (v ->> 'value')::int
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('experiment_feedback_aggregates')
+    op.drop_index('ix_queries_experiment_responses', table_name='queries')
+    op.drop_index('ix_feedbacks_configuration_feedbacks', table_name='feedbacks')
+
+    for table, column in JSON_TO_JSONB_COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.JSON(),
+            postgresql_using=f'"{column}"::json',
+        )
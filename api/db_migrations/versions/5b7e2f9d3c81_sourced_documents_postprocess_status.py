@@ -0,0 +1,33 @@
+"""sourced documents postprocess status
+
+Revision ID: 5b7e2f9d3c81
+Revises: 8e1d4c6a9b27
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2f9d3c81'
+down_revision: Union[str, None] = '8e1d4c6a9b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sourced_documents', sa.Column('postprocess_status', sqlmodel.sql.sqltypes.AutoString(), nullable=False, server_default='pending'))
+    op.add_column('sourced_documents', sa.Column('postprocess_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('sourced_documents', sa.Column('postprocessed_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_sourced_documents_relevant_postprocess_status', 'sourced_documents', ['postprocess_status'], postgresql_where=sa.text('is_relevant'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sourced_documents_relevant_postprocess_status', table_name='sourced_documents')
+    op.drop_column('sourced_documents', 'postprocessed_at')
+    op.drop_column('sourced_documents', 'postprocess_error')
+    op.drop_column('sourced_documents', 'postprocess_status')
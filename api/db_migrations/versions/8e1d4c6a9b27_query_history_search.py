@@ -0,0 +1,48 @@
+"""query history search
+
+Revision ID: 8e1d4c6a9b27
+Revises: 3f9c2b7d1e4a
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '8e1d4c6a9b27'
+down_revision: Union[str, None] = '3f9c2b7d1e4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.add_column('queries', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "to_tsvector('english', coalesce(question, '') || ' ' || coalesce(summary, ''))",
+            persisted=True,
+        ),
+        nullable=True,
+    ))
+
+    op.create_index('ix_queries_user_id_created_at', 'queries', ['user_id', 'created_at'])
+    op.create_index('ix_queries_search_vector', 'queries', ['search_vector'], postgresql_using='gin')
+    op.create_index(
+        'ix_queries_question_trgm', 'queries', ['question'],
+        postgresql_using='gin',
+        postgresql_ops={'question': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_queries_question_trgm', table_name='queries')
+    op.drop_index('ix_queries_search_vector', table_name='queries')
+    op.drop_index('ix_queries_user_id_created_at', table_name='queries')
+    op.drop_column('queries', 'search_vector')
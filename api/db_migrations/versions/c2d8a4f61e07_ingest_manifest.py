@@ -0,0 +1,39 @@
+"""ingest manifest
+
+Revision ID: c2d8a4f61e07
+Revises: 5b7e2f9d3c81
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d8a4f61e07'
+down_revision: Union[str, None] = '5b7e2f9d3c81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ingest_manifest',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('doc_id', sa.Uuid(), nullable=False),
+    sa.Column('stage', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('input_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('inputs', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('code_version', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('output_location', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('output_hash', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.ForeignKeyConstraint(['doc_id'], ['sourced_documents.doc_id'], ),
+    sa.PrimaryKeyConstraint('stage', 'doc_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ingest_manifest')
@@ -0,0 +1,28 @@
+"""sourced documents natural key indexes
+
+Revision ID: e71b3a9c5d24
+Revises: c2d8a4f61e07
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e71b3a9c5d24'
+down_revision: Union[str, None] = 'c2d8a4f61e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sourced_documents_page_link', 'sourced_documents', ['page_link'])
+    op.create_index('ix_sourced_documents_doi', 'sourced_documents', ['doi'])
+    op.create_index('ix_source_links_doc_id_link', 'source_links', ['doc_id', 'link'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_source_links_doc_id_link', table_name='source_links')
+    op.drop_index('ix_sourced_documents_doi', table_name='sourced_documents')
+    op.drop_index('ix_sourced_documents_page_link', table_name='sourced_documents')
@@ -0,0 +1,149 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+import gzip
+import json
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+
+from server.core.retrieval_backends import SEARCH_PAYLOAD_FIELDS, EmbeddedIndex, embedded_index_dir
+
+SCROLL_BATCH_SIZE = 1000
+
+
+def __select_vector(vector, vector_name: Optional[str]) -> list[float]:
+    if isinstance(vector, dict):
+        if vector_name is None:
+            raise ValueError(f"Collection has named vectors {list(vector)}, pass --vector_name")
+        return vector[vector_name]
+    return vector
+
+
+def __select_distance(vectors_config: dict, vector_name: Optional[str]) -> str:
+    if "size" not in vectors_config:
+        vectors_config = vectors_config[vector_name]
+    return vectors_config["distance"]
+
+
+def __points_from_qdrant(collection: str) -> tuple[dict, Iterator[tuple]]:
+    from server.core.experiment_runner import get_vectordb_client
+
+    client = get_vectordb_client()
+    vectors_config = client.get_collection(collection).config.params.vectors
+    if isinstance(vectors_config, dict):
+        vectors_config = {name: params.model_dump() for name, params in vectors_config.items()}
+    else:
+        vectors_config = vectors_config.model_dump()
+
+    def points():
+        offset = None
+        while True:
+            batch, offset = client.scroll(
+                collection_name=collection,
+                limit=SCROLL_BATCH_SIZE,
+                offset=offset,
+                with_payload=SEARCH_PAYLOAD_FIELDS,
+                with_vectors=True,
+            )
+            for point in batch:
+                yield point.id, point.vector, point.payload
+            if offset is None:
+                break
+
+    return vectors_config, points()
+
+
+def __points_from_snapshot(snapshot_path: str, collection: str) -> tuple[dict, Iterator[tuple]]:
+    """Points of one collection of a develop/load_test.py snapshot."""
+    f = gzip.open(snapshot_path, "rt")
+    for line in f:
+        record = json.loads(line)
+        if record.get("collection") == collection:
+            vectors_config = record["vectors_config"]
+            break
+    else:
+        raise ValueError(f"Collection '{collection}' not found in {snapshot_path}")
+
+    def points():
+        with f:
+            for line in f:
+                record = json.loads(line)
+                if "collection" in record:
+                    break
+                yield record["id"], record["vector"], record["payload"]
+
+    return vectors_config, points()
+
+
+def __export(collection: str, vectors_config: dict, points: Iterator[tuple],
+             vector_name: Optional[str], output_dir: str):
+    distance = __select_distance(vectors_config, vector_name)
+    if distance not in ("Cosine", "Dot"):
+        raise ValueError(f"Unsupported distance '{distance}' for an embedded index")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Payloads are written as they come, with the offset of each line
+    ids, vectors, payload_offsets = [], [], [0]
+    with open(os.path.join(output_dir, "payloads.jsonl"), "wb") as f:
+        for point_id, vector, payload in points:
+            ids.append(point_id)
+            vectors.append(__select_vector(vector, vector_name))
+            line = json.dumps({k: payload[k] for k in SEARCH_PAYLOAD_FIELDS if k in payload}).encode("utf-8") + b"\n"
+            f.write(line)
+            payload_offsets.append(payload_offsets[-1] + len(line))
+
+    vectors = np.array(vectors, dtype=np.float32)
+    if distance == "Cosine":
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    np.save(os.path.join(output_dir, "vectors.npy"), vectors)
+    np.save(os.path.join(output_dir, "payload_offsets.npy"), np.array(payload_offsets, dtype=np.int64))
+    with open(os.path.join(output_dir, "ids.json"), "w") as f:
+        json.dump(ids, f)
+    with open(os.path.join(output_dir, "meta.json"), "w") as f:
+        json.dump({"collection": collection, "distance": distance, "size": int(vectors.shape[1])}, f)
+
+    print(f"Exported {len(ids)} points of {collection} to {output_dir} "
+          f"({vectors.nbytes / 1024 ** 2:.1f} MiB of vectors)")
+    return vectors
+
+
+def __benchmark(output_dir: str, vectors: np.ndarray, limit: int, queries: int = 200):
+    index = EmbeddedIndex(output_dir)
+    rng = np.random.default_rng(42)
+    query_vectors = vectors[rng.integers(0, len(vectors), queries)]
+
+    started_at = time.perf_counter()
+    for query_vector in query_vectors:
+        index.search(query_vector.tolist(), limit)
+    latency = (time.perf_counter() - started_at) * 1000 / queries
+    print(f"Search latency: {latency:.3f} ms/query (top {limit})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Export a Qdrant collection for the API's embedded retrieval backend."
+    )
+    parser.add_argument('collection', type=str, help="Collection name, as used in configurations")
+    parser.add_argument('--snapshot', type=str,
+                        help="Read the points from a develop/load_test.py snapshot instead of Qdrant")
+    parser.add_argument('--vector_name', type=str, help="Vector to export for named-vector collections")
+    parser.add_argument('--limit', type=int, default=3, help="Top k used for the latency check")
+
+    args = parser.parse_args()
+
+    if args.snapshot:
+        vectors_config, points = __points_from_snapshot(args.snapshot, args.collection)
+    else:
+        vectors_config, points = __points_from_qdrant(args.collection)
+
+    output_dir = embedded_index_dir(args.collection)
+    vectors = __export(args.collection, vectors_config, points, args.vector_name, output_dir)
+    __benchmark(output_dir, vectors, args.limit)
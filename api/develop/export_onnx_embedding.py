@@ -0,0 +1,165 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+import json
+import random
+import shutil
+import time
+
+import numpy as np
+
+from server.core.embedding_backends import POOLING_CONFIG, EmbeddingBackend, load_embedding_model, onnx_model_dir, onnx_pooling
+
+
+def __export_fp32(model_name: str, output_dir: str):
+    from llama_index.embeddings.huggingface_optimum import OptimumEmbedding
+
+    OptimumEmbedding.create_and_save_optimum_model(model_name, output_dir)
+
+
+def __export_int8(fp32_dir: str, output_dir: str, arm64: bool):
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    if arm64:
+        quantization_config = AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    else:
+        quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+
+    quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+    quantizer.quantize(save_dir=output_dir, quantization_config=quantization_config)
+    AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(output_dir)
+
+
+def __copy_pooling_config(model_name: str, output_dirs: list[str]):
+    """Copy the sentence-transformers pooling config of the model, the ONNX export doesn't include it."""
+    if os.path.isdir(model_name):
+        config_path = os.path.join(model_name, POOLING_CONFIG)
+    else:
+        from huggingface_hub import hf_hub_download
+
+        config_path = hf_hub_download(model_name, POOLING_CONFIG.replace(os.sep, "/"))
+
+    for output_dir in output_dirs:
+        os.makedirs(os.path.join(output_dir, os.path.dirname(POOLING_CONFIG)), exist_ok=True)
+        shutil.copyfile(config_path, os.path.join(output_dir, POOLING_CONFIG))
+
+
+def __read_eval_texts(eval_set_path: str, sample_size: int) -> tuple[list[str], list[str]]:
+    with open(eval_set_path) as f:
+        dataset = json.load(f)
+
+    queries = list(dataset["queries"].values())
+    corpus = list(dataset["corpus"].values())
+
+    rng = random.Random(42)
+    return (
+        rng.sample(queries, min(sample_size, len(queries))),
+        rng.sample(corpus, min(sample_size, len(corpus))),
+    )
+
+
+def __embed(model, texts: list[str]) -> np.ndarray:
+    embeddings = np.array(model.get_text_embedding_batch(texts), dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def __query_latency_ms(model, queries: list[str]) -> float:
+    started_at = time.perf_counter()
+    for query in queries:
+        model.get_query_embedding(query)
+    return (time.perf_counter() - started_at) * 1000 / len(queries)
+
+
+def __validate(model_name: str, backends: list[EmbeddingBackend], eval_set_path: str,
+               sample_size: int, top_k: int, min_cosine: float) -> bool:
+    queries, corpus = __read_eval_texts(eval_set_path, sample_size)
+
+    reference_model = load_embedding_model(model_name, EmbeddingBackend.HUGGINGFACE)
+    reference_queries = __embed(reference_model, queries)
+    reference_corpus = __embed(reference_model, corpus)
+    reference_top_k = np.argsort(-reference_queries @ reference_corpus.T, axis=1)[:, :top_k]
+    reference_latency = __query_latency_ms(reference_model, queries[:100])
+
+    print(f"{EmbeddingBackend.HUGGINGFACE.value}: {reference_latency:.1f} ms/query")
+
+    all_valid = True
+
+    for backend in backends:
+        model = load_embedding_model(model_name, backend)
+        backend_queries = __embed(model, queries)
+        backend_corpus = __embed(model, corpus)
+
+        cosines = np.concatenate([
+            np.sum(reference_queries * backend_queries, axis=1),
+            np.sum(reference_corpus * backend_corpus, axis=1),
+        ])
+
+        backend_top_k = np.argsort(-backend_queries @ backend_corpus.T, axis=1)[:, :top_k]
+        top_k_overlap = np.mean([
+            len(set(expected) & set(actual)) / top_k
+            for expected, actual in zip(reference_top_k, backend_top_k)
+        ])
+
+        latency = __query_latency_ms(model, queries[:100])
+        is_valid = cosines.mean() >= min_cosine
+        all_valid = all_valid and is_valid
+
+        print(
+            f"{backend.value}: cosine mean={cosines.mean():.4f} min={cosines.min():.4f} "
+            f"p1={np.percentile(cosines, 1):.4f}, top-{top_k} overlap={top_k_overlap:.3f}, "
+            f"{latency:.1f} ms/query ({reference_latency / latency:.1f}x) "
+            f"-> {'OK' if is_valid else 'FAILED'}"
+        )
+
+    return all_valid
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Export an embedding model to ONNX (fp32 and int8) for the API's onnx "
+                    "embedding backends and validate it against the PyTorch model."
+    )
+    parser.add_argument('model_name', type=str, help="HuggingFace model name, e.g. BAAI/bge-m3")
+    parser.add_argument('--eval_set', type=str,
+                        default='../finetuning/data/qa_dataset/qa_finetune_dataset.json',
+                        help="IR dataset with 'queries' and 'corpus' used for validation")
+    parser.add_argument('--sample_size', type=int, default=500,
+                        help="Number of queries and of corpus chunks to validate on")
+    parser.add_argument('--top_k', type=int, default=10)
+    parser.add_argument('--min_cosine', type=float, default=0.99,
+                        help="Minimum mean cosine similarity with the fp32 PyTorch embeddings")
+    parser.add_argument('--arm64', action='store_true',
+                        help="Quantize for ARM64 instead of AVX512-VNNI CPUs")
+    parser.add_argument('--skip_export', action='store_true',
+                        help="Only validate previously exported models")
+
+    args = parser.parse_args()
+
+    fp32_dir = onnx_model_dir(args.model_name, EmbeddingBackend.ONNX)
+    int8_dir = onnx_model_dir(args.model_name, EmbeddingBackend.ONNX_INT8)
+
+    if not args.skip_export:
+        print(f"Exporting {args.model_name} to {fp32_dir}...")
+        __export_fp32(args.model_name, fp32_dir)
+        print(f"Quantizing to {int8_dir}...")
+        __export_int8(fp32_dir, int8_dir, args.arm64)
+        __copy_pooling_config(args.model_name, [fp32_dir, int8_dir])
+        print(f"Pooling: {onnx_pooling(fp32_dir)}")
+
+    print("Validating against the PyTorch model...")
+    valid = __validate(
+        args.model_name,
+        [EmbeddingBackend.ONNX, EmbeddingBackend.ONNX_INT8],
+        args.eval_set,
+        args.sample_size,
+        args.top_k,
+        args.min_cosine,
+    )
+
+    sys.exit(0 if valid else 1)
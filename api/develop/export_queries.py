@@ -0,0 +1,32 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+
+from server.core.export import EXPORT_FORMATS, stream_export
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Export queries joined with their feedback and experiment. "
+                    "Uses the same database settings as the API (.env)."
+    )
+    parser.add_argument('output', type=str, help="Output file, '-' for stdout")
+    parser.add_argument('--format', type=str, choices=list(EXPORT_FORMATS), default='ndjson')
+    parser.add_argument('--experiment_id', type=str, help="Only export queries of this experiment")
+    parser.add_argument('--user_id', type=str, help="Only export queries of this user")
+
+    args = parser.parse_args()
+
+    chunks = stream_export(args.format, experiment_id=args.experiment_id, user_id=args.user_id)
+
+    if args.output == '-':
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+    else:
+        with open(args.output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+CANNED_WORDS = (
+    "Restoring degraded land starts with understanding the local ecosystem, the drivers of "
+    "degradation and the needs of the communities that depend on it. Assisted natural "
+    "regeneration, agroforestry and the protection of remaining forest patches are often "
+    "the most cost effective options, while wetlands and mangroves store large amounts of "
+    "carbon and protect coastlines."
+).split()
+
+
+@dataclass
+class LatencyProfile:
+    """Latency of the fake completions, drawn per request from log-normal distributions."""
+    # Time to the first token
+    ttft_median_ms: float = 400.0
+    ttft_sigma: float = 0.5
+    # Time between two tokens
+    token_ms: float = 15.0
+    # Number of tokens in an answer
+    completion_tokens_median: int = 250
+    completion_tokens_sigma: float = 0.3
+    # Share of requests offering tools that answer with a tool call first
+    tool_call_rate: float = 1.0
+
+    def sample_ttft(self) -> float:
+        return random.lognormvariate(0, self.ttft_sigma) * self.ttft_median_ms / 1000
+
+    def sample_tokens(self) -> int:
+        tokens = random.lognormvariate(0, self.completion_tokens_sigma) * self.completion_tokens_median
+        return max(1, int(tokens))
+
+
+def _completion_text(tokens: int) -> list[str]:
+    return [CANNED_WORDS[i % len(CANNED_WORDS)] + " " for i in range(tokens)]
+
+
+def _tool_call(request_body: dict) -> dict | None:
+    """Call the first offered tool, unless the conversation already contains a tool result."""
+    tools = request_body.get("tools")
+    messages = request_body.get("messages", [])
+    if not tools or any(message.get("role") == "tool" for message in messages):
+        return None
+
+    last_user_message = next(
+        (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), ""
+    )
+    function = tools[0]["function"]
+    properties = function.get("parameters", {}).get("properties", {})
+    # Every string argument gets the user message, which is good enough for a search tool
+    arguments = {
+        name: last_user_message if schema.get("type") == "string" else None
+        for name, schema in properties.items()
+    }
+    return {
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+    }
+
+
+def create_app(profile: LatencyProfile) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o-mini")
+
+        tool_call = None
+        if random.random() < profile.tool_call_rate:
+            tool_call = _tool_call(body)
+        tokens = _completion_text(profile.sample_tokens()) if tool_call is None else []
+        usage = {
+            "prompt_tokens": sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", [])),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        finish_reason = "tool_calls" if tool_call else "stop"
+
+        await asyncio.sleep(profile.sample_ttft())
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(tokens) * profile.token_ms / 1000)
+            message = {"role": "assistant", "content": "".join(tokens) or None}
+            if tool_call:
+                message["tool_calls"] = [tool_call]
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish: str | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            if tool_call:
+                yield chunk({"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]})
+            else:
+                yield chunk({"role": "assistant", "content": ""})
+                for token in tokens:
+                    yield chunk({"content": token})
+                    await asyncio.sleep(profile.token_ms / 1000)
+            yield chunk({}, finish_reason)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def add_latency_arguments(parser: argparse.ArgumentParser):
+    defaults = LatencyProfile()
+    parser.add_argument('--ttft_median_ms', type=float, default=defaults.ttft_median_ms)
+    parser.add_argument('--ttft_sigma', type=float, default=defaults.ttft_sigma)
+    parser.add_argument('--token_ms', type=float, default=defaults.token_ms)
+    parser.add_argument('--completion_tokens', type=int, default=defaults.completion_tokens_median)
+    parser.add_argument('--tool_call_rate', type=float, default=defaults.tool_call_rate)
+
+
+def latency_profile_from_args(args: argparse.Namespace) -> LatencyProfile:
+    return LatencyProfile(
+        ttft_median_ms=args.ttft_median_ms,
+        ttft_sigma=args.ttft_sigma,
+        token_ms=args.token_ms,
+        completion_tokens_median=args.completion_tokens,
+        tool_call_rate=args.tool_call_rate,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="OpenAI-compatible chat completions server answering with canned text "
+                    "after a configurable latency, for load tests."
+    )
+    parser.add_argument('--port', type=int, default=8100)
+    add_latency_arguments(parser)
+
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(latency_profile_from_args(args)), host="127.0.0.1", port=args.port)
@@ -0,0 +1,302 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+import uvicorn
+
+from fake_openai_server import add_latency_arguments, create_app, latency_profile_from_args
+
+DEFAULT_QUESTIONS = [
+    "How can degraded peatlands be restored?",
+    "What are the benefits of mangrove restoration for coastal communities?",
+    "Which native species work best for reforestation in the Sahel?",
+    "How does agroforestry improve soil health?",
+    "What is assisted natural regeneration?",
+    "How do wetlands store carbon?",
+    "What are the costs of restoring tropical forests?",
+    "How can communities be involved in landscape restoration?",
+]
+
+# Endpoint name -> (method, path)
+ENDPOINTS = {
+    "user_query": ("POST", "/user_query/"),
+    "chat": ("POST", "/chat/"),
+    "list": ("GET", "/user_query/list?limit=10"),
+    "search": ("GET", "/user_query/search?q=restoration&limit=10"),
+}
+
+SNAPSHOT_UPSERT_BATCH_SIZE = 256
+
+
+def __take_snapshot(output_path: str, collections: list[str], limit: int):
+    """Copy up to `limit` points of each collection, with vectors and payloads, into a file."""
+    from server.core.experiment_runner import get_vectordb_client
+
+    client = get_vectordb_client()
+
+    with gzip.open(output_path, "wt") as f:
+        for collection in collections:
+            vectors_config = client.get_collection(collection).config.params.vectors
+            if isinstance(vectors_config, dict):
+                vectors_config = {name: params.model_dump() for name, params in vectors_config.items()}
+            else:
+                vectors_config = vectors_config.model_dump()
+            f.write(json.dumps({"collection": collection, "vectors_config": vectors_config}) + "\n")
+
+            offset, count = None, 0
+            while count < limit:
+                points, offset = client.scroll(
+                    collection_name=collection,
+                    limit=min(SNAPSHOT_UPSERT_BATCH_SIZE, limit - count),
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                for point in points:
+                    f.write(json.dumps({
+                        "id": point.id,
+                        "vector": point.vector,
+                        "payload": point.payload,
+                    }) + "\n")
+                count += len(points)
+                if offset is None:
+                    break
+            print(f"{collection}: {count} points")
+
+
+def __seed_vectordb(snapshot_path: str):
+    """Load a snapshot into the (in-memory) Qdrant client used by the API."""
+    from qdrant_client import models
+    from server.core.experiment_runner import get_vectordb_client
+
+    client = get_vectordb_client()
+    collection, batch, total = None, [], 0
+
+    def flush():
+        nonlocal batch, total
+        if batch:
+            client.upsert(collection_name=collection, points=batch)
+            total += len(batch)
+            batch = []
+
+    with gzip.open(snapshot_path, "rt") as f:
+        for line in f:
+            record = json.loads(line)
+            if "collection" in record:
+                flush()
+                collection = record["collection"]
+                vectors_config = record["vectors_config"]
+                if "size" in vectors_config:
+                    vectors_config = models.VectorParams(**vectors_config)
+                else:
+                    vectors_config = {
+                        name: models.VectorParams(**params) for name, params in vectors_config.items()
+                    }
+                if client.collection_exists(collection):
+                    client.delete_collection(collection)
+                client.create_collection(collection_name=collection, vectors_config=vectors_config)
+                continue
+
+            batch.append(models.PointStruct(**record))
+            if len(batch) >= SNAPSHOT_UPSERT_BATCH_SIZE:
+                flush()
+        flush()
+
+    print(f"Seeded the in-memory Qdrant with {total} points")
+
+
+def __start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def __request(base_url: str, method: str, path: str, token: str, body: dict = None) -> tuple[int, dict]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(f"{base_url}{path}", data=data, method=method)
+    request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("aicacia-api-token", token)
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, {}
+
+
+def __parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        name, weight = item.split("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}', expected one of {list(ENDPOINTS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+def __run_workload(base_url: str, token: str, mix: dict[str, float], questions: list[str],
+                   users: int, duration: float, think_time: float, seed: int) -> dict:
+    """Closed-loop workload: each virtual user sends a request, waits for it, thinks, repeats."""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    names, weights = list(mix), list(mix.values())
+
+    def virtual_user(user_index: int):
+        rng = random.Random(seed + user_index)
+        thread_id = None
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path = ENDPOINTS[name]
+            body = None
+            if name == "user_query":
+                body = {"question": rng.choice(questions)}
+            elif name == "chat":
+                body = {"message": rng.choice(questions), "thread_id": thread_id}
+
+            started_at = time.perf_counter()
+            status, response = __request(base_url, method, path, token, body)
+            elapsed = time.perf_counter() - started_at
+
+            with lock:
+                if status == 200:
+                    latencies[name].append(elapsed)
+                else:
+                    errors[name] += 1
+            # Continue the conversation, starting a new one now and then
+            if name == "chat" and status == 200:
+                thread_id = response.get("thread_id") if rng.random() < 0.8 else None
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+
+    started_at = time.perf_counter()
+    threads = [threading.Thread(target=virtual_user, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    report = {}
+    for name in mix:
+        values = np.array(latencies[name]) * 1000
+        report[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "throughput_rps": round(len(values) / elapsed, 2),
+        }
+        if len(values):
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            report[name].update(p50_ms=round(p50, 1), p95_ms=round(p95, 1), p99_ms=round(p99, 1))
+    return report
+
+
+def __print_report(report: dict):
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report.items():
+        print(
+            f"{name:<12}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>9}"
+            f"{stats.get('p50_ms', '-'):>10}{stats.get('p95_ms', '-'):>10}{stats.get('p99_ms', '-'):>10}"
+        )
+
+
+def __run(args: argparse.Namespace):
+    base_url = args.base_url
+    servers = []
+
+    if not base_url:
+        # Point the API at the stand-ins before its settings are read
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.fake_openai_port}/v1"
+        os.environ["QDRANT_URL"] = ":memory:"
+
+        servers.append(__start_server(
+            create_app(latency_profile_from_args(args)), args.fake_openai_port
+        ))
+        if args.snapshot:
+            __seed_vectordb(args.snapshot)
+
+        from server.main import app
+        servers.append(__start_server(app, args.api_port))
+        base_url = f"http://127.0.0.1:{args.api_port}"
+
+    status, response = __request(
+        base_url, "POST", "/user/login", None, {"email": args.email, "password": args.password}
+    )
+    if status != 200:
+        sys.exit(f"Login as {args.email} failed with status {status}")
+    token = response["token"]
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    report = __run_workload(
+        base_url, token, __parse_mix(args.mix), questions,
+        args.users, args.duration, args.think_time, args.seed,
+    )
+    __print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"arguments": vars(args), "report": report}, f, indent=2)
+
+    for server in servers:
+        server.should_exit = True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Load test the API against a fake OpenAI server and an in-memory Qdrant."
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    snapshot_parser = subparsers.add_parser(
+        'snapshot', help="Copy points of the configured Qdrant into a snapshot file"
+    )
+    snapshot_parser.add_argument('output', type=str, help="Snapshot file, e.g. snapshot.jsonl.gz")
+    snapshot_parser.add_argument('--collections', type=str, nargs='+', required=True)
+    snapshot_parser.add_argument('--limit', type=int, default=20000,
+                                 help="Maximum number of points per collection")
+
+    run_parser = subparsers.add_parser('run', help="Run a workload and report latency per endpoint")
+    run_parser.add_argument('--email', type=str, required=True, help="Existing user to run as")
+    run_parser.add_argument('--password', type=str, required=True)
+    run_parser.add_argument('--snapshot', type=str, help="Snapshot to seed the in-memory Qdrant with")
+    run_parser.add_argument('--base_url', type=str,
+                            help="Load test an already running API instead of starting one")
+    run_parser.add_argument('--api_port', type=int, default=8090)
+    run_parser.add_argument('--fake_openai_port', type=int, default=8100)
+    run_parser.add_argument('--mix', type=str, default='user_query=3,chat=1,list=2,search=1',
+                            help="Relative weights of the endpoints")
+    run_parser.add_argument('--questions', type=str, help="File with one question per line")
+    run_parser.add_argument('--users', type=int, default=8, help="Concurrent virtual users")
+    run_parser.add_argument('--duration', type=float, default=60.0, help="Seconds to run for")
+    run_parser.add_argument('--think_time', type=float, default=0.0,
+                            help="Mean seconds a virtual user waits between requests")
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output', type=str, help="Write the report as JSON, for comparisons")
+    add_latency_arguments(run_parser)
+
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        __take_snapshot(args.output, args.collections, args.limit)
+    else:
+        __run(args)
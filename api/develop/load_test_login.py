@@ -0,0 +1,122 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+
+def __request(url: str, method: str = "GET", body: dict = None, token: str = None) -> int:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method)
+    request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("aicacia-api-token", token)
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def __login(base_url: str, email: str, password: str) -> str:
+    request = urllib.request.Request(
+        f"{base_url}/user/login",
+        data=json.dumps({"email": email, "password": password}).encode("utf-8"),
+        method="POST",
+    )
+    request.add_header("Content-Type", "application/json")
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.load(response)["token"]
+
+
+def __probe_latencies(base_url: str, token: str, duration: float, concurrency: int) -> list[float]:
+    """Latencies of the query history endpoint, requested in a loop for `duration` seconds."""
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def probe():
+        while time.perf_counter() < deadline:
+            started_at = time.perf_counter()
+            __request(f"{base_url}/user_query/list?limit=10", token=token)
+            with lock:
+                latencies.append(time.perf_counter() - started_at)
+
+    threads = [threading.Thread(target=probe) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def __login_burst(base_url: str, email: str, password: str, concurrency: int,
+                  stop: threading.Event, statuses: list[int]):
+    def login():
+        while not stop.is_set():
+            statuses.append(__request(
+                f"{base_url}/user/login", "POST", {"email": email, "password": password}
+            ))
+
+    threads = [threading.Thread(target=login) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def __summary(latencies: list[float]) -> str:
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return f"{len(latencies)} requests, p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Measure /user_query latency on its own and during a burst of logins."
+    )
+    parser.add_argument('--base_url', type=str, default='http://localhost:8000')
+    parser.add_argument('--email', type=str, required=True, help="Existing user to log in as")
+    parser.add_argument('--password', type=str, required=True)
+    parser.add_argument('--duration', type=float, default=20.0,
+                        help="Seconds to measure for, before and during the burst")
+    parser.add_argument('--probe_concurrency', type=int, default=4)
+    parser.add_argument('--login_concurrency', type=int, default=64)
+    parser.add_argument('--max_p95_ratio', type=float, default=1.5,
+                        help="Fail if the p95 during the burst exceeds the baseline p95 by this factor")
+
+    args = parser.parse_args()
+
+    token = __login(args.base_url, args.email, args.password)
+
+    baseline = __probe_latencies(args.base_url, token, args.duration, args.probe_concurrency)
+    print(f"Baseline /user_query/list: {__summary(baseline)}")
+
+    stop = threading.Event()
+    statuses: list[int] = []
+    login_threads = __login_burst(
+        args.base_url, args.email, args.password, args.login_concurrency, stop, statuses
+    )
+    during_burst = __probe_latencies(args.base_url, token, args.duration, args.probe_concurrency)
+    stop.set()
+    for thread in login_threads:
+        thread.join()
+
+    print(f"During login burst: {__summary(during_burst)}")
+    print(
+        f"Logins: {statuses.count(200) / args.duration:.1f}/s succeeded, "
+        f"{statuses.count(503)} rejected as busy, "
+        f"{len(statuses) - statuses.count(200) - statuses.count(503)} other errors"
+    )
+
+    ratio = np.percentile(during_burst, 95) / np.percentile(baseline, 95)
+    print(f"p95 ratio: {ratio:.2f}")
+    sys.exit(0 if ratio <= args.max_p95_ratio else 1)
@@ -0,0 +1,74 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+import time
+import uuid
+
+from sqlmodel import Session, select
+
+from server.core.batch_queries import get_historical_questions, run_batch_queries
+from server.db.models.experiment import Experiment
+from server.db.models.user import User
+from server.db.session import engine
+
+
+def __read_questions(questions_file: str) -> list[str]:
+    with open(questions_file) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def __find_experiment(db: Session, experiment: str) -> Experiment | None:
+    try:
+        experiment_id = uuid.UUID(experiment)
+    except ValueError:
+        return db.exec(select(Experiment).where(Experiment.name == experiment)).first()
+
+    return db.exec(select(Experiment).where(Experiment.experiment_id == experiment_id)).first()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Run many questions against an experiment and store the results as queries. "
+                    "Uses the same database and Qdrant settings as the API (.env)."
+    )
+    parser.add_argument('experiment', type=str, help="Experiment name or id")
+    parser.add_argument('--user_email', type=str, required=True,
+                        help="User that the stored queries will belong to")
+    parser.add_argument('--questions_file', type=str, help="Text file with one question per line")
+    parser.add_argument('--replay_all', action='store_true',
+                        help="Replay the distinct questions already stored in the queries table")
+    parser.add_argument('--limit', type=int, help="Maximum number of historical questions to replay")
+
+    args = parser.parse_args()
+
+    if bool(args.questions_file) == args.replay_all:
+        parser.error("Provide exactly one of --questions_file or --replay_all")
+
+    with Session(engine) as db:
+        experiment = __find_experiment(db, args.experiment)
+        if not experiment:
+            sys.exit(f"Experiment not found: {args.experiment}")
+
+        user = db.exec(select(User).where(User.email == args.user_email.lower())).first()
+        if not user:
+            sys.exit(f"User not found: {args.user_email}")
+
+        if args.replay_all:
+            questions = get_historical_questions(db, limit=args.limit)
+        else:
+            questions = __read_questions(args.questions_file)
+
+        started_at = time.perf_counter()
+
+        def __report_progress(done: int, total: int):
+            elapsed = time.perf_counter() - started_at
+            print(f"Processed {done}/{total} questions ({done / elapsed:.1f} questions/s)")
+
+        print(f"Running {len(questions)} questions against experiment '{experiment.name}'...")
+        query_ids = run_batch_queries(experiment, questions, user.user_id, db,
+                                      on_progress=__report_progress)
+        print(f"Stored {len(query_ids)} queries")
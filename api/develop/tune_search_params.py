@@ -0,0 +1,137 @@
+import sys
+import os
+
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import argparse
+import itertools
+import json
+import random
+import time
+
+import numpy as np
+
+from server.core.config import settings
+from server.core.embedding_backends import EmbeddingBackend
+from server.core.experiment_runner import get_embedding_model, get_vectordb_client
+from server.core.retrieval_backends import qdrant_search_params
+from server.dtos.experiment import VectorSearchParams
+
+
+def __read_queries(dataset_path: str, max_queries: int) -> list[str]:
+    """Queries of an ir_evaluation dataset, used as a realistic search workload."""
+    with open(dataset_path) as f:
+        queries = list(json.load(f)["queries"].values())
+    random.Random(42).shuffle(queries)
+    return queries[:max_queries]
+
+
+def __query_vectors(queries: list[str], model_name: str, backend: str, cache_path: str) -> np.ndarray:
+    if cache_path and os.path.exists(cache_path):
+        return np.load(cache_path)
+
+    embedding_model = get_embedding_model(model_name, backend)
+    vectors = np.array(embedding_model.get_text_embedding_batch(queries), dtype=np.float32)
+    if cache_path:
+        np.save(cache_path, vectors)
+    return vectors
+
+
+def __search(collection: str, vectors: np.ndarray, k: int, params: VectorSearchParams) -> tuple[list, list]:
+    client = get_vectordb_client()
+    search_params = qdrant_search_params(params)
+    results, latencies = [], []
+    for vector in vectors:
+        started_at = time.perf_counter()
+        points = client.query_points(
+            collection_name=collection,
+            query=vector.tolist(),
+            limit=k,
+            search_params=search_params,
+            with_payload=False,
+        ).points
+        latencies.append(time.perf_counter() - started_at)
+        results.append([p.id for p in points])
+    return results, latencies
+
+
+def __candidates(hnsw_efs: list[int], oversamplings: list[float], quantized: bool) -> list[VectorSearchParams]:
+    candidates = [VectorSearchParams(exact=True)]
+    if quantized:
+        for hnsw_ef, rescore, oversampling in itertools.product(hnsw_efs, [True, False], oversamplings):
+            candidates.append(VectorSearchParams(hnsw_ef=hnsw_ef, rescore=rescore, oversampling=oversampling))
+    else:
+        candidates.extend(VectorSearchParams(hnsw_ef=hnsw_ef) for hnsw_ef in hnsw_efs)
+    return candidates
+
+
+def __sweep(collection: str, vectors: np.ndarray, k: int, candidates: list[VectorSearchParams]) -> list[dict]:
+    """Recall@k of every candidate against exact search, with its latency, ann-benchmarks style."""
+    # Warm up the collection's caches before measuring anything
+    __search(collection, vectors[:20], k, VectorSearchParams())
+    ground_truth, _ = __search(collection, vectors, k, VectorSearchParams(exact=True))
+
+    results = []
+    for params in candidates:
+        found, latencies = __search(collection, vectors, k, params)
+        recall = np.mean([
+            len(set(expected) & set(actual)) / max(len(expected), 1)
+            for expected, actual in zip(ground_truth, found)
+        ])
+        p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+        results.append({
+            "params": params.model_dump(exclude_defaults=True),
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+        })
+        print(f"{json.dumps(results[-1]['params']):<60} recall@{k}={recall:.4f} p50={p50:.2f}ms p95={p95:.2f}ms")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Find the fastest Qdrant search parameters of a collection that keep a "
+                    "target recall@k compared to exact search."
+    )
+    parser.add_argument('collection', type=str)
+    parser.add_argument('--embedding_model', type=str, default=settings.EMBEDDING_MODEL_NAME)
+    parser.add_argument('--embedding_backend', type=str, default=EmbeddingBackend.HUGGINGFACE.value)
+    parser.add_argument('--dataset', type=str,
+                        default='../finetuning/data/qa_dataset/qa_finetune_dataset.json',
+                        help="ir_evaluation dataset whose queries are searched")
+    parser.add_argument('--max_queries', type=int, default=500)
+    parser.add_argument('--embeddings_cache', type=str,
+                        help="Save the query embeddings here, and reuse them on later runs")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--target_recall', type=float, default=0.95)
+    parser.add_argument('--hnsw_ef', type=int, nargs='+', default=[16, 32, 64, 128, 256, 512])
+    parser.add_argument('--oversampling', type=float, nargs='+', default=[1.0, 1.5, 2.0, 3.0],
+                        help="Only swept for quantized collections")
+    parser.add_argument('--output', type=str, help="Write every measurement as JSON")
+
+    args = parser.parse_args()
+
+    queries = __read_queries(args.dataset, args.max_queries)
+    vectors = __query_vectors(queries, args.embedding_model, args.embedding_backend, args.embeddings_cache)
+
+    collection_info = get_vectordb_client().get_collection(args.collection)
+    quantized = collection_info.config.quantization_config is not None
+    print(f"{args.collection}: {collection_info.points_count} points, "
+          f"{'quantized' if quantized else 'not quantized'}, {len(vectors)} queries")
+
+    results = __sweep(args.collection, vectors, args.k, __candidates(args.hnsw_ef, args.oversampling, quantized))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"collection": args.collection, "k": args.k, "results": results}, f, indent=2)
+
+    meeting_target = [r for r in results if r[f"recall@{args.k}"] >= args.target_recall]
+    if not meeting_target:
+        sys.exit(f"No parameters reach recall@{args.k} >= {args.target_recall}")
+
+    best = min(meeting_target, key=lambda r: r["p95_ms"])
+    print(f"\nFastest parameters with recall@{args.k} >= {args.target_recall} "
+          f"(p95 {best['p95_ms']}ms), for the configuration's \"search_params\":")
+    print(json.dumps(best["params"]))
@@ -1,6 +1,7 @@
 from fastapi import Header, Depends, HTTPException
 from sqlmodel import Session, select
 from server.auth.auth import verify_jwt_token
+from server.core.instrumentation import track_stage
 from server.db.models.user import User
 from server.db.session import get_db_session
 
@@ -9,9 +10,10 @@ def get_current_user(aicacia_api_token: str = Header(None), session: Session = D
     if not aicacia_api_token:
         raise HTTPException(status_code=401, detail="Unauthorized: Token missing")
 
-    user_id = verify_jwt_token(aicacia_api_token)
+    with track_stage("auth"):
+        user_id = verify_jwt_token(aicacia_api_token)
 
-    user = session.exec(select(User).filter(User.user_id == user_id)).first()
+        user = session.exec(select(User).filter(User.user_id == user_id)).first()
 
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized: User not found")
@@ -1,17 +1,32 @@
 import uuid
+from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, func, select
 from server.auth.dependencies import get_current_user
-from server.dtos.chat import ChatResponse, ChatRequest, ThreadListResponse, ThreadSummary
+from server.dtos.chat import (
+    ChatResponse,
+    ChatRequest,
+    ThreadListResponse,
+    ThreadPurgeRequest,
+    ThreadPurgeResponse,
+    ThreadSummary,
+)
 from server.entities.chat import ChatMessage, Actor
+from server.db.models.base import utcnow
 from server.db.models.thread_messages import ThreadMessages
 from server.db.models.user import User
 from server.db.session import get_db_session
 from server.core.ai_agent import get_chat_response
+from server.core.instrumentation import track_stage
+from server.core.thread_deletion import delete_thread as delete_user_thread
+from server.core.thread_deletion import purge_threads
+from server.controllers.user_controller import get_admin_user
 
 chat_router = APIRouter()
 
+admin_chat_router = APIRouter()
+
 
 @chat_router.post("/")
 def generate_chat_response(
@@ -73,7 +88,8 @@ def generate_chat_response(
         )
     )
 
-    db.commit()
+    with track_stage("db_commit"):
+        db.commit()
 
     thread_messages = db.query(ThreadMessages).filter_by(thread_id=thread_id).all()
 
@@ -174,21 +190,36 @@ def delete_thread(
         user: User = Depends(get_current_user),
         db: Session = Depends(get_db_session)
 ) -> dict:
-    """Delete a chat thread and all its messages."""
-
-    # Verify the thread belongs to the user
-    thread_messages = db.query(ThreadMessages).filter_by(
-        thread_id=thread_id,
-        user_id=user.user_id
-    ).all()
+    """Delete a chat thread, all its messages and their feedback."""
+    try:
+        thread_uuid = uuid.UUID(thread_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Thread not found")
 
-    if not thread_messages:
+    # Only deletes messages of the user, so nothing is deleted for someone else's thread
+    if not delete_user_thread(db, thread_uuid, user.user_id):
         raise HTTPException(status_code=404, detail="Thread not found")
 
-    # Delete all messages in the thread
-    for message in thread_messages:
-        db.delete(message)
+    return {"status": "success", "message": "Thread deleted successfully"}
 
-    db.commit()
 
-    return {"status": "success", "message": "Thread deleted successfully"}
+@admin_chat_router.post("/chat/purge")
+def purge_old_threads(
+        request: ThreadPurgeRequest,
+        admin_user: User = Depends(get_admin_user),
+        db: Session = Depends(get_db_session)
+) -> ThreadPurgeResponse:
+    """Delete threads without messages for `older_than_days` days, for retention policies - admin only"""
+    if request.older_than_days < 1:
+        raise HTTPException(status_code=400, detail="older_than_days must be at least 1")
+
+    older_than = utcnow() - timedelta(days=request.older_than_days)
+    deleted_threads, deleted_messages, deleted_feedback = purge_threads(
+        db, older_than, request.user_id
+    )
+
+    return ThreadPurgeResponse(
+        deleted_threads=deleted_threads,
+        deleted_messages=deleted_messages,
+        deleted_feedback=deleted_feedback,
+    )
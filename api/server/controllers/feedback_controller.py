@@ -1,25 +1,80 @@
 import uuid
+from collections import Counter
 
 from fastapi import APIRouter, Depends, HTTPException
 from server.auth.dependencies import get_current_user
+from server.controllers.user_controller import get_admin_user
+from server.db.models.base import utcnow
+from server.db.models.experiment_feedback_aggregate import ExperimentFeedbackAggregate
 from server.db.models.feedback import Feedback
 from server.db.models.query import Query
 from server.db.models.user import User
 from server.db.session import get_db_session
 from server.dtos.feedback import FeedbackPostRequest, FeedbackPostResponse
 from server.dtos.experiment_feedback import (
+    ExperimentFeedbackAggregatesResponse,
     ExperimentFeedbackPostRequest,
     ExperimentFeedbackPostResponse,
+    FeedbackValueCount,
 )
 from server.entities.feedback import (
     ConfigurationFeedbackValue,
     ExperimentFeedbackDetails,
     FeedbackDetails,
 )
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import Session, select
 
 feedback_router = APIRouter()
 
+admin_feedback_router = APIRouter()
+
+
+def _count_radio_values(configuration_feedbacks: dict) -> Counter:
+    """Count (configuration_id, field_id, value) for radio values, free text isn't aggregated."""
+    counts = Counter()
+    for configuration_id, values in (configuration_feedbacks or {}).items():
+        for value in values:
+            if isinstance(value["value"], int) and not isinstance(value["value"], bool):
+                counts[(configuration_id, value["field_id"], value["value"])] += 1
+    return counts
+
+
+def _update_feedback_aggregates(
+    db: Session, experiment_id: uuid.UUID, old_counts: Counter, new_counts: Counter
+):
+    """Apply the difference between the old and new feedback to the aggregate counts."""
+    deltas = {
+        key: new_counts.get(key, 0) - old_counts.get(key, 0)
+        for key in old_counts.keys() | new_counts.keys()
+    }
+    now = utcnow()
+    rows = [
+        {
+            "experiment_id": experiment_id,
+            "configuration_id": configuration_id,
+            "field_id": field_id,
+            "value": value,
+            "count": delta,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for (configuration_id, field_id, value), delta in sorted(deltas.items())
+        if delta != 0
+    ]
+    if not rows:
+        return
+
+    statement = insert(ExperimentFeedbackAggregate).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["experiment_id", "configuration_id", "field_id", "value"],
+        set_={
+            "count": ExperimentFeedbackAggregate.count + statement.excluded.count,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+    db.execute(statement)
+
 
 @feedback_router.post("/")
 def save_feedback(request: FeedbackPostRequest,
@@ -99,14 +154,27 @@ def save_experiment_feedback(
         configuration_feedbacks=configuration_feedbacks
     )
 
+    new_counts = _count_radio_values(configuration_feedbacks)
+
     if existing_feedback:
-        # Update existing feedback with new experiment feedback
-        feedback_json = existing_feedback.feedback_json or {}
-        feedback_json["experiment_feedback"] = experiment_feedback.model_dump()
-        existing_feedback.feedback_json = feedback_json
+        old_counts = _count_radio_values(
+            (existing_feedback.feedback_json or {})
+            .get("experiment_feedback", {})
+            .get("configuration_feedbacks")
+        )
+        _update_feedback_aggregates(db, query.experiment_id, old_counts, new_counts)
+
+        # Update existing feedback with new experiment feedback. A new dict, the column
+        # doesn't track changes made in place
+        existing_feedback.feedback_json = {
+            **(existing_feedback.feedback_json or {}),
+            "experiment_feedback": experiment_feedback.model_dump(),
+        }
         db.add(existing_feedback)
         feedback_id = str(existing_feedback.feedback_id)
     else:
+        _update_feedback_aggregates(db, query.experiment_id, Counter(), new_counts)
+
         # Create new feedback
         feedback_id = str(uuid.uuid4())
         feedback = Feedback(
@@ -120,3 +188,35 @@ def save_experiment_feedback(
     db.commit()
 
     return ExperimentFeedbackPostResponse(feedback_id=feedback_id)
+
+
+@admin_feedback_router.get("/experiments/{experiment_id}/feedback_aggregates")
+def get_experiment_feedback_aggregates(
+    experiment_id: str,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db_session),
+) -> ExperimentFeedbackAggregatesResponse:
+    """Per configuration and field counts of each radio value - admin only"""
+    aggregates = db.exec(
+        select(ExperimentFeedbackAggregate)
+        .where(ExperimentFeedbackAggregate.experiment_id == experiment_id)
+        .where(ExperimentFeedbackAggregate.count > 0)
+        .order_by(
+            ExperimentFeedbackAggregate.configuration_id,
+            ExperimentFeedbackAggregate.field_id,
+            ExperimentFeedbackAggregate.value,
+        )
+    ).all()
+
+    return ExperimentFeedbackAggregatesResponse(
+        experiment_id=experiment_id,
+        aggregates=[
+            FeedbackValueCount(
+                configuration_id=a.configuration_id,
+                field_id=a.field_id,
+                value=a.value,
+                count=a.count,
+            )
+            for a in aggregates
+        ],
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Response
+from server.core.experiment_runner import get_loaded_resources
+from server.core.startup_timing import get_timings
+from server.core.warmup import WarmupStatus, get_warmup_status
+from server.dtos.health import ReadinessResponse
+
+health_router = APIRouter()
+
+
+@health_router.get("/ready")
+def readiness(response: Response) -> ReadinessResponse:
+    """Report whether the background warm-up finished and how long startup steps took."""
+    warmup_status, warmup_error = get_warmup_status()
+
+    # A failed warm-up is not fatal, resources are still loaded on first use
+    ready = warmup_status != WarmupStatus.RUNNING
+    if not ready:
+        response.status_code = 503
+
+    return ReadinessResponse(
+        ready=ready,
+        warmup_status=warmup_status.value,
+        warmup_error=warmup_error,
+        loaded_resources=get_loaded_resources(),
+        startup_timings=get_timings(),
+    )
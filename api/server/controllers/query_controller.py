@@ -1,9 +1,19 @@
+import importlib.util
 import uuid
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from server.auth.dependencies import get_current_user
 from server.controllers.user_controller import get_admin_user
-from server.core.experiment_runner import ExperimentRunner
+from server.core.answer_warmup import warm_answer_cache
+from server.core.batch_queries import get_historical_questions, run_batch_queries
+from server.core.config import settings
+from server.core.experiment_runner import ExperimentRunner, build_query_record
+from server.core.export import EXPORT_FORMATS, stream_export
+from server.core.instrumentation import track_stage
+from server.core.query_search import InvalidCursorError, search_user_queries
+from server.core.serialization import json_response, serialize_models
 from server.db.models.experiment import Experiment
 from server.db.models.feedback import Feedback
 from server.db.models.query import Query
@@ -12,8 +22,12 @@ from server.db.session import get_db_session
 from server.dtos.experiment import ExperimentQueryResponse
 from server.dtos.experiment_feedback import ExperimentFeedbackConfig
 from server.dtos.query import (
+    AnswerCacheWarmupResponse,
+    BatchQueryRequest,
+    BatchQueryResponse,
     QueryListResponse,
     QueryRequest,
+    QuerySearchResponse,
     QueryWithFeedbackResponse,
 )
 from sqlalchemy import func
@@ -24,12 +38,13 @@ query_router = APIRouter()
 admin_query_router = APIRouter()
 
 
-@query_router.post("/")
+@query_router.post("/", response_model=ExperimentQueryResponse)
 def run_user_query(
     request: QueryRequest,
+    http_request: Request,
     user: User = Depends(get_current_user),
     db: Session = Depends(get_db_session),
-) -> ExperimentQueryResponse:
+) -> Response:
     query_id = str(uuid.uuid4())
 
     # Get active experiment
@@ -44,33 +59,38 @@ def run_user_query(
     runner = ExperimentRunner()
     responses = runner.run(experiment, request.question, db)
 
+    # Serialize the responses once, for both the stored query and the HTTP response
+    serialized_responses = serialize_models(responses)
+
     # Store query with experiment context
-    query = Query(
+    query = build_query_record(
+        request.question,
+        user.user_id,
+        experiment,
+        responses,
         query_id=query_id,
-        question=request.question,
-        user_id=user.user_id,
-        experiment_id=experiment.experiment_id,
-        experiment_responses=[r.model_dump() for r in responses],
-        # Keep legacy fields populated from first response for backward compat
-        references=[ref.model_dump() for ref in responses[0].references]
-        if responses
-        else [],
-        summary=responses[0].summary if responses else None,
+        serialized_responses=serialized_responses,
     )
 
     db.add(query)
-    db.commit()
+    with track_stage("db_commit"):
+        db.commit()
 
     # Parse feedback config if present
     feedback_config = None
     if experiment.feedback_config:
         feedback_config = ExperimentFeedbackConfig(**experiment.feedback_config)
 
-    return ExperimentQueryResponse(
-        query_id=query_id,
-        experiment_id=str(experiment.experiment_id),
-        responses=responses,
-        feedback_config=feedback_config,
+    # Responses carry every configuration's chunks, so skip the validation and encoding
+    # of the response model and send the JSON serialized above
+    return json_response(
+        http_request,
+        {
+            "query_id": query_id,
+            "experiment_id": str(experiment.experiment_id),
+            "responses": serialized_responses,
+            "feedback_config": feedback_config.model_dump() if feedback_config else None,
+        },
     )
 
 
@@ -109,6 +129,26 @@ def list_queries(
     )
 
 
+# Declared before "/{query_id}" so that "search" isn't taken for a query id
+@query_router.get("/search")
+def search_queries(
+    q: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db_session),
+) -> QuerySearchResponse:
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search text must not be empty")
+
+    try:
+        queries, next_cursor = search_user_queries(db, user.user_id, q, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return QuerySearchResponse(queries=queries, next_cursor=next_cursor)
+
+
 @query_router.get("/{query_id}")
 def get_query_with_feedback(
     query_id: str,
@@ -240,3 +280,81 @@ def get_user_query_with_feedback_admin(
         experiment_responses=experiment_responses,
         feedback_config=feedback_config,
     )
+
+
+@admin_query_router.post("/experiments/{experiment_id}/batch_queries")
+def run_batch_queries_admin(
+    experiment_id: str,
+    request: BatchQueryRequest,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db_session),
+) -> BatchQueryResponse:
+    """Run many questions against an experiment, results are stored as the admin's queries - admin only"""
+    experiment = db.exec(
+        select(Experiment).where(Experiment.experiment_id == experiment_id)
+    ).first()
+
+    if not experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+
+    # Runs within the request, so at most BATCH_QUERIES_MAX_QUESTIONS at a time
+    max_questions = settings.BATCH_QUERIES_MAX_QUESTIONS
+    if request.replay_all:
+        questions = get_historical_questions(db, limit=min(request.limit or max_questions, max_questions))
+    elif request.questions:
+        if len(request.questions) > max_questions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {max_questions} questions per request, use develop/run_batch_queries.py for more",
+            )
+        questions = request.questions
+    else:
+        raise HTTPException(
+            status_code=400, detail="Either questions or replay_all must be provided"
+        )
+
+    try:
+        query_ids = run_batch_queries(experiment, questions, admin_user.user_id, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return BatchQueryResponse(
+        experiment_id=str(experiment.experiment_id),
+        query_ids=query_ids,
+        total_count=len(query_ids),
+    )
+
+
+@admin_query_router.get("/export/queries")
+def export_queries_admin(
+    format: str = "ndjson",
+    experiment_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    admin_user: User = Depends(get_admin_user),
+) -> StreamingResponse:
+    """Stream all queries with their feedback and experiment as NDJSON or Parquet - admin only"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format, expected one of {list(EXPORT_FORMATS)}",
+        )
+
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=400, detail="Parquet export is not available")
+
+    return StreamingResponse(
+        stream_export(format, experiment_id=experiment_id, user_id=user_id),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="queries.{format}"'},
+    )
+
+
+@admin_query_router.post("/answer_cache/warmup")
+def warm_up_answer_cache(
+    admin_user: User = Depends(get_admin_user),
+) -> AnswerCacheWarmupResponse:
+    """Precompute answers to the most frequent recent questions - admin only
+
+    Only fills the cache of the worker process serving this request.
+    """
+    return AnswerCacheWarmupResponse(**warm_answer_cache())
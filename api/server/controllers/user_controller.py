@@ -1,9 +1,13 @@
 import uuid
 
-import bcrypt
 from fastapi import APIRouter, Depends, HTTPException
 from server.auth.auth import create_jwt_token
 from server.auth.dependencies import get_current_user
+from server.core.password_hashing import (
+    PasswordHashingBusyError,
+    hash_password,
+    verify_password,
+)
 from server.db.models.user import User
 from server.db.session import get_db_session
 from server.dtos.user import (
@@ -24,11 +28,17 @@ admin_router = APIRouter()
 
 
 def _hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    try:
+        return hash_password(password)
+    except PasswordHashingBusyError:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again")
 
 
 def _verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+    try:
+        return verify_password(password, hashed_password)
+    except PasswordHashingBusyError:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again")
 
 
 def get_admin_user(user: User = Depends(get_current_user)) -> User:
@@ -48,6 +58,8 @@ def register(request: UserPostRequest, db: Session = Depends(get_db_session)) ->
     if existing_user:
         raise HTTPException(status_code=400, detail="User with this email already exists")
 
+    # Give the connection back to the pool while waiting for the password hash
+    db.close()
     hashed_password = _hash_password(request.password)
 
     user = User(
@@ -72,6 +84,9 @@ def login(request: UserLoginRequest, db: Session = Depends(get_db_session)) -> U
     if not user:
         raise HTTPException(status_code=400, detail="User not found")
 
+    # Give the connection back to the pool while waiting for the password check,
+    # closing keeps the loaded user usable
+    db.close()
     if not _verify_password(request.password, user.password):
         raise HTTPException(status_code=400, detail="Incorrect password")
 
@@ -1,38 +1,40 @@
 import ast
 import json
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
 
-from langchain.agents import AgentExecutor, tool
-from langchain.agents.format_scratchpad.openai_tools import (
-    format_to_openai_tool_messages,
-)
-from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from qdrant_client import QdrantClient
+from langchain_core.tools import tool
 from server.core.config import settings
+from server.core.experiment_runner import (
+    get_embedding_model,
+    get_llm,
+    get_vectordb_client,
+)
+from server.core.startup_timing import timed
 from server.entities.chat import Actor, ChatMessage
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=1, api_key=settings.OPENAI_API_KEY)
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
 
-vectordb_client = QdrantClient(
-    url=settings.QDRANT_URL,
-    https=True,
-    api_key=settings.QDRANT_API_KEY
-)
+CHAT_LLM_MODEL = "gpt-4o-mini"
+CHAT_LLM_TEMPERATURE = 1.0
 
-embedding_model = HuggingFaceEmbedding(model_name=settings.EMBEDDING_MODEL_NAME)
+# The agent is built at first use, so importing this module stays cheap
+_agent_executor: Optional["AgentExecutor"] = None
+_agent_executor_lock = Lock()
 
 
 @tool
 def get_restoration_context_for_message(country: str, message: str) -> int:
     """Returns the restoration context for a message"""
     # Embed query
+    embedding_model = get_embedding_model(settings.EMBEDDING_MODEL_NAME)
     query_embedding = embedding_model.get_text_embedding(message)
 
     # Search in vector store
-    results = vectordb_client.query_points(
+    results = get_vectordb_client().query_points(
         collection_name=settings.QDRANT_COLLECTION,
         query=query_embedding,
         limit=3,
@@ -111,22 +113,39 @@ Users come to you with questions about the environment and how to restore it.
 
 tools = [get_restoration_context_for_message]
 
-llm_with_tools = llm.bind_tools(tools)
 
-
-agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_to_openai_tool_messages(
-            x["intermediate_steps"]
-        ),
-        "chat_history": lambda x: x["chat_history"],
-    }
-    | prompt
-    | llm_with_tools
-    | OpenAIToolsAgentOutputParser()
-)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+def get_agent_executor() -> "AgentExecutor":
+    """Get the chat agent, building it on first use."""
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_executor_lock:
+            if _agent_executor is None:
+                with timed("import:langchain.agents"):
+                    from langchain.agents import AgentExecutor
+                    from langchain.agents.format_scratchpad.openai_tools import (
+                        format_to_openai_tool_messages,
+                    )
+                    from langchain.agents.output_parsers.openai_tools import (
+                        OpenAIToolsAgentOutputParser,
+                    )
+
+                llm = get_llm(CHAT_LLM_MODEL, CHAT_LLM_TEMPERATURE)
+                llm_with_tools = llm.bind_tools(tools)
+
+                agent = (
+                    {
+                        "input": lambda x: x["input"],
+                        "agent_scratchpad": lambda x: format_to_openai_tool_messages(
+                            x["intermediate_steps"]
+                        ),
+                        "chat_history": lambda x: x["chat_history"],
+                    }
+                    | prompt
+                    | llm_with_tools
+                    | OpenAIToolsAgentOutputParser()
+                )
+                _agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    return _agent_executor
 
 
 def get_chat_response(message: str, chat_history: list[ChatMessage]) -> str:
@@ -138,7 +157,7 @@ def get_chat_response(message: str, chat_history: list[ChatMessage]) -> str:
         )
         for chat_message in chat_history
     ]
-    result = agent_executor.invoke(
+    result = get_agent_executor().invoke(
         {"input": message, "chat_history": chat_history_messages}
     )
     return result["output"]
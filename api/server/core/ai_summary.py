@@ -3,7 +3,11 @@ from openai import APIError
 from server.core.config import settings
 
 llm = ChatOpenAI(
-    model="gpt-4o-mini", temperature=0.5, max_retries=2, api_key=settings.OPENAI_API_KEY
+    model="gpt-4o-mini",
+    temperature=0.5,
+    max_retries=2,
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL,
 )
 
 
@@ -0,0 +1,76 @@
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional
+
+from server.core.config import settings
+from server.dtos.experiment import ExperimentConfiguration
+from server.dtos.query import Reference
+
+
+@dataclass
+class CachedAnswer:
+    references: list[Reference]
+    # None when only the retrieval was precomputed, or the configuration has no LLM
+    summary: Optional[str]
+    created_at: float
+
+
+def normalize_question(question: str) -> str:
+    """Questions differing only in case, spacing or trailing punctuation share an answer."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+class AnswerCache:
+    """LRU cache of configuration answers, per process, keyed by configuration and question."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, str], CachedAnswer] = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(config: ExperimentConfiguration, question: str) -> tuple[str, str]:
+        # The whole configuration, so editing an experiment doesn't serve stale answers
+        return config.model_dump_json(), normalize_question(question)
+
+    def get(self, config: ExperimentConfiguration, question: str) -> Optional[CachedAnswer]:
+        if not self.max_size:
+            return None
+
+        key = self._key(config, question)
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is None:
+                return None
+            if time.time() - answer.created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def put(self, config: ExperimentConfiguration, question: str,
+            references: list[Reference], summary: Optional[str]):
+        if not self.max_size:
+            return
+
+        key = self._key(config, question)
+        with self._lock:
+            self._entries[key] = CachedAnswer(references, summary, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+answer_cache = AnswerCache(settings.ANSWER_CACHE_SIZE, settings.ANSWER_CACHE_TTL_SECONDS)
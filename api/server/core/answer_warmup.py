@@ -0,0 +1,147 @@
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from threading import Event, Thread
+from typing import Optional
+
+import numpy as np
+from server.core.answer_cache import answer_cache, normalize_question
+from server.core.config import settings
+from server.core.experiment_runner import ConfigurationRunner, get_embedding_model
+from server.db.models.base import utcnow
+from server.db.models.experiment import Experiment
+from server.db.models.query import Query
+from server.db.session import engine
+from server.dtos.experiment import ExperimentConfiguration
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+# Distinct recent questions considered for clustering
+MAX_CANDIDATE_QUESTIONS = 5000
+
+_stop_schedule = Event()
+
+
+@dataclass
+class QuestionCluster:
+    # Most frequent phrasing of the intent, the one actually run
+    representative: str
+    questions: list[str] = field(default_factory=list)
+    count: int = 0
+
+
+def get_frequent_questions(db: Session, lookback_days: int) -> list[tuple[str, int]]:
+    """Recent questions with the number of times they were asked, most frequent first."""
+    since = utcnow() - timedelta(days=lookback_days)
+    rows = db.exec(
+        select(Query.question, func.count())
+        .where(Query.created_at >= since)
+        .group_by(Query.question)
+        .order_by(func.count().desc())
+        .limit(MAX_CANDIDATE_QUESTIONS)
+    ).all()
+
+    counts: dict[str, int] = {}
+    phrasing: dict[str, str] = {}
+    for question, count in rows:
+        normalized = normalize_question(question)
+        counts[normalized] = counts.get(normalized, 0) + count
+        phrasing.setdefault(normalized, question)
+    return sorted(((phrasing[q], c) for q, c in counts.items()), key=lambda qc: -qc[1])
+
+
+def cluster_questions(
+    questions: list[tuple[str, int]], embeddings: np.ndarray, similarity: float
+) -> list[QuestionCluster]:
+    """Greedily group questions with a cosine similarity of at least `similarity`.
+
+    Questions come most frequent first, so each cluster is represented by its most
+    frequent phrasing. Returns the clusters, most asked first.
+    """
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    clusters: list[QuestionCluster] = []
+    # Row i holds the embedding representing clusters[i]
+    representatives = np.empty_like(embeddings)
+
+    for (question, count), embedding in zip(questions, embeddings):
+        if clusters:
+            scores = representatives[:len(clusters)] @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] >= similarity:
+                clusters[best].questions.append(question)
+                clusters[best].count += count
+                continue
+        representatives[len(clusters)] = embedding
+        clusters.append(QuestionCluster(question, [question], count))
+
+    return sorted(clusters, key=lambda c: -c.count)
+
+
+def warm_answer_cache(
+    top_n: int = settings.ANSWER_WARMUP_TOP_N,
+    lookback_days: int = settings.ANSWER_WARMUP_LOOKBACK_DAYS,
+    similarity: float = settings.ANSWER_WARMUP_SIMILARITY,
+    summaries: bool = settings.ANSWER_WARMUP_SUMMARIES,
+) -> dict[str, int]:
+    """Precompute the active experiment's answers to the most frequent recent intents.
+
+    Every phrasing of an intent seen in the queries table is cached with the answer
+    to its most frequent phrasing.
+    """
+    with Session(engine) as db:
+        experiment = db.exec(select(Experiment).where(Experiment.is_active == True)).first()
+        questions = get_frequent_questions(db, lookback_days)
+        if not experiment or not questions:
+            return {"clusters": 0, "questions": 0, "configurations": 0}
+
+        embedding_model = get_embedding_model(settings.EMBEDDING_MODEL_NAME)
+        embeddings = np.array(
+            embedding_model.get_text_embedding_batch([q for q, _ in questions]), dtype=np.float32
+        )
+        clusters = cluster_questions(questions, embeddings, similarity)[:top_n]
+        representatives = [c.representative for c in clusters]
+
+        configs = [ExperimentConfiguration(**c) for c in experiment.configurations]
+        with ThreadPoolExecutor(max_workers=settings.BATCH_LLM_CONCURRENCY) as llm_executor:
+            for config in configs:
+                responses = ConfigurationRunner(config).run_batch(
+                    representatives, db, llm_executor, generate_summaries=summaries
+                )
+                for cluster, response in zip(clusters, responses):
+                    for question in cluster.questions:
+                        cached = answer_cache.get(config, question)
+                        # Keep summaries generated since, when only refreshing the retrieval
+                        if cached and cached.summary is not None and response.summary is None:
+                            continue
+                        answer_cache.put(config, question, response.references, response.summary)
+
+    stats = {
+        "clusters": len(clusters),
+        "questions": sum(len(c.questions) for c in clusters),
+        "configurations": len(configs),
+    }
+    print(f"Answer cache warm-up: {stats}")
+    return stats
+
+
+def _run_schedule(interval_minutes: int):
+    while not _stop_schedule.is_set():
+        try:
+            warm_answer_cache()
+        except Exception:
+            print("Answer cache warm-up failed:")
+            traceback.print_exc()
+        _stop_schedule.wait(interval_minutes * 60)
+
+
+def start_answer_warmup_schedule(interval_minutes: Optional[int] = settings.ANSWER_WARMUP_INTERVAL_MINUTES):
+    """Warm the answer cache now and then every `interval_minutes` in a background thread."""
+    if not interval_minutes or not settings.ANSWER_CACHE_SIZE:
+        return
+    _stop_schedule.clear()
+    Thread(target=_run_schedule, args=(interval_minutes,), name="answer-warmup", daemon=True).start()
+
+
+def stop_answer_warmup_schedule():
+    _stop_schedule.set()
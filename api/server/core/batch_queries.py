@@ -0,0 +1,58 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from server.core.config import settings
+from server.core.experiment_runner import ExperimentRunner, build_query_record
+from server.db.models.experiment import Experiment
+from server.db.models.query import Query
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+# Questions embedded, searched and written to the DB together
+BATCH_CHUNK_SIZE = 256
+
+
+def get_historical_questions(db: Session, limit: Optional[int] = None) -> list[str]:
+    """Distinct questions from the queries table, oldest first."""
+    statement = (
+        select(Query.question)
+        .group_by(Query.question)
+        .order_by(func.min(Query.created_at))
+    )
+    if limit:
+        statement = statement.limit(limit)
+    return list(db.exec(statement).all())
+
+
+def run_batch_queries(
+    experiment: Experiment,
+    questions: list[str],
+    user_id: uuid.UUID,
+    db: Session,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> list[str]:
+    """Run every question against the experiment and store the results as queries of the user.
+
+    Returns the ids of the stored queries, in the order of the questions.
+    """
+    runner = ExperimentRunner()
+    query_ids = []
+
+    with ThreadPoolExecutor(max_workers=settings.BATCH_LLM_CONCURRENCY) as llm_executor:
+        for start in range(0, len(questions), BATCH_CHUNK_SIZE):
+            chunk = questions[start: start + BATCH_CHUNK_SIZE]
+            responses_per_question = runner.run_batch(experiment, chunk, db, llm_executor)
+
+            queries = [
+                build_query_record(question, user_id, experiment, responses)
+                for question, responses in zip(chunk, responses_per_question)
+            ]
+            # Read the ids before committing, afterwards each access would reload the row
+            query_ids.extend(str(q.query_id) for q in queries)
+            db.add_all(queries)
+            db.commit()
+            if on_progress:
+                on_progress(len(query_ids), len(questions))
+
+    return query_ids
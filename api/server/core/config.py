@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,15 +11,61 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "aicacia"
 
     OPENAI_API_KEY: str = "Hello!"
+    # OpenAI-compatible endpoint to use instead of api.openai.com, e.g. the fake
+    # server of develop/fake_openai_server.py when load testing
+    OPENAI_BASE_URL: Optional[str] = None
 
     SECRET_KEY: str = "Hello!"
 
+    # ":memory:" runs an in-process Qdrant, seeded by develop/load_test.py
     QDRANT_URL: str = "localhost:6333"
     QDRANT_API_KEY: str = "Hello!"
     QDRANT_COLLECTION: str = "aicacia--bge-m3"
 
     EMBEDDING_MODEL_NAME: str = "BAAI/bge-m3"
 
+    # Concurrent LLM calls when running batches of questions
+    BATCH_LLM_CONCURRENCY: int = 8
+    # Most questions one batch_queries request runs, larger replays use develop/run_batch_queries.py
+    BATCH_QUERIES_MAX_QUESTIONS: int = 500
+
+    # bcrypt cost factor for new password hashes, each step doubles the hashing time.
+    # Existing hashes keep the cost they were created with.
+    BCRYPT_ROUNDS: int = 12
+    # Processes hashing and checking passwords, and how many requests may wait for
+    # them before new logins and registrations get a 503.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 16
+
+    # Log every SQL statement, useful when debugging queries locally
+    SQL_ECHO: bool = False
+    # Exported models for the "onnx" and "onnx-int8" embedding backends
+    ONNX_MODELS_DIR: str = "./onnx_models"
+
+    # Exported collections for the "embedded" retrieval backend
+    EMBEDDED_INDEX_DIR: str = "./embedded_indexes"
+
+    # Answers kept per process, by configuration and question. 0 disables the cache.
+    ANSWER_CACHE_SIZE: int = 0
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 3600
+    # Precompute answers for the most frequent recent questions every this many
+    # minutes, in every worker. None disables the job.
+    ANSWER_WARMUP_INTERVAL_MINUTES: Optional[int] = None
+    ANSWER_WARMUP_TOP_N: int = 50
+    ANSWER_WARMUP_LOOKBACK_DAYS: int = 14
+    # Questions at least this similar are treated as the same intent
+    ANSWER_WARMUP_SIMILARITY: float = 0.9
+    # Also precompute LLM summaries, not only the retrieval
+    ANSWER_WARMUP_SUMMARIES: bool = False
+
+    # Load the active experiment's models in a background thread at startup
+    # instead of on the first request that needs them.
+    WARMUP_ON_STARTUP: bool = False
+
+    # Intra-op threads per worker for torch inference. Defaults to the CPU count
+    # divided by the number of workers when serving through server.serve.
+    TORCH_NUM_THREADS: Optional[int] = None
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -0,0 +1,73 @@
+import enum
+import json
+import os
+from typing import TYPE_CHECKING
+
+from server.core.config import settings
+from server.core.startup_timing import timed
+
+if TYPE_CHECKING:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+
+
+class EmbeddingBackend(str, enum.Enum):
+    # Full precision PyTorch model through sentence-transformers
+    HUGGINGFACE = "huggingface"
+    # ONNX Runtime export of the same model
+    ONNX = "onnx"
+    # ONNX Runtime export with int8 dynamically quantized weights
+    ONNX_INT8 = "onnx-int8"
+
+
+# sentence-transformers pooling config of the model, copied next to its ONNX export
+POOLING_CONFIG = os.path.join("1_Pooling", "config.json")
+
+# sentence-transformers pooling modes OptimumEmbedding reproduces
+_OPTIMUM_POOLING_MODES = {"pooling_mode_cls_token": "cls", "pooling_mode_mean_tokens": "mean"}
+
+
+def onnx_model_dir(model_name: str, backend: EmbeddingBackend) -> str:
+    """Folder holding the ONNX export of a model, as written by develop/export_onnx_embedding.py"""
+    return os.path.join(settings.ONNX_MODELS_DIR, model_name.replace("/", "--"), backend.value)
+
+
+def onnx_pooling(folder_name: str) -> str:
+    """OptimumEmbedding pooling of the ONNX export in `folder_name`, the one its sentence-transformers model uses"""
+    config_path = os.path.join(folder_name, POOLING_CONFIG)
+    if not os.path.isfile(config_path):
+        raise ValueError(f"No pooling config in {folder_name}, re-export the model with develop/export_onnx_embedding.py")
+
+    with open(config_path) as f:
+        config = json.load(f)
+
+    modes = [mode for mode, enabled in config.items() if mode.startswith("pooling_mode_") and enabled is True]
+    if len(modes) != 1 or modes[0] not in _OPTIMUM_POOLING_MODES:
+        raise ValueError(f"Pooling {modes} of the model in {folder_name} isn't supported by the ONNX backends")
+    return _OPTIMUM_POOLING_MODES[modes[0]]
+
+
+def load_embedding_model(model_name: str, backend: EmbeddingBackend) -> "BaseEmbedding":
+    if backend == EmbeddingBackend.HUGGINGFACE:
+        with timed("import:llama_index.embeddings.huggingface"):
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        return HuggingFaceEmbedding(model_name=model_name)
+
+    folder_name = onnx_model_dir(model_name, backend)
+    if not os.path.isdir(folder_name):
+        raise ValueError(
+            f"No {backend.value} export of '{model_name}' found in {folder_name}, "
+            "run develop/export_onnx_embedding.py first"
+        )
+
+    pooling = onnx_pooling(folder_name)
+
+    with timed("import:llama_index.embeddings.huggingface_optimum"):
+        try:
+            from llama_index.embeddings.huggingface_optimum import OptimumEmbedding
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX embedding backends need 'optimum[onnxruntime]' and "
+                "'llama-index-embeddings-huggingface-optimum' to be installed"
+            ) from e
+
+    return OptimumEmbedding(folder_name=folder_name, pooling=pooling, normalize=True)
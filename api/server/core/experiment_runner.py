@@ -1,37 +1,121 @@
+import contextvars
 import json
 import random
 import uuid
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
+from threading import Lock
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
 
 from langchain_openai import ChatOpenAI
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from openai import APIError
-from qdrant_client import QdrantClient
+from server.core.answer_cache import answer_cache
 from server.core.config import settings
+from server.core.embedding_backends import EmbeddingBackend, load_embedding_model
+from server.core.instrumentation import StageTimer
+from server.core.retrieval_backends import (
+    EmbeddedIndex,
+    QdrantRetriever,
+    RetrievalBackend,
+    embedded_index_dir,
+)
+from server.core.serialization import serialize_models
+from server.core.startup_timing import timed
 from server.db.models.experiment import Experiment
+from server.db.models.query import Query
 from server.db.models.sourced_documents import SourcedDocument
-from server.dtos.experiment import ConfigurationResponse, ExperimentConfiguration
+from server.dtos.experiment import (
+    ConfigurationResponse,
+    ExperimentConfiguration,
+    VectorSearchParams,
+)
 from server.dtos.query import Reference
 from sqlmodel import Session, select
 
+if TYPE_CHECKING:
+    # Importing the embedding integrations pulls in torch and transformers and
+    # the Qdrant client generates its whole model tree, so both are deferred
+    # until the resource is first requested.
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from qdrant_client import QdrantClient
+
 # Global cache for embedding models (loaded once at first use)
-_embedding_model_cache: dict[str, HuggingFaceEmbedding] = {}
+_embedding_model_cache: dict[str, "BaseEmbedding"] = {}
+_embedding_model_lock = Lock()
 
 # Global cache for LLM instances
 _llm_cache: dict[str, ChatOpenAI] = {}
-
-# Shared Qdrant client
-_vectordb_client = QdrantClient(
-    url=settings.QDRANT_URL, https=True, api_key=settings.QDRANT_API_KEY
-)
-
-
-def get_embedding_model(model_name: str) -> HuggingFaceEmbedding:
-    """Get cached embedding model or create and cache it."""
-    if model_name not in _embedding_model_cache:
-        _embedding_model_cache[model_name] = HuggingFaceEmbedding(model_name=model_name)
-    return _embedding_model_cache[model_name]
+_llm_lock = Lock()
+
+# Embedded indexes, loaded once at first use, keyed by collection name
+_embedded_index_cache: dict[str, EmbeddedIndex] = {}
+_embedded_index_lock = Lock()
+
+# Shared Qdrant client (created at first use)
+_vectordb_client: Optional["QdrantClient"] = None
+_vectordb_client_lock = Lock()
+
+
+def get_vectordb_client() -> "QdrantClient":
+    """Get the shared Qdrant client, creating it on first use."""
+    global _vectordb_client
+    if _vectordb_client is None:
+        with _vectordb_client_lock:
+            if _vectordb_client is None:
+                with timed("import:qdrant_client"):
+                    from qdrant_client import QdrantClient
+                with timed("resource:vectordb_client"):
+                    if settings.QDRANT_URL == ":memory:":
+                        _vectordb_client = QdrantClient(location=":memory:")
+                    else:
+                        _vectordb_client = QdrantClient(
+                            url=settings.QDRANT_URL,
+                            https=True,
+                            api_key=settings.QDRANT_API_KEY,
+                        )
+    return _vectordb_client
+
+
+def get_embedding_model(
+    model_name: str, backend: str = EmbeddingBackend.HUGGINGFACE
+) -> "BaseEmbedding":
+    """Get cached embedding model or load and cache it."""
+    backend = EmbeddingBackend(backend)
+    cache_key = (
+        model_name
+        if backend == EmbeddingBackend.HUGGINGFACE
+        else f"{model_name}@{backend.value}"
+    )
+    if cache_key not in _embedding_model_cache:
+        with _embedding_model_lock:
+            if cache_key not in _embedding_model_cache:
+                with timed(f"resource:embedding_model:{cache_key}"):
+                    _embedding_model_cache[cache_key] = load_embedding_model(
+                        model_name, backend
+                    )
+    return _embedding_model_cache[cache_key]
+
+
+def get_embedded_index(collection_name: str) -> EmbeddedIndex:
+    """Get cached embedded index of a collection or load and cache it."""
+    if collection_name not in _embedded_index_cache:
+        with _embedded_index_lock:
+            if collection_name not in _embedded_index_cache:
+                with timed(f"resource:embedded_index:{collection_name}"):
+                    _embedded_index_cache[collection_name] = EmbeddedIndex(
+                        embedded_index_dir(collection_name)
+                    )
+    return _embedded_index_cache[collection_name]
+
+
+def get_retriever(
+    collection_name: str,
+    backend: str = RetrievalBackend.QDRANT,
+    search_params: Optional[VectorSearchParams] = None,
+) -> "QdrantRetriever | EmbeddedIndex":
+    """Searcher for a collection, on the Qdrant server or in the API process."""
+    if RetrievalBackend(backend) == RetrievalBackend.EMBEDDED:
+        return get_embedded_index(collection_name)
+    return QdrantRetriever(get_vectordb_client(), collection_name, search_params)
 
 
 def get_llm(model_name: str, temperature: float) -> ChatOpenAI:
@@ -39,68 +123,166 @@ def get_llm(model_name: str, temperature: float) -> ChatOpenAI:
     rounded_temperature = round(temperature, 3)
     cache_key = f"{model_name}:{rounded_temperature:.3f}"
     if cache_key not in _llm_cache:
-        _llm_cache[cache_key] = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            max_retries=2,
-            api_key=settings.OPENAI_API_KEY,
-        )
+        with _llm_lock:
+            if cache_key not in _llm_cache:
+                _llm_cache[cache_key] = ChatOpenAI(
+                    model=model_name,
+                    temperature=temperature,
+                    max_retries=2,
+                    api_key=settings.OPENAI_API_KEY,
+                    base_url=settings.OPENAI_BASE_URL,
+                )
     return _llm_cache[cache_key]
 
 
+def get_loaded_resources() -> list[str]:
+    """Names of the heavy resources that are already initialized in this process."""
+    resources = [f"embedding_model:{name}" for name in _embedding_model_cache]
+    resources.extend(f"llm:{key}" for key in _llm_cache)
+    resources.extend(f"embedded_index:{name}" for name in _embedded_index_cache)
+    if _vectordb_client is not None:
+        resources.append("vectordb_client")
+    return resources
+
+
 class ConfigurationRunner:
     """Runs a single experiment configuration against a question."""
 
     def __init__(self, config: ExperimentConfiguration):
         self.config = config
-        self.embedding_model = get_embedding_model(config.embedding_model)
+        self.timer = StageTimer(config.configuration_id)
+        self.embedding_model = get_embedding_model(
+            config.embedding_model, config.embedding_backend
+        )
+        self.retriever = get_retriever(
+            config.collection_name, config.retrieval_backend, config.search_params
+        )
 
     def run(self, question: str, db: Session) -> ConfigurationResponse:
         """Execute the configuration: embed, search vectordb, optionally generate summary."""
-        # 1. Search vectordb
-        references, rag_context = self._search_vectordb(question, db)
-
-        # 2. Generate summary if LLM is configured
-        summary = None
-        if self.config.llm_model:
-            summary = self._generate_summary(question, rag_context)
+        cached = answer_cache.get(self.config, question)
+
+        if cached and (cached.summary is not None or not self.config.llm_model):
+            references, summary = cached.references, cached.summary
+        else:
+            # 1. Search vectordb, unless the retrieval was precomputed
+            if cached:
+                references = cached.references
+                rag_context = self._rag_context(references)
+            else:
+                references, rag_context = self._search_vectordb(question, db)
+
+            # 2. Generate summary if LLM is configured
+            summary = None
+            if self.config.llm_model:
+                with self.timer.stage("llm_summary"):
+                    summary = self._generate_summary(question, rag_context)
+
+            answer_cache.put(self.config, question, references, summary)
 
         return ConfigurationResponse(
             configuration_id=self.config.configuration_id,
             references=references,
             summary=summary,
             configuration=self.config.model_dump(),
+            stage_timings=self.timer.timings,
         )
 
+    def run_batch(
+        self,
+        questions: list[str],
+        db: Session,
+        llm_executor: Executor,
+        generate_summaries: bool = True,
+    ) -> list[ConfigurationResponse]:
+        """Execute the configuration for many questions at once.
+
+        Questions are embedded in one batch and searched with a single batch request,
+        summaries are generated concurrently on the given executor.
+        """
+        with self.timer.stage("embed"):
+            query_embeddings = self.embedding_model.get_text_embedding_batch(questions)
+
+        with self.timer.stage("vector_search"):
+            batch_points = self.retriever.search_batch(query_embeddings, self.config.limit)
+
+        doc_ids = {p.payload["doc_id"] for points in batch_points for p in points}
+        with self.timer.stage("metadata_lookup"):
+            docs = self._fetch_documents(doc_ids, db)
+
+        searches = [self._build_references(points, docs) for points in batch_points]
+
+        summaries = [None] * len(questions)
+        if self.config.llm_model and generate_summaries:
+            with self.timer.stage("llm_summary"):
+                summaries = list(
+                    llm_executor.map(
+                        self._generate_summary,
+                        questions,
+                        [rag_context for _, rag_context in searches],
+                    )
+                )
+
+        configuration = self.config.model_dump()
+        return [
+            ConfigurationResponse(
+                configuration_id=self.config.configuration_id,
+                references=references,
+                summary=summary,
+                configuration=configuration,
+                stage_timings=self.timer.timings,
+                batch_size=len(questions),
+            )
+            for (references, _), summary in zip(searches, summaries)
+        ]
+
     def _search_vectordb(
         self, question: str, db: Session
     ) -> tuple[list[Reference], list[dict]]:
         """Embed question and search the configured collection."""
-        query_embedding = self.embedding_model.get_text_embedding(question)
+        with self.timer.stage("embed"):
+            query_embedding = self.embedding_model.get_text_embedding(question)
 
-        vectordb_results = _vectordb_client.query_points(
-            collection_name=self.config.collection_name,
-            query=query_embedding,
-            with_payload=["_node_content", "doc_id"],
-            limit=self.config.limit,
-        )
+        with self.timer.stage("vector_search"):
+            points = self.retriever.search(query_embedding, self.config.limit)
 
-        if not vectordb_results.points:
+        if not points:
             return [], []
 
         # Retrieve document metadata
-        doc_ids = list({p.payload["doc_id"] for p in vectordb_results.points})
+        doc_ids = {p.payload["doc_id"] for p in points}
+        with self.timer.stage("metadata_lookup"):
+            docs = self._fetch_documents(doc_ids, db)
+
+        return self._build_references(points, docs)
+
+    @staticmethod
+    def _fetch_documents(
+        doc_ids: Iterable[str], db: Session
+    ) -> dict[uuid.UUID, SourcedDocument]:
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return {}
+
         docs: Sequence[SourcedDocument] = db.exec(
             select(SourcedDocument).where(SourcedDocument.doc_id.in_(doc_ids))
         ).all()
+        return {d.doc_id: d for d in docs}
+
+    @staticmethod
+    def _rag_context(references: list[Reference]) -> list[dict]:
+        return [{"title": r.title, "url": r.url, "text": r.chunk} for r in references]
 
+    @staticmethod
+    def _build_references(
+        points: list, docs: dict[uuid.UUID, SourcedDocument]
+    ) -> tuple[list[Reference], list[dict]]:
         references = []
         rag_context = []
         duplicate_chunk_counter: dict[str, int] = {}
 
-        for point in vectordb_results.points:
-            point_doc_id = uuid.UUID(point.payload["doc_id"])
-            doc = next((d for d in docs if d.doc_id == point_doc_id), None)
+        for point in points:
+            doc = docs.get(uuid.UUID(point.payload["doc_id"]))
             title = doc.title if doc else "Unknown"
             url = doc.page_link if doc else "Unknown"
             doi = doc.doi if doc else "Unknown"
@@ -162,15 +344,10 @@ context: {rag_context_str}
 class ExperimentRunner:
     """Orchestrates running all configurations for an experiment in parallel."""
 
-    def run(
-        self, experiment: Experiment, question: str, db: Session
-    ) -> list[ConfigurationResponse]:
-        """Run all configurations in parallel and return randomized responses."""
+    @staticmethod
+    def _get_configurations(experiment: Experiment) -> list[ExperimentConfiguration]:
         configs = [ExperimentConfiguration(**c) for c in experiment.configurations]
 
-        if not configs:
-            return []
-
         # Validate no duplicate configuration IDs
         config_ids = [c.configuration_id for c in configs]
         if len(config_ids) != len(set(config_ids)):
@@ -179,15 +356,77 @@ class ExperimentRunner:
                 f"Experiment '{experiment.name}' has duplicate configuration_ids: {set(duplicates)}"
             )
 
+        return configs
+
+    def run(
+        self, experiment: Experiment, question: str, db: Session
+    ) -> list[ConfigurationResponse]:
+        """Run all configurations in parallel and return randomized responses."""
+        configs = self._get_configurations(experiment)
+
+        if not configs:
+            return []
+
         # Run configurations in parallel
         with ThreadPoolExecutor(max_workers=len(configs)) as executor:
             futures = []
             for config in configs:
                 runner = ConfigurationRunner(config)
-                futures.append(executor.submit(runner.run, question, db))
+                # Copy the request context so stage metrics keep their endpoint label
+                context = contextvars.copy_context()
+                futures.append(executor.submit(context.run, runner.run, question, db))
 
             responses = [f.result() for f in futures]
 
         # Randomize order before returning
         random.shuffle(responses)
         return responses
+
+    def run_batch(
+        self,
+        experiment: Experiment,
+        questions: list[str],
+        db: Session,
+        llm_executor: Executor,
+    ) -> list[list[ConfigurationResponse]]:
+        """Run all configurations for many questions, one list of randomized responses per question."""
+        configs = self._get_configurations(experiment)
+
+        responses_per_config = [
+            ConfigurationRunner(config).run_batch(questions, db, llm_executor)
+            for config in configs
+        ]
+
+        responses_per_question = [list(r) for r in zip(*responses_per_config)] or [
+            [] for _ in questions
+        ]
+        for responses in responses_per_question:
+            random.shuffle(responses)
+        return responses_per_question
+
+
+def build_query_record(
+    question: str,
+    user_id: uuid.UUID,
+    experiment: Experiment,
+    responses: list[ConfigurationResponse],
+    query_id: Optional[str] = None,
+    serialized_responses: Optional[list] = None,
+) -> Query:
+    """Query row storing the responses of every configuration for a question.
+
+    Pass `serialized_responses` from serialize_models to reuse JSON already produced
+    for the HTTP response.
+    """
+    return Query(
+        query_id=query_id or str(uuid.uuid4()),
+        question=question,
+        user_id=user_id,
+        experiment_id=experiment.experiment_id,
+        experiment_responses=serialized_responses or serialize_models(responses),
+        # Keep legacy fields populated from first response for backward compat
+        references=[ref.model_dump() for ref in responses[0].references]
+        if responses
+        else [],
+        summary=responses[0].summary if responses else None,
+    )
@@ -0,0 +1,210 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from server.db.models.experiment import Experiment
+from server.db.models.feedback import Feedback
+from server.db.models.query import Query
+from server.db.session import engine
+from sqlalchemy import and_
+from sqlmodel import Session, select
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_FETCH_SIZE = 1000
+
+# Rows per Parquet row group, each one is flushed to the client as soon as it is full
+PARQUET_ROW_GROUP_SIZE = 5000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Columns holding nested JSON, stored as JSON strings in Parquet
+_JSON_COLUMNS = ("references", "experiment_responses", "feedback")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _enrich_experiment_responses(
+    experiment_responses: Optional[list[dict]], config_map: dict[str, dict]
+) -> Optional[list[dict]]:
+    """Add the configuration details to responses stored before they were persisted."""
+    if not experiment_responses or not config_map:
+        return experiment_responses
+
+    for response in experiment_responses:
+        config_id = response.get("configuration_id")
+        if config_id in config_map and "configuration" not in response:
+            response["configuration"] = config_map[config_id]
+    return experiment_responses
+
+
+def iter_export_rows(
+    db: Session,
+    experiment_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> Iterator[dict]:
+    """Queries joined with their feedback and experiment, read through a server-side cursor."""
+    # Experiments are few, load their configurations once instead of joining them per row
+    config_maps = {
+        e.experiment_id: {c["configuration_id"]: c for c in e.configurations or []}
+        for e in db.exec(select(Experiment)).all()
+    }
+
+    statement = (
+        select(
+            Query.query_id,
+            Query.user_id,
+            Query.experiment_id,
+            Experiment.name,
+            Query.question,
+            Query.summary,
+            Query.references,
+            Query.experiment_responses,
+            Query.created_at,
+            Feedback.feedback_id,
+            Feedback.feedback_json,
+        )
+        .outerjoin(
+            Feedback,
+            and_(Feedback.query_id == Query.query_id, Feedback.user_id == Query.user_id),
+        )
+        .outerjoin(Experiment, Experiment.experiment_id == Query.experiment_id)
+        .order_by(Query.created_at)
+    )
+    if experiment_id:
+        statement = statement.where(Query.experiment_id == experiment_id)
+    if user_id:
+        statement = statement.where(Query.user_id == user_id)
+
+    result = db.exec(statement.execution_options(yield_per=EXPORT_FETCH_SIZE))
+
+    for row in result:
+        yield {
+            "query_id": str(row.query_id),
+            "user_id": str(row.user_id),
+            "experiment_id": str(row.experiment_id) if row.experiment_id else None,
+            "experiment_name": row.name,
+            "question": row.question,
+            "summary": row.summary,
+            "references": row.references,
+            "experiment_responses": _enrich_experiment_responses(
+                row.experiment_responses, config_maps.get(row.experiment_id, {})
+            ),
+            "created_at": row.created_at,
+            "feedback_id": str(row.feedback_id) if row.feedback_id else None,
+            "feedback": row.feedback_json,
+        }
+
+
+def iter_ndjson(rows: Iterable[dict], lines_per_chunk: int = 100) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=_json_default))
+        if len(lines) >= lines_per_chunk:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines.clear()
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object collecting what the Parquet writer produced since the last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def readable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_parquet(
+    rows: Iterable[dict], row_group_size: int = PARQUET_ROW_GROUP_SIZE
+) -> Iterator[bytes]:
+    """Encode rows as Parquet, yielding the bytes of each row group as soon as it is written."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs 'pyarrow' to be installed") from e
+
+    schema = pa.schema([
+        ("query_id", pa.string()),
+        ("user_id", pa.string()),
+        ("experiment_id", pa.string()),
+        ("experiment_name", pa.string()),
+        ("question", pa.string()),
+        ("summary", pa.string()),
+        ("references", pa.string()),
+        ("experiment_responses", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("feedback_id", pa.string()),
+        ("feedback", pa.string()),
+    ])
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        batch = []
+        for row in rows:
+            for column in _JSON_COLUMNS:
+                if row[column] is not None:
+                    row[column] = json.dumps(row[column], default=_json_default)
+            batch.append(row)
+
+            if len(batch) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch.clear()
+                yield sink.drain()
+
+        if batch:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+
+    yield sink.drain()
+
+
+def stream_export(
+    export_format: str,
+    experiment_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> Iterator[bytes]:
+    """Export with its own session, so it can outlive the request handler while streaming."""
+    with Session(engine) as db:
+        rows = iter_export_rows(db, experiment_id=experiment_id, user_id=user_id)
+        if export_format == "parquet":
+            yield from iter_parquet(rows)
+        else:
+            yield from iter_ndjson(rows)
@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import Request
+from server.core.metrics import histogram
+from starlette.routing import Match
+
+# Route template of the request being served, e.g. "/user_query/{query_id}"
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="")
+
+request_duration = histogram(
+    "aicacia_http_request_duration_seconds",
+    "Time spent serving HTTP requests",
+    ("endpoint", "method", "status"),
+)
+
+stage_duration = histogram(
+    "aicacia_stage_duration_seconds",
+    "Time spent per request stage (embed, vector_search, llm_summary, ...)",
+    ("stage", "endpoint", "configuration_id"),
+)
+
+
+@contextmanager
+def track_stage(stage: str, configuration_id: str = ""):
+    """Measure one stage of the current request and observe it in the stage histogram."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(
+            time.perf_counter() - started_at,
+            stage=stage,
+            endpoint=current_endpoint.get(),
+            configuration_id=configuration_id,
+        )
+
+
+class StageTimer:
+    """Tracks the stages of a single configuration run and keeps their durations."""
+
+    def __init__(self, configuration_id: str):
+        self.configuration_id = configuration_id
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started_at = time.perf_counter()
+        with track_stage(name, self.configuration_id):
+            yield
+        self.timings[name] = round(time.perf_counter() - started_at, 4)
+
+
+def _route_template(request: Request) -> str:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+async def instrument_requests(request: Request, call_next):
+    """HTTP middleware labelling metrics with the route template and timing the request."""
+    endpoint = _route_template(request)
+    token = current_endpoint.set(endpoint)
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_duration.observe(
+            time.perf_counter() - started_at,
+            endpoint=endpoint,
+            method=request.method,
+            status=str(status),
+        )
+        current_endpoint.reset(token)
@@ -0,0 +1,147 @@
+from threading import Lock
+
+# Upper bounds in seconds, from a cached lookup up to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    formatted = ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in labels.items())
+    return f"{{{formatted}}}"
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative histogram rendered in the Prometheus text exposition format.
+
+    Metrics are kept per process, so with several workers each one reports its own.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...],
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Key: label values, Value: (per-bucket counts, sum)
+        self._series: dict[tuple[str, ...], tuple[list[int], float]] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels: str):
+        label_values = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            bucket_counts, total = self._series.get(
+                label_values, ([0] * len(self.buckets), 0.0)
+            )
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_counts[i] += 1
+            self._series[label_values] = (bucket_counts, total + value)
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for label_values, (bucket_counts, total) in series:
+                labels = dict(zip(self.label_names, label_values))
+                for upper_bound, count in zip(self.buckets, bucket_counts):
+                    bucket_labels = {**labels, "le": _format_float(upper_bound)}
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_float(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {bucket_counts[-1]}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonically increasing count, per combination of label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._series: dict[tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        label_values = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for label_values, value in sorted(self._series.items()):
+                labels = dict(zip(self.label_names, label_values))
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_float(value)}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """Value that goes up and down, such as the number of queued jobs."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._value = 0.0
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def render(self) -> str:
+        with self._lock:
+            value = self._value
+        return "\n".join([
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_float(value)}",
+        ])
+
+
+_registry: list[Histogram | Counter | Gauge] = []
+
+
+def histogram(name: str, documentation: str, label_names: tuple[str, ...],
+              buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    """Create a histogram and register it for the /metrics endpoint."""
+    metric = Histogram(name, documentation, label_names, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def counter(name: str, documentation: str, label_names: tuple[str, ...]) -> Counter:
+    """Create a counter and register it for the /metrics endpoint."""
+    metric = Counter(name, documentation, label_names)
+    _registry.append(metric)
+    return metric
+
+
+def gauge(name: str, documentation: str) -> Gauge:
+    """Create a gauge and register it for the /metrics endpoint."""
+    metric = Gauge(name, documentation)
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Optional
+
+import bcrypt
+from server.core.config import settings
+from server.core.metrics import counter, gauge, histogram
+
+# bcrypt is deliberately slow, so it runs in a small pool of processes instead of the
+# request threads. This bounds the CPU a burst of logins can take, and the semaphore
+# bounds how many request threads may wait for it, leaving the rest to other endpoints.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+_slots = BoundedSemaphore(settings.PASSWORD_HASH_QUEUE_SIZE)
+
+hash_queue_depth = gauge(
+    "aicacia_password_hash_queue_depth",
+    "Password hashing jobs waiting for or running in the hashing processes",
+)
+
+hash_duration = histogram(
+    "aicacia_password_hash_duration_seconds",
+    "Time spent hashing or checking a password, including the wait for a process",
+    ("operation",),
+)
+
+hash_rejections = counter(
+    "aicacia_password_hash_rejections_total",
+    "Password hashing jobs rejected because the queue was full",
+    ("operation",),
+)
+
+
+class PasswordHashingBusyError(Exception):
+    pass
+
+
+def _init_hashing_process():
+    # Under CPU contention the request handling processes win over password hashing
+    os.nice(10)
+
+
+def _bcrypt_hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _bcrypt_check(password: bytes, hashed_password: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed_password)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver children don't inherit the models and threads of the API process
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_hashing_process,
+            )
+        return _pool
+
+
+def _run(operation: str, fn, *args):
+    if not _slots.acquire(blocking=False):
+        hash_rejections.inc(operation=operation)
+        raise PasswordHashingBusyError("Too many password operations in progress")
+
+    hash_queue_depth.inc()
+    started_at = time.perf_counter()
+    try:
+        return _get_pool().submit(fn, *args).result()
+    finally:
+        hash_duration.observe(time.perf_counter() - started_at, operation=operation)
+        hash_queue_depth.dec()
+        _slots.release()
+
+
+def hash_password(password: str) -> str:
+    hashed = _run("hash", _bcrypt_hash, password.encode("utf-8"), settings.BCRYPT_ROUNDS)
+    return hashed.decode("utf-8")
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    return _run(
+        "verify", _bcrypt_check, password.encode("utf-8"), hashed_password.encode("utf-8")
+    )
+
+
+def shutdown_password_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
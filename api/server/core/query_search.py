@@ -0,0 +1,106 @@
+import base64
+import json
+import uuid
+from decimal import Decimal
+from typing import Optional
+
+from server.db.models.query import Query
+from sqlalchemy import Numeric, cast, func, literal, or_, tuple_
+from sqlmodel import Session, select
+
+MAX_SEARCH_LIMIT = 100
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(rank: Decimal, query_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([str(rank), query_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Decimal, uuid.UUID]:
+    try:
+        rank, query_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return Decimal(rank), uuid.UUID(query_id)
+    except (ArithmeticError, ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid search cursor") from e
+
+
+def search_user_queries(
+    db: Session,
+    user_id: uuid.UUID,
+    text: str,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """Search the questions and summaries of a user's queries.
+
+    Queries match on full-text search over the question and summary, or on trigram
+    similarity with the question for misspellings and partial words. Results are ordered
+    by relevance and paginated with a (rank, query_id) keyset cursor, so later pages
+    cost the same as the first one.
+
+    Returns the matching queries and the cursor of the next page, if any.
+    """
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    ts_query = func.websearch_to_tsquery("english", text)
+
+    # Rounded numeric, so the rank stored in the cursor compares exactly in Postgres
+    rank = func.round(
+        cast(
+            func.ts_rank_cd(Query.search_vector, ts_query)
+            + func.similarity(Query.question, text),
+            Numeric,
+        ),
+        6,
+    ).label("rank")
+
+    matches = (
+        select(
+            Query.query_id,
+            Query.question,
+            Query.created_at,
+            Query.summary,
+            rank,
+        )
+        .where(Query.user_id == user_id)
+        .where(or_(Query.search_vector.op("@@")(ts_query), Query.question.op("%")(text)))
+        .subquery()
+    )
+
+    statement = select(
+        matches.c.query_id,
+        matches.c.question,
+        matches.c.created_at,
+        matches.c.summary,
+        matches.c.rank,
+    )
+    if cursor:
+        last_rank, last_query_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(matches.c.rank, matches.c.query_id)
+            < tuple_(literal(last_rank, Numeric), literal(last_query_id))
+        )
+    statement = statement.order_by(matches.c.rank.desc(), matches.c.query_id.desc())
+
+    # One extra row tells whether there is a next page
+    rows = db.exec(statement.limit(limit + 1)).all()
+
+    items = [
+        {
+            "query_id": str(row.query_id),
+            "question": row.question,
+            "created_at": row.created_at,
+            "summary": row.summary,
+            "rank": float(row.rank),
+        }
+        for row in rows[:limit]
+    ]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.rank, str(last.query_id))
+
+    return items, next_cursor
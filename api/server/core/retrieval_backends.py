@@ -0,0 +1,149 @@
+import enum
+import json
+import mmap
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy as np
+from server.core.config import settings
+from server.dtos.experiment import VectorSearchParams
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient, models
+
+# Payload fields needed to build references, the only ones fetched or exported
+SEARCH_PAYLOAD_FIELDS = ["_node_content", "doc_id"]
+
+
+class RetrievalBackend(str, enum.Enum):
+    # Search the collection on the Qdrant server
+    QDRANT = "qdrant"
+    # Brute-force search over an exported copy of the collection, in the API process
+    EMBEDDED = "embedded"
+
+
+@dataclass
+class SearchHit:
+    id: Union[int, str]
+    score: float
+    payload: dict
+
+
+def qdrant_search_params(params: Optional[VectorSearchParams]) -> "Optional[models.SearchParams]":
+    if params is None:
+        return None
+
+    from qdrant_client import models
+
+    quantization = None
+    if params.rescore is not None or params.oversampling is not None:
+        quantization = models.QuantizationSearchParams(
+            rescore=params.rescore, oversampling=params.oversampling
+        )
+    return models.SearchParams(hnsw_ef=params.hnsw_ef, exact=params.exact, quantization=quantization)
+
+
+class QdrantRetriever:
+    """Searches a collection of the Qdrant server."""
+
+    def __init__(self, client: "QdrantClient", collection_name: str,
+                 search_params: Optional[VectorSearchParams] = None):
+        self.client = client
+        self.collection_name = collection_name
+        self.search_params = qdrant_search_params(search_params)
+
+    def search(self, query_vector: list[float], limit: int) -> list:
+        return self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            with_payload=SEARCH_PAYLOAD_FIELDS,
+            limit=limit,
+            search_params=self.search_params,
+        ).points
+
+    def search_batch(self, query_vectors: list[list[float]], limit: int) -> list[list]:
+        from qdrant_client import models
+
+        results = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=v, with_payload=SEARCH_PAYLOAD_FIELDS, limit=limit, params=self.search_params
+                )
+                for v in query_vectors
+            ],
+        )
+        return [result.points for result in results]
+
+
+def embedded_index_dir(collection_name: str) -> str:
+    """Folder holding the export of a collection, as written by develop/export_embedded_index.py"""
+    return os.path.join(settings.EMBEDDED_INDEX_DIR, collection_name)
+
+
+class EmbeddedIndex:
+    """Exact nearest neighbour search over an exported collection.
+
+    The vectors are a memory-mapped float32 matrix, so the operating system page cache
+    is shared between workers, and searching is one matrix product. The cost grows with
+    the number of points, so this is meant for small collections. The payloads are
+    memory-mapped JSON lines too, only those of the hits are decoded.
+    """
+
+    def __init__(self, folder_name: str):
+        if not os.path.isdir(folder_name):
+            raise ValueError(
+                f"No embedded index found in {folder_name}, "
+                "run develop/export_embedded_index.py first"
+            )
+
+        with open(os.path.join(folder_name, "meta.json")) as f:
+            meta = json.load(f)
+        self.distance = meta["distance"]
+        if self.distance not in ("Cosine", "Dot"):
+            raise ValueError(f"Unsupported distance '{self.distance}' for an embedded index")
+
+        # Vectors of cosine collections are normalized when exported
+        self.vectors = np.load(os.path.join(folder_name, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(folder_name, "ids.json")) as f:
+            self.ids = json.load(f)
+        # Payload i is payloads[payload_offsets[i]:payload_offsets[i + 1]]
+        offsets_path = os.path.join(folder_name, "payload_offsets.npy")
+        if not os.path.isfile(offsets_path):
+            raise ValueError(f"No payload offsets in {folder_name}, re-run develop/export_embedded_index.py")
+        self.payload_offsets = np.load(offsets_path, mmap_mode="r")
+        self.payloads = b""
+        if len(self):
+            with open(os.path.join(folder_name, "payloads.jsonl"), "rb") as f:
+                self.payloads = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _prepare_queries(self, query_vectors) -> np.ndarray:
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if self.distance == "Cosine":
+            queries = queries / np.linalg.norm(queries, axis=-1, keepdims=True)
+        return queries
+
+    def _hits(self, scores: np.ndarray, limit: int) -> list[SearchHit]:
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [SearchHit(id=self.ids[i], score=float(scores[i]), payload=self._payload(i)) for i in top]
+
+    def _payload(self, i: int) -> dict:
+        return json.loads(self.payloads[self.payload_offsets[i]: self.payload_offsets[i + 1]])
+
+    def search(self, query_vector: list[float], limit: int) -> list[SearchHit]:
+        if not len(self):
+            return []
+        scores = self.vectors @ self._prepare_queries(query_vector)
+        return self._hits(scores, limit)
+
+    def search_batch(self, query_vectors: list[list[float]], limit: int) -> list[list[SearchHit]]:
+        if not len(self):
+            return [[] for _ in query_vectors]
+        scores = self._prepare_queries(query_vectors) @ self.vectors.T
+        return [self._hits(row, limit) for row in scores]
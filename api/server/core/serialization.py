@@ -0,0 +1,43 @@
+from typing import Any, Sequence
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this aren't worth compressing
+COMPRESSION_MINIMUM_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(obj: Any) -> str:
+    """JSON encoder of the database engine, keeps pre-serialized fragments as they are."""
+    return orjson.dumps(obj).decode("utf-8")
+
+
+def serialize_models(models: Sequence[BaseModel]) -> list[orjson.Fragment]:
+    """Serialize models once, to embed the same JSON in the HTTP response and in JSONB columns."""
+    return [orjson.Fragment(model.model_dump_json()) for model in models]
+
+
+def json_response(request: Request, content: Any) -> Response:
+    """JSON response encoded with orjson, compressed with brotli when the client accepts it.
+
+    Brotli is used when the 'brotli' package is installed. Other responses are left
+    to the GZipMiddleware, which also sets their Vary header.
+    """
+    body = orjson.dumps(content)
+    headers = {}
+
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if brotli is not None and "br" in accept_encoding and len(body) >= COMPRESSION_MINIMUM_SIZE:
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+        headers["Content-Encoding"] = "br"
+        headers["Vary"] = "Accept-Encoding"
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,25 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+# Seconds spent on each slow import or resource initialization, keyed by name.
+# Only the first measurement is kept, later calls hit the module/resource caches.
+_timings: dict[str, float] = {}
+_timings_lock = Lock()
+
+
+@contextmanager
+def timed(name: str):
+    """Measure the wrapped block and record it in the startup-timing report."""
+    started_at = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started_at
+    with _timings_lock:
+        if name not in _timings:
+            _timings[name] = round(elapsed, 4)
+            print(f"Startup timing: {name} took {elapsed:.2f}s")
+
+
+def get_timings() -> dict[str, float]:
+    with _timings_lock:
+        return dict(_timings)
@@ -0,0 +1,71 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from server.db.models.thread_messages import ThreadMessageFeedback, ThreadMessages
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+# Threads deleted per transaction when purging, keeps each transaction's locks short
+PURGE_BATCH_SIZE = 500
+
+
+def delete_thread(db: Session, thread_id: uuid.UUID, user_id: uuid.UUID) -> int:
+    """Delete a thread of the user with the feedback on its messages, in one transaction.
+
+    Returns the number of deleted messages, 0 if the user has no such thread.
+    """
+    thread_message_ids = select(ThreadMessages.message_id).where(
+        ThreadMessages.thread_id == thread_id, ThreadMessages.user_id == user_id
+    )
+
+    # Feedback references the messages, so it goes first
+    db.execute(
+        delete(ThreadMessageFeedback).where(
+            ThreadMessageFeedback.thread_id == thread_id,
+            ThreadMessageFeedback.message_id.in_(thread_message_ids),
+        )
+    )
+    deleted_messages = db.execute(
+        delete(ThreadMessages).where(
+            ThreadMessages.thread_id == thread_id, ThreadMessages.user_id == user_id
+        )
+    ).rowcount
+    db.commit()
+
+    return deleted_messages
+
+
+def purge_threads(
+    db: Session, older_than: datetime, user_id: Optional[uuid.UUID] = None
+) -> tuple[int, int, int]:
+    """Delete the threads whose last message is older than `older_than`, optionally of one user.
+
+    Threads are deleted in batches, each batch in its own transaction. Returns the
+    numbers of deleted threads, messages and feedback rows.
+    """
+    deleted_threads = deleted_messages = deleted_feedback = 0
+
+    while True:
+        statement = (
+            select(ThreadMessages.thread_id)
+            .group_by(ThreadMessages.thread_id)
+            .having(func.max(ThreadMessages.created_at) < older_than)
+            .limit(PURGE_BATCH_SIZE)
+        )
+        if user_id:
+            statement = statement.where(ThreadMessages.user_id == user_id)
+        thread_ids = list(db.exec(statement).all())
+        if not thread_ids:
+            break
+
+        deleted_feedback += db.execute(
+            delete(ThreadMessageFeedback).where(ThreadMessageFeedback.thread_id.in_(thread_ids))
+        ).rowcount
+        deleted_messages += db.execute(
+            delete(ThreadMessages).where(ThreadMessages.thread_id.in_(thread_ids))
+        ).rowcount
+        db.commit()
+        deleted_threads += len(thread_ids)
+
+    return deleted_threads, deleted_messages, deleted_feedback
@@ -0,0 +1,100 @@
+import enum
+import traceback
+from threading import Lock, Thread
+from typing import Optional
+
+from server.core.config import settings
+from server.core.embedding_backends import EmbeddingBackend
+from server.core.experiment_runner import (
+    get_embedded_index,
+    get_embedding_model,
+    get_llm,
+    get_vectordb_client,
+)
+from server.core.retrieval_backends import RetrievalBackend
+from server.core.startup_timing import timed
+from server.db.models.experiment import Experiment
+from server.db.session import engine
+from server.dtos.experiment import ExperimentConfiguration
+from sqlmodel import Session, select
+
+
+class WarmupStatus(str, enum.Enum):
+    DISABLED = "disabled"
+    RUNNING = "running"
+    READY = "ready"
+    FAILED = "failed"
+
+
+_status = WarmupStatus.DISABLED
+_error: Optional[str] = None
+_status_lock = Lock()
+
+
+def _set_status(status: WarmupStatus, error: Optional[str] = None):
+    global _status, _error
+    with _status_lock:
+        _status = status
+        _error = error
+
+
+def get_warmup_status() -> tuple[WarmupStatus, Optional[str]]:
+    with _status_lock:
+        return _status, _error
+
+
+def _get_active_configurations() -> list[ExperimentConfiguration]:
+    with Session(engine) as db:
+        experiment = db.exec(
+            select(Experiment).where(Experiment.is_active == True)
+        ).first()
+        if not experiment:
+            return []
+        return [ExperimentConfiguration(**c) for c in experiment.configurations]
+
+
+def load_embedding_models() -> list[tuple[str, str]]:
+    """Load the embedding models used by the active experiment and the chat agent."""
+    embedding_models = {(settings.EMBEDDING_MODEL_NAME, EmbeddingBackend.HUGGINGFACE.value)}
+    embedding_models.update(
+        (c.embedding_model, c.embedding_backend) for c in _get_active_configurations()
+    )
+
+    embedding_models = sorted(embedding_models)
+    for model_name, backend in embedding_models:
+        get_embedding_model(model_name, backend)
+    return embedding_models
+
+
+def warm_up_resources():
+    """Load every model used by the active experiment and the chat agent."""
+    for model_name, backend in load_embedding_models():
+        # The first forward pass is noticeably slower than the following ones
+        with timed(f"warmup:first_embedding:{model_name}@{backend}"):
+            get_embedding_model(model_name, backend).get_text_embedding("warmup")
+
+    get_vectordb_client()
+
+    for config in _get_active_configurations():
+        if config.retrieval_backend == RetrievalBackend.EMBEDDED:
+            get_embedded_index(config.collection_name)
+        if config.llm_model:
+            get_llm(config.llm_model, config.temperature)
+
+
+def _run_warmup():
+    try:
+        with timed("warmup:total"):
+            warm_up_resources()
+        _set_status(WarmupStatus.READY)
+    except Exception as e:
+        traceback.print_exc()
+        _set_status(WarmupStatus.FAILED, str(e))
+
+
+def start_background_warmup() -> Thread:
+    """Start warming up resources without blocking the app from serving requests."""
+    _set_status(WarmupStatus.RUNNING)
+    thread = Thread(target=_run_warmup, name="resource-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,7 +1,9 @@
 # Import all models so they are registered with SQLAlchemy metadata
 from .base import Base
 from .experiment import Experiment
+from .experiment_feedback_aggregate import ExperimentFeedbackAggregate
 from .feedback import Feedback
+from .ingest_manifest import IngestManifestEntry
 from .query import Query
 from .sourced_documents import SourcedDocument, SourceLink, UserDocument
 from .thread_messages import ThreadMessageFeedback, ThreadMessages
@@ -10,6 +12,7 @@ from .user import User
 __all__ = [
     "Base",
     "Experiment",
+    "ExperimentFeedbackAggregate",
     "User",
     "SourcedDocument",
     "SourceLink",
@@ -18,4 +21,5 @@ __all__ = [
     "ThreadMessages",
     "ThreadMessageFeedback",
     "Feedback",
+    "IngestManifestEntry",
 ]
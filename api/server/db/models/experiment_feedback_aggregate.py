@@ -0,0 +1,25 @@
+import uuid
+
+from sqlalchemy import PrimaryKeyConstraint
+from sqlmodel import Field
+
+from server.db.models.base import Base
+
+
+class ExperimentFeedbackAggregate(Base, table=True):
+    """Number of times each radio value was picked, per experiment, configuration and field.
+
+    Kept up to date incrementally when experiment feedback is saved.
+    """
+
+    __tablename__ = "experiment_feedback_aggregates"
+
+    experiment_id: uuid.UUID = Field(foreign_key="experiments.experiment_id", nullable=False)
+    configuration_id: str = Field(nullable=False)
+    field_id: str = Field(nullable=False)
+    value: int = Field(nullable=False)
+    count: int = Field(default=0, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("experiment_id", "configuration_id", "field_id", "value"),
+    )
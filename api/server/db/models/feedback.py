@@ -1,8 +1,9 @@
 import uuid
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Column
-from sqlmodel import JSON, Field, Relationship
+from sqlalchemy import Column, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Field, Relationship
 from server.db.models.base import Base
 
 if TYPE_CHECKING:
@@ -16,7 +17,17 @@ class Feedback(Base, table=True):
     query_id: uuid.UUID = Field(foreign_key="queries.query_id", nullable=False)
     user_id: uuid.UUID = Field(foreign_key="users.user_id", nullable=False)
     # TODO: Figure out a way to enforce the structure of the json field.
-    feedback_json: dict = Field(sa_column=Column(JSON))
+    feedback_json: dict = Field(sa_column=Column(JSONB))
 
     user: "User" = Relationship(back_populates="feedbacks")
     query: "Query" = Relationship(back_populates="feedbacks")
+
+    __table_args__ = (
+        # Supports key-exists (configuration_id) and containment (field_id) lookups
+        # on experiment feedback
+        Index(
+            "ix_feedbacks_configuration_feedbacks",
+            text("(feedback_json -> 'experiment_feedback' -> 'configuration_feedbacks')"),
+            postgresql_using="gin",
+        ),
+    )
@@ -0,0 +1,30 @@
+import uuid
+from typing import Any, Optional
+
+from sqlalchemy import Column, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Field
+
+from server.db.models.base import Base
+
+
+class IngestManifestEntry(Base, table=True):
+    """Inputs a data ingest stage last processed for a document, and where it put the result.
+
+    A stage skips the documents whose current inputs hash to the recorded `input_hash`.
+    """
+
+    __tablename__ = "ingest_manifest"
+
+    doc_id: uuid.UUID = Field(foreign_key="sourced_documents.doc_id", nullable=False)
+    stage: str = Field(nullable=False)
+    # Hash of `inputs` and `code_version` together
+    input_hash: str = Field(nullable=False)
+    inputs: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSONB, nullable=False))
+    code_version: str = Field(nullable=False)
+    output_location: Optional[str] = Field()
+    output_hash: Optional[str] = Field()
+
+    __table_args__ = (
+        PrimaryKeyConstraint("stage", "doc_id"),
+    )
@@ -1,8 +1,9 @@
 import uuid
 
 from typing import List, Optional, TYPE_CHECKING
-from sqlalchemy import Column
-from sqlmodel import JSON, Field, Relationship
+from sqlalchemy import Column, Computed, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlmodel import Field, Relationship
 from server.db.models.base import Base
 
 if TYPE_CHECKING:
@@ -18,11 +19,41 @@ class Query(Base, table=True):
         foreign_key="experiments.experiment_id", nullable=True
     )
     question: str
-    references: list[dict] = Field(sa_column=Column(JSON))
+    references: list[dict] = Field(sa_column=Column(JSONB))
     summary: Optional[str] = Field()
     experiment_responses: Optional[list[dict]] = Field(
-        default=None, sa_column=Column(JSON)
+        default=None, sa_column=Column(JSONB)
+    )
+    # Full-text search document over the question and the summary, maintained by Postgres
+    search_vector: Optional[str] = Field(
+        default=None,
+        sa_column=Column(
+            TSVECTOR,
+            Computed(
+                "to_tsvector('english', coalesce(question, '') || ' ' || coalesce(summary, ''))",
+                persisted=True,
+            ),
+        ),
     )
 
     user: "User" = Relationship(back_populates="queries")
     feedbacks: List["Feedback"] = Relationship(back_populates="query")
+
+    __table_args__ = (
+        Index("ix_queries_user_id_created_at", "user_id", "created_at"),
+        Index("ix_queries_search_vector", "search_vector", postgresql_using="gin"),
+        # Fuzzy matching of questions with pg_trgm
+        Index(
+            "ix_queries_question_trgm",
+            "question",
+            postgresql_using="gin",
+            postgresql_ops={"question": "gin_trgm_ops"},
+        ),
+        # Supports containment lookups such as experiment_responses @> '[{"configuration_id": "a"}]'
+        Index(
+            "ix_queries_experiment_responses",
+            "experiment_responses",
+            postgresql_using="gin",
+            postgresql_ops={"experiment_responses": "jsonb_path_ops"},
+        ),
+    )
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Any, List, Optional
 
 from server.db.models.base import Base
-from sqlalchemy import Column
+from sqlalchemy import Column, Index, text
 from sqlalchemy.dialects.postgresql import JSON, JSONB
 from sqlmodel import Field, Relationship
 
@@ -26,6 +26,18 @@ class SourcedDocument(Base, table=True):
     references: list[str] = Field(default_factory=list, sa_column=Column(JSONB))
     other_metadata: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSONB))
     is_relevant: bool = Field(default=False)
+    # Post-processing of the extracted PDF: "pending", "done" or "failed"
+    postprocess_status: str = Field(default="pending", sa_column_kwargs={"server_default": "pending"})
+    postprocess_error: Optional[str] = Field()
+    postprocessed_at: Optional[datetime] = Field()
+
+    __table_args__ = (
+        # Natural keys of the metadata ingest, and lookups of relevant articles by page
+        Index("ix_sourced_documents_page_link", "page_link"),
+        Index("ix_sourced_documents_doi", "doi"),
+        # Relevant documents left to post-process
+        Index("ix_sourced_documents_relevant_postprocess_status", "postprocess_status", postgresql_where=text("is_relevant")),
+    )
 
 
 class SourceLink(Base, table=True):
@@ -37,6 +49,8 @@ class SourceLink(Base, table=True):
     s3_location: Optional[str] = Field()
     document: "SourcedDocument" = Relationship(back_populates="source_links")
 
+    __table_args__ = (Index("ix_source_links_doc_id_link", "doc_id", "link"),)
+
 
 class UserDocument(Base, table=True):
     __tablename__ = "user_documents"
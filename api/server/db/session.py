@@ -1,4 +1,5 @@
 from server.core.config import settings
+from server.core.serialization import dumps
 from sqlmodel import Session, create_engine
 
 user = settings.POSTGRES_USER
@@ -9,7 +10,7 @@ db = settings.POSTGRES_DB
 
 database_url = f"postgresql://{user}:{password}@{host}:{port}/{db}"
 
-engine = create_engine(database_url, echo=True)
+engine = create_engine(database_url, echo=settings.SQL_ECHO, json_serializer=dumps)
 
 
 def get_db_session():
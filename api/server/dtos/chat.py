@@ -1,3 +1,4 @@
+import uuid
 from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
@@ -23,3 +24,16 @@ class ThreadSummary(BaseModel):
 
 class ThreadListResponse(BaseModel):
     threads: list[ThreadSummary]
+
+
+class ThreadPurgeRequest(BaseModel):
+    # Threads whose last message is older than this many days are deleted
+    older_than_days: int
+    # Only purge the threads of this user
+    user_id: Optional[uuid.UUID] = None
+
+
+class ThreadPurgeResponse(BaseModel):
+    deleted_threads: int
+    deleted_messages: int
+    deleted_feedback: int
@@ -6,6 +6,22 @@ from server.dtos.experiment_feedback import ExperimentFeedbackConfig
 from server.dtos.query import Reference
 
 
+class VectorSearchParams(BaseModel):
+    """Qdrant search parameters of a configuration, None keeps the collection default.
+
+    Pick them with develop/tune_search_params.py.
+    """
+
+    # Size of the HNSW candidate list, higher is slower but finds more true neighbours
+    hnsw_ef: Optional[int] = None
+    # Skip the HNSW index and compare against every vector
+    exact: bool = False
+    # Re-score the quantized candidates with the original vectors
+    rescore: Optional[bool] = None
+    # Fetch limit * oversampling quantized candidates before rescoring
+    oversampling: Optional[float] = None
+
+
 class ExperimentConfiguration(BaseModel):
     """Configuration schema that matches the JSON stored in experiments.configurations"""
 
@@ -13,7 +29,10 @@ class ExperimentConfiguration(BaseModel):
     name: str
     llm_model: Optional[str] = None  # None = no LLM, just RAG
     embedding_model: str
+    embedding_backend: str = "huggingface"  # "huggingface" | "onnx" | "onnx-int8"
     collection_name: str
+    retrieval_backend: str = "qdrant"  # "qdrant" | "embedded"
+    search_params: Optional[VectorSearchParams] = None  # Only used by the qdrant backend
     temperature: float = 0.5
     limit: int = 3
 
@@ -26,6 +45,10 @@ class ConfigurationResponse(BaseModel):
     summary: Optional[str] = None  # None if no LLM configured
     # Full configuration details (for admin view)
     configuration: Optional[dict] = None
+    # Seconds spent per stage (embed, vector_search, metadata_lookup, llm_summary)
+    stage_timings: Optional[dict[str, float]] = None
+    # Questions run together in a batch, whose stages the timings are
+    batch_size: Optional[int] = None
 
 
 class ExperimentQueryResponse(BaseModel):
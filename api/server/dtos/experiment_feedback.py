@@ -46,3 +46,19 @@ class ExperimentFeedbackPostResponse(BaseModel):
     """Response after submitting feedback"""
 
     feedback_id: str
+
+
+class FeedbackValueCount(BaseModel):
+    """How many times a radio value was picked for a configuration field"""
+
+    configuration_id: str
+    field_id: str
+    value: int
+    count: int
+
+
+class ExperimentFeedbackAggregatesResponse(BaseModel):
+    """Feedback value counts of an experiment"""
+
+    experiment_id: str
+    aggregates: list[FeedbackValueCount]
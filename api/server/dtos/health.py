@@ -0,0 +1,13 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    warmup_status: str
+    warmup_error: Optional[str] = None
+    # Heavy resources already initialized in this process
+    loaded_resources: list[str]
+    # Seconds spent per slow import or resource initialization
+    startup_timings: dict[str, float]
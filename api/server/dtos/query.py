@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Dict, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Reference(BaseModel):
@@ -33,6 +33,20 @@ class QueryListResponse(BaseModel):
     total_count: int
 
 
+class QuerySearchItem(BaseModel):
+    query_id: str
+    question: str
+    created_at: datetime
+    summary: Optional[str]
+    rank: float
+
+
+class QuerySearchResponse(BaseModel):
+    queries: list[QuerySearchItem]
+    # Pass as `cursor` to get the next page, None on the last page
+    next_cursor: Optional[str] = None
+
+
 class QueryWithFeedbackResponse(BaseModel):
     query_id: str
     question: str
@@ -41,3 +55,25 @@ class QueryWithFeedbackResponse(BaseModel):
     feedback: Optional[Dict]
     experiment_responses: Optional[list[dict]] = None
     feedback_config: Optional[Dict] = None
+
+
+class BatchQueryRequest(BaseModel):
+    # Questions to run, or replay the distinct questions of the queries table
+    questions: Optional[list[str]] = None
+    replay_all: bool = False
+    # Maximum number of historical questions to replay, capped by BATCH_QUERIES_MAX_QUESTIONS
+    limit: Optional[int] = Field(default=None, gt=0)
+
+
+class BatchQueryResponse(BaseModel):
+    experiment_id: str
+    query_ids: list[str]
+    total_count: int
+
+
+class AnswerCacheWarmupResponse(BaseModel):
+    # Frequent intents whose answers were cached
+    clusters: int
+    # Phrasings of these intents cached with their answers
+    questions: int
+    configurations: int
@@ -1,18 +1,40 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from server.controllers.chat_controller import chat_router
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from server.controllers.chat_controller import admin_chat_router, chat_router
 from server.controllers.chat_feedback_controller import chat_feedback_router
-from server.controllers.feedback_controller import feedback_router
+from server.controllers.feedback_controller import admin_feedback_router, feedback_router
+from server.controllers.health_controller import health_router
+from server.controllers.metrics_controller import metrics_router
 from server.controllers.query_controller import admin_query_router, query_router
 from server.controllers.user_controller import (
     admin_router,
     user_info_router,
     user_router,
 )
+from server.core.answer_warmup import start_answer_warmup_schedule, stop_answer_warmup_schedule
+from server.core.config import settings
+from server.core.instrumentation import instrument_requests
+from server.core.password_hashing import shutdown_password_pool
+from server.core.serialization import COMPRESSION_MINIMUM_SIZE, GZIP_COMPRESS_LEVEL
+from server.core.warmup import start_background_warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.WARMUP_ON_STARTUP:
+        start_background_warmup()
+    start_answer_warmup_schedule()
+    yield
+    stop_answer_warmup_schedule()
+    shutdown_password_pool()
 
 
 def create_app():
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
     app.add_middleware(
         CORSMiddleware,
@@ -26,6 +48,12 @@ def create_app():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=COMPRESSION_MINIMUM_SIZE,
+        compresslevel=GZIP_COMPRESS_LEVEL,
+    )
+    app.middleware("http")(instrument_requests)
 
     app.include_router(query_router, prefix="/user_query", tags=["user_query"])
     app.include_router(chat_router, prefix="/chat", tags=["chat"])
@@ -35,6 +63,10 @@ def create_app():
     app.include_router(chat_feedback_router, prefix="/chat_feedback", tags=["chat_feedback"])
     app.include_router(admin_router, prefix="/admin", tags=["admin"])
     app.include_router(admin_query_router, prefix="/admin", tags=["admin"])
+    app.include_router(admin_feedback_router, prefix="/admin", tags=["admin"])
+    app.include_router(admin_chat_router, prefix="/admin", tags=["admin"])
+    app.include_router(health_router, prefix="/health", tags=["health"])
+    app.include_router(metrics_router, tags=["metrics"])
 
     return app
 
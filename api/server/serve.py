@@ -0,0 +1,139 @@
+"""Pre-fork server: loads the embedding models once, then forks the uvicorn workers.
+
+Workers inherit the model weights from the master and share them copy-on-write,
+so memory grows by the per-request working set rather than by a full model copy
+per worker.
+
+    python -m server.serve --workers 4 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import uvicorn
+from server.core.config import settings
+from server.core.startup_timing import timed
+from server.core.warmup import load_embedding_models
+from server.db.session import engine
+
+# Don't respawn workers faster than this if they keep crashing at startup
+MIN_RESPAWN_INTERVAL_SECONDS = 1.0
+
+
+def _configure_torch_threads(workers: int):
+    """Split the CPU cores between the workers instead of letting each use all of them."""
+    try:
+        import torch
+    except ImportError:
+        return
+
+    num_threads = settings.TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // workers)
+    torch.set_num_threads(num_threads)
+
+
+def _run_worker(app, sock: socket.socket, workers: int, log_level: str):
+    # Let uvicorn install its own handlers for a graceful shutdown
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    _configure_torch_threads(workers)
+
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn_worker(app, sock: socket.socket, workers: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 0
+        try:
+            _run_worker(app, sock, workers, log_level)
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    print(f"Started worker {pid}")
+    return pid
+
+
+def serve(host: str, port: int, workers: int, log_level: str):
+    with timed("preload:app"):
+        from server.main import app
+
+    with timed("preload:embedding_models"):
+        load_embedding_models()
+
+    # Connections opened while preloading must not be shared with the workers
+    engine.dispose()
+
+    # Move everything loaded so far out of the collector's reach, so that garbage
+    # collections in the workers don't write to (and un-share) those pages.
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    print(f"Listening on http://{host}:{port} with {workers} workers")
+
+    worker_pids = {_spawn_worker(app, sock, workers, log_level) for _ in range(workers)}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    last_respawn = 0.0
+    while worker_pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        worker_pids.discard(pid)
+        if stopping:
+            continue
+
+        print(f"Worker {pid} exited with status {status}, respawning")
+        wait_time = MIN_RESPAWN_INTERVAL_SECONDS - (time.monotonic() - last_respawn)
+        if wait_time > 0:
+            time.sleep(wait_time)
+        last_respawn = time.monotonic()
+        worker_pids.add(_spawn_worker(app, sock, workers, log_level))
+
+    sock.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the API with preloaded, shared models")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if not hasattr(os, "fork"):
+        sys.exit("server.serve needs os.fork, use uvicorn directly on this platform")
+
+    args = parse_args()
+    serve(args.host, args.port, args.workers, args.log_level)
@@ -0,0 +1,57 @@
+from server.controllers.feedback_controller import save_experiment_feedback
+from server.db.models.experiment import Experiment
+from server.db.models.experiment_feedback_aggregate import ExperimentFeedbackAggregate
+from server.db.models.feedback import Feedback
+from server.db.models.query import Query
+from server.db.models.user import User
+from server.dtos.experiment_feedback import ConfigurationFeedbackEntry, ExperimentFeedbackPostRequest
+from sqlmodel import select
+
+
+def _feedback_request(query: Query, relevance: int, comment: str) -> ExperimentFeedbackPostRequest:
+    return ExperimentFeedbackPostRequest(
+        query_id=str(query.query_id),
+        feedbacks=[
+            ConfigurationFeedbackEntry(configuration_id="a", field_id="relevance", value=relevance),
+            ConfigurationFeedbackEntry(configuration_id="a", field_id="comment", value=comment),
+        ],
+    )
+
+
+def _aggregate_counts(db, experiment: Experiment) -> dict[tuple[str, str, int], int]:
+    aggregates = db.exec(
+        select(ExperimentFeedbackAggregate).where(
+            ExperimentFeedbackAggregate.experiment_id == experiment.experiment_id
+        )
+    ).all()
+    return {(a.configuration_id, a.field_id, a.value): a.count for a in aggregates}
+
+
+def test_saving_experiment_feedback_again_replaces_it(db):
+    user = User(email="feedback-test@example.com", password="x", is_verified=True, user_json={})
+    experiment = Experiment(name="feedback-test", configurations=[])
+    db.add_all([user, experiment])
+    db.flush()
+    query = Query(user_id=user.user_id, experiment_id=experiment.experiment_id, question="q", references=[])
+    db.add(query)
+    db.commit()
+
+    first_id = save_experiment_feedback(_feedback_request(query, 1, "first"), user, db).feedback_id
+    second_id = save_experiment_feedback(_feedback_request(query, 2, "second"), user, db).feedback_id
+    assert first_id == second_id
+
+    db.expire_all()
+    feedback = db.exec(select(Feedback).where(Feedback.query_id == query.query_id)).one()
+    assert feedback.feedback_json["experiment_feedback"]["configuration_feedbacks"] == {
+        "a": [
+            {"field_id": "relevance", "value": 2},
+            {"field_id": "comment", "value": "second"},
+        ]
+    }
+    assert _aggregate_counts(db, experiment) == {("a", "relevance", 1): 0, ("a", "relevance", 2): 1}
+
+    # Counts removed on the next save come from the stored feedback
+    save_experiment_feedback(_feedback_request(query, 3, "third"), user, db)
+    assert _aggregate_counts(db, experiment) == {
+        ("a", "relevance", 1): 0, ("a", "relevance", 2): 0, ("a", "relevance", 3): 1
+    }
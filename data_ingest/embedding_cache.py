@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Callable, Sequence
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+# Rows of a shard file, 32MB per shard for 1024-dimensional vectors
+SHARD_ROWS = 16384
+
+# Ids are looked up this many at a time, below sqlite's bound parameters limit
+LOOKUP_BATCH_SIZE = 500
+
+# Types the vectors can be stored as, float16 halves the size of the cache
+STORAGE_DTYPES = ('float16', 'float32')
+
+
+def model_key(model_id: str, revision: str | None, normalization: str) -> str:
+    """Models producing the same vectors for the same text share a key."""
+    return f"{model_id}|{revision or 'unknown'}|{normalization}"
+
+
+def model_revision(model: Any) -> str | None:
+    """Commit of the HuggingFace weights of a SentenceTransformer, or of a llama-index model wrapping one."""
+    model = getattr(model, '_model', model)
+    try:
+        return model[0].auto_model.config._commit_hash
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    """Embeddings on disk, keyed by model key and the sha256 of the text.
+
+    Vectors are `dtype` rows of memory-mapped shard files, indexed in a sqlite database,
+    so several processes can share a cache directory. With `max_size_bytes`, the least
+    recently used shards are evicted once the shards outgrow it.
+    """
+
+    def __init__(self, path: str, max_size_bytes: int | None = None, dtype: str = 'float16'):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported embedding cache dtype '{dtype}', expected one of {STORAGE_DTYPES}")
+
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.dtype = dtype
+        os.makedirs(os.path.join(path, 'shards'), exist_ok=True)
+
+        self._lock = Lock()
+        self._memmaps: dict[int, np.memmap] = {}
+        self._db = sqlite3.connect(
+            os.path.join(path, 'index.sqlite'), timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS shards (
+                shard_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model_key TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                dtype TEXT NOT NULL DEFAULT 'float16'
+            )
+        ''')
+        # Caches created before vectors could be stored as float32
+        if 'dtype' not in [column for _, column, *_ in self._db.execute('PRAGMA table_info(shards)')]:
+            self._db.execute("ALTER TABLE shards ADD COLUMN dtype TEXT NOT NULL DEFAULT 'float16'")
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                model_key TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                shard_id INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                PRIMARY KEY (model_key, text_hash)
+            ) WITHOUT ROWID
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS ix_entries_shard_id ON entries (shard_id)')
+
+    def _shard_file(self, shard_id: int, dtype: str) -> str:
+        return os.path.join(self.path, 'shards', f'{shard_id}.f{np.dtype(dtype).itemsize * 8}')
+
+    def _shard(self, shard_id: int, dim: int, dtype: str) -> np.memmap:
+        if shard_id not in self._memmaps:
+            self._memmaps[shard_id] = np.memmap(self._shard_file(shard_id, dtype), dtype=dtype, mode='r+', shape=(SHARD_ROWS, dim))
+        return self._memmaps[shard_id]
+
+    def get(self, key: str, texts: Sequence[str]) -> list[np.ndarray | None]:
+        """Cached float32 embeddings of the texts, None for the ones not cached."""
+        hashes = [_text_hash(text) for text in texts]
+        found: dict[bytes, tuple[int, int, int, str]] = {}
+
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+                batch = hashes[start: start + LOOKUP_BATCH_SIZE]
+                rows = self._db.execute(
+                    f'SELECT e.text_hash, e.shard_id, e.row, s.dim, s.dtype FROM entries e JOIN shards s USING (shard_id) '
+                    f'WHERE e.model_key = ? AND e.text_hash IN ({",".join("?" * len(batch))})',
+                    [key, *batch]
+                ).fetchall()
+                found.update((text_hash, (shard_id, row, dim, dtype)) for text_hash, shard_id, row, dim, dtype in rows)
+
+            embeddings = []
+            for text_hash in hashes:
+                if text_hash not in found:
+                    embeddings.append(None)
+                    continue
+                shard_id, row, dim, dtype = found[text_hash]
+                try:
+                    embeddings.append(np.array(self._shard(shard_id, dim, dtype)[row], dtype=np.float32))
+                except FileNotFoundError:
+                    # Evicted by another process since looked up
+                    embeddings.append(None)
+
+            used_shards = {shard_id for shard_id, _, _, _ in found.values()}
+            if used_shards:
+                self._db.execute(
+                    f'UPDATE shards SET last_used = ? WHERE shard_id IN ({",".join("?" * len(used_shards))})',
+                    [time.time(), *used_shards]
+                )
+
+        return embeddings
+
+    def put(self, key: str, texts: Sequence[str], embeddings: np.ndarray):
+        embeddings = np.asarray(embeddings, dtype=self.dtype)
+        dim = embeddings.shape[1]
+        hashes = [_text_hash(text) for text in texts]
+
+        with self._lock:
+            # Rows are allocated in a write transaction, so processes sharing the cache never overlap
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                written = 0
+                while written < len(hashes):
+                    shard = self._db.execute(
+                        'SELECT shard_id, rows FROM shards WHERE model_key = ? AND dim = ? AND dtype = ? AND rows < ? '
+                        'ORDER BY shard_id DESC LIMIT 1',
+                        [key, dim, self.dtype, SHARD_ROWS]
+                    ).fetchone()
+                    if shard is None:
+                        shard_id = self._db.execute(
+                            'INSERT INTO shards (model_key, dim, rows, last_used, dtype) VALUES (?, ?, 0, ?, ?)',
+                            [key, dim, time.time(), self.dtype]
+                        ).lastrowid
+                        with open(self._shard_file(shard_id, self.dtype), 'wb') as f:
+                            f.truncate(SHARD_ROWS * dim * embeddings.itemsize)
+                        first_row = 0
+                    else:
+                        shard_id, first_row = shard
+
+                    count = min(SHARD_ROWS - first_row, len(hashes) - written)
+                    vectors = self._shard(shard_id, dim, self.dtype)
+                    vectors[first_row: first_row + count] = embeddings[written: written + count]
+                    vectors.flush()
+
+                    self._db.executemany(
+                        'INSERT OR REPLACE INTO entries (model_key, text_hash, shard_id, row) VALUES (?, ?, ?, ?)',
+                        [(key, hashes[written + i], shard_id, first_row + i) for i in range(count)]
+                    )
+                    self._db.execute(
+                        'UPDATE shards SET rows = ?, last_used = ? WHERE shard_id = ?',
+                        [first_row + count, time.time(), shard_id]
+                    )
+                    written += count
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+        if self.max_size_bytes is not None:
+            self.evict(self.max_size_bytes)
+
+    def evict(self, max_size_bytes: int) -> int:
+        """Delete the least recently used shards until they take at most `max_size_bytes`.
+
+        Returns the number of deleted shards.
+        """
+        deleted = 0
+        with self._lock:
+            shards = self._db.execute('SELECT shard_id, dim, dtype FROM shards ORDER BY last_used DESC').fetchall()
+            size = 0
+            for shard_id, dim, dtype in shards:
+                size += SHARD_ROWS * dim * np.dtype(dtype).itemsize
+                if size <= max_size_bytes:
+                    continue
+
+                self._db.execute('BEGIN IMMEDIATE')
+                try:
+                    self._db.execute('DELETE FROM entries WHERE shard_id = ?', [shard_id])
+                    self._db.execute('DELETE FROM shards WHERE shard_id = ?', [shard_id])
+                    self._db.execute('COMMIT')
+                except BaseException:
+                    self._db.execute('ROLLBACK')
+                    raise
+                self._memmaps.pop(shard_id, None)
+                try:
+                    os.remove(self._shard_file(shard_id, dtype))
+                except FileNotFoundError:
+                    pass
+                deleted += 1
+
+        return deleted
+
+    def embed(self, key: str, texts: Sequence[str], embed_fn: Callable[[list[str]], Any]) -> np.ndarray:
+        """Embeddings of the texts as a float32 array, computing with `embed_fn` only the ones not cached.
+
+        Computed embeddings are returned as computed, only their cached copy is stored as `dtype`.
+        """
+        embeddings = self.get(key, texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+
+        if missing:
+            computed = np.asarray(embed_fn(missing), dtype=np.float32)
+            self.put(key, missing, computed)
+            computed_by_text = dict(zip(missing, computed))
+            embeddings = [computed_by_text[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+
+        if not embeddings:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(embeddings)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """llama-index embedding model caching the text embeddings of another one.
+
+    Query embeddings aren't cached, they are computed by the wrapped model.
+    """
+
+    _embedding_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _key: str = PrivateAttr()
+
+    def __init__(self, embedding_model: BaseEmbedding, cache: EmbeddingCache, revision: str | None = None):
+        super().__init__(model_name=embedding_model.model_name, embed_batch_size=embedding_model.embed_batch_size)
+        self._embedding_model = embedding_model
+        self._cache = cache
+        normalization = json.dumps({
+            'normalize': getattr(embedding_model, 'normalize', None),
+            'text_instruction': getattr(embedding_model, 'text_instruction', None),
+        }, sort_keys=True)
+        self._key = model_key(embedding_model.model_name, revision or model_revision(embedding_model), normalization)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self._cache.embed(self._key, texts, self._embedding_model.get_text_embedding_batch).tolist()
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return self._get_text_embedding(text)
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embedding_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return await self._embedding_model.aget_query_embedding(query)
+
+
+class CachedSentenceTransformer:
+    """SentenceTransformer whose `encode` goes through the cache, other attributes are the model's."""
+
+    # Arguments of `encode` changing the embeddings, part of the cache key
+    KEYED_ARGUMENTS = ('prompt_name', 'prompt', 'task', 'truncate_dim')
+    # Arguments changing the output format, `encode` isn't cached when given
+    UNCACHED_ARGUMENTS = ('output_value', 'precision')
+
+    def __init__(self, model: Any, cache: EmbeddingCache, model_id: str, revision: str | None = None):
+        self._model = model
+        self._cache = cache
+        self._model_id = model_id
+        self._revision = revision or model_revision(model)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool | None = None,
+               convert_to_numpy: bool = True, convert_to_tensor: bool = False,
+               normalize_embeddings: bool = False, **kwargs):
+        if any(kwargs.get(name) not in (None, 'float32', 'sentence_embedding') for name in self.UNCACHED_ARGUMENTS):
+            return self._model.encode(
+                sentences, batch_size=batch_size, show_progress_bar=show_progress_bar, convert_to_numpy=convert_to_numpy,
+                convert_to_tensor=convert_to_tensor, normalize_embeddings=normalize_embeddings, **kwargs
+            )
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        normalization = json.dumps(
+            {'normalize': normalize_embeddings, **{name: kwargs[name] for name in self.KEYED_ARGUMENTS if name in kwargs}},
+            sort_keys=True
+        )
+
+        embeddings = self._cache.embed(
+            model_key(self._model_id, self._revision, normalization), texts,
+            lambda missing: self._model.encode(
+                missing, batch_size=batch_size, show_progress_bar=show_progress_bar, convert_to_numpy=True,
+                normalize_embeddings=normalize_embeddings, **kwargs
+            )
+        )
+
+        if convert_to_tensor:
+            import torch
+            embeddings = torch.from_numpy(embeddings).to(self._model.device)
+        elif not convert_to_numpy:
+            embeddings = list(embeddings)
+
+        return embeddings[0] if single else embeddings
+
+
+def maybe_cached(model: Any, model_id: str, cache_dir: str | None, max_size_bytes: int | None = None,
+                 dtype: str = 'float16') -> Any:
+    """The SentenceTransformer `model` encoding through a cache in `cache_dir`, or `model` itself without one."""
+    if not cache_dir:
+        return model
+    return CachedSentenceTransformer(model, EmbeddingCache(cache_dir, max_size_bytes, dtype), model_id)
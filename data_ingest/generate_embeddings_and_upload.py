@@ -1,19 +1,43 @@
 import re
-import boto3
+import time
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Iterable
 
-from typing import Sequence, Any
+import boto3
+import psycopg
+from botocore.config import Config
 
+from data_ingest.embedding_cache import CachedEmbedding, EmbeddingCache
 from data_ingest.entities.postprocess_models import PostprocessResult
+from data_ingest.ingest.chunk_dedup import ChunkDeduplicator
+from data_ingest.ingest.manifest import EMBEDDING_STAGE, STAGE_CODE_VERSIONS, changed_doc_ids, forget, record, s3_etags
+from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.ingestion import IngestionPipeline
 from llama_index.vector_stores.qdrant import QdrantVectorStore
-from llama_index.core.schema import Document, BaseNode, TransformComponent
+from llama_index.core.schema import Document, BaseNode, MetadataMode
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from qdrant_client import models
 
 PARAGRAPH_SEPARATOR = "\n\n"
 BUCKET_NAME = 'aicacia-extracted-data'
 
-client = boto3.client("s3")
+EMBEDDING_MODEL_NAME = "BAAI/bge-m3"
+CHUNK_SIZE = 256
+CHUNK_OVERLAP = 40
+
+# Stage sizes of the upload pipeline: S3 downloads and Qdrant uploads wait on the network
+FETCH_WORKERS = 16
+EMBED_BATCH_SIZE = 128
+UPLOAD_WORKERS = 4
+PROGRESS_INTERVAL_SECONDS = 30
+# Canonical chunks whose back-references are updated per Qdrant request
+BACK_REFERENCE_BATCH_SIZE = 256
+
+# Tells a pipeline stage its input is exhausted
+_DONE = object()
+
+client = boto3.client("s3", config=Config(max_pool_connections=FETCH_WORKERS))
 
 
 def _is_box_header(text: str) -> bool:
@@ -52,44 +76,338 @@ def _join_paragraphs(postprocess_result: PostprocessResult) -> str:
     return PARAGRAPH_SEPARATOR.join(paragraphs)
 
 
-class S3DownloadAndTextJoining(TransformComponent):
-    def __call__(self, docs: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
-        for doc in docs:
-            response = client.get_object(Bucket=BUCKET_NAME, Key=f'wri/postprocess_output/{doc.doc_id}.json')
-            raw_bytes = response["Body"].read()
+class _PipelineState:
+    """Progress of the pipeline, shared by its stages.
+
+    A document is recorded in the ingest manifest once all its chunks are uploaded, unless
+    one of its stages failed. A duplicate chunk counts as uploaded with its canonical chunk.
+    """
+
+    def __init__(self, total_docs: int, record_doc):
+        self.total_docs = total_docs
+        self.__record_doc = record_doc
+        self.__lock = Lock()
+        self.__chunks_left: dict[str, int] = {}
+        self.__failed: set[str] = set()
+        # Whether canonical chunks were uploaded, and the duplicates waiting for them, by chunk id
+        self.__canonical_uploaded: dict[str, bool] = {}
+        self.__pending_duplicates: dict[str, list[BaseNode]] = {}
+        self.started_at = time.monotonic()
+        self.docs_fetched = self.docs_done = self.chunks_embedded = self.chunks_uploaded = self.chunks_duplicate = 0
+
+    def fetched(self):
+        with self.__lock:
+            self.docs_fetched += 1
+
+    def split(self, doc_id: str, chunks: int):
+        with self.__lock:
+            self.__chunks_left[doc_id] = chunks
+        if not chunks:
+            self.__finish(doc_id)
+
+    def duplicate(self, node: BaseNode, canonical_id: str):
+        with self.__lock:
+            self.chunks_duplicate += 1
+            uploaded = self.__canonical_uploaded.get(canonical_id)
+            if uploaded is None:
+                self.__pending_duplicates.setdefault(canonical_id, []).append(node)
+                return
+        if not uploaded:
+            self.failed([node.ref_doc_id], Exception(f"Canonical chunk {canonical_id} wasn't uploaded"))
+        self.chunks_done([node], uploaded=False)
+
+    def embedded(self, nodes: list[BaseNode]):
+        with self.__lock:
+            self.chunks_embedded += len(nodes)
+
+    def chunks_done(self, nodes: list[BaseNode], uploaded: bool = True):
+        finished = []
+        duplicates = []
+        with self.__lock:
+            if uploaded:
+                self.chunks_uploaded += len(nodes)
+            for node in nodes:
+                if node.node_id not in self.__canonical_uploaded:
+                    self.__canonical_uploaded[node.node_id] = uploaded
+                    duplicates.extend(self.__pending_duplicates.pop(node.node_id, ()))
+                self.__chunks_left[node.ref_doc_id] -= 1
+                if not self.__chunks_left[node.ref_doc_id]:
+                    finished.append(node.ref_doc_id)
+            if not uploaded:
+                self.__failed.update(node.ref_doc_id for node in duplicates)
+        for doc_id in finished:
+            self.__finish(doc_id)
+        if duplicates:
+            self.chunks_done(duplicates, uploaded=False)
+
+    def canonical_uploaded(self, chunk_id: str) -> bool:
+        with self.__lock:
+            return self.__canonical_uploaded.get(chunk_id, False)
+
+    def failed(self, doc_ids: Iterable[str], error: Exception):
+        with self.__lock:
+            self.__failed.update(doc_ids)
+        print(f"Failed {', '.join(sorted(set(doc_ids)))}: {error}")
+
+    def __finish(self, doc_id: str):
+        with self.__lock:
+            del self.__chunks_left[doc_id]
+            if doc_id in self.__failed:
+                return
+            self.__record_doc(doc_id)
+            self.docs_done += 1
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.started_at
+        return (
+            f"{self.docs_done}/{self.total_docs} documents done ({len(self.__failed)} failed), "
+            f"{self.docs_fetched} fetched, {self.chunks_duplicate} duplicate chunks, {self.chunks_embedded} chunks embedded, "
+            f"{self.chunks_uploaded} uploaded, {self.chunks_uploaded / max(elapsed, 1e-9):.1f} chunks/s"
+        )
+
+
+def __fetch_stage(doc_queue: Queue, fetched_queue: Queue, state: _PipelineState):
+    while (doc_id := doc_queue.get()) is not _DONE:
+        try:
+            response = client.get_object(Bucket=BUCKET_NAME, Key=f'wri/postprocess_output/{doc_id}.json')
+            fetched_queue.put((doc_id, response["Body"].read()))
+            state.fetched()
+        except Exception as e:
+            state.failed([doc_id], e)
+
+
+def __split_stage(fetched_queue: Queue, node_queue: Queue, splitter: SentenceSplitter,
+                  deduplicator: ChunkDeduplicator, vector_store: QdrantVectorStore,
+                  replace_chunks: bool, state: _PipelineState):
+    while (item := fetched_queue.get()) is not _DONE:
+        doc_id, raw_bytes = item
+        try:
             postprocess_result = PostprocessResult.from_json(raw_bytes.decode("utf-8"))
-            full_text = _join_paragraphs(postprocess_result)
-            doc.set_content(full_text)
+            nodes = splitter.get_nodes_from_documents([Document(doc_id=doc_id, text=_join_paragraphs(postprocess_result))])
+            if replace_chunks:
+                vector_store.delete(ref_doc_id=doc_id)
+        except Exception as e:
+            state.failed([doc_id], e)
+            continue
 
-        return docs
+        state.split(doc_id, len(nodes))
+        for node in nodes:
+            canonical_id = deduplicator.canonical(node.node_id, doc_id, node.get_content())
+            if canonical_id is not None:
+                state.duplicate(node, canonical_id)
+                continue
+            # Documents of the chunk and of its duplicates, completed once all are uploaded
+            node.metadata['doc_ids'] = [doc_id]
+            node.excluded_embed_metadata_keys = [*node.excluded_embed_metadata_keys, 'doc_ids']
+            node.excluded_llm_metadata_keys = [*node.excluded_llm_metadata_keys, 'doc_ids']
+            node_queue.put(node)
 
 
-if __name__ == '__main__':
-    paginator = client.get_paginator('list_objects_v2')
+def __embed_stage(node_queue: Queue, embedded_queue: Queue, embedding_model: BaseEmbedding, state: _PipelineState):
+    def embed(nodes: list[BaseNode]):
+        try:
+            texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+            for node, embedding in zip(nodes, embedding_model.get_text_embedding_batch(texts)):
+                node.embedding = embedding
+        except Exception as e:
+            state.failed([node.ref_doc_id for node in nodes], e)
+            state.chunks_done(nodes, uploaded=False)
+            return
+        state.embedded(nodes)
+        embedded_queue.put(nodes)
+
+    batch = []
+    while (node := node_queue.get()) is not _DONE:
+        batch.append(node)
+        if len(batch) == EMBED_BATCH_SIZE:
+            embed(batch)
+            batch = []
+    if batch:
+        embed(batch)
+
+
+def __upload_stage(embedded_queue: Queue, vector_store: QdrantVectorStore,
+                   collection_ready: Event, collection_lock: Lock, state: _PipelineState):
+    while (nodes := embedded_queue.get()) is not _DONE:
+        try:
+            if collection_ready.is_set():
+                vector_store.add(nodes)
+            else:
+                # The first upload creates the collection, only one of them may do it
+                with collection_lock:
+                    vector_store.add(nodes)
+                    collection_ready.set()
+        except Exception as e:
+            state.failed([node.ref_doc_id for node in nodes], e)
+            state.chunks_done(nodes, uploaded=False)
+            continue
+        state.chunks_done(nodes)
+
 
-    page_iterator = paginator.paginate(Bucket=BUCKET_NAME, Prefix='wri/postprocess_output')
+def __docs_sharing_chunks(vector_store: QdrantVectorStore, collection_name: str, doc_ids: list[str]) -> set[str]:
+    """The documents and those sharing canonical chunks with them, directly or not.
 
-    docs = []
+    Re-embedding a document deletes its chunks, the canonical chunks of other documents'
+    duplicates among them, so these documents are re-embedded with it.
+    """
+    found = set(doc_ids)
+    frontier = list(doc_ids)
+    while frontier:
+        batch, frontier = frontier[:BACK_REFERENCE_BATCH_SIZE], frontier[BACK_REFERENCE_BATCH_SIZE:]
+        scroll_filter = models.Filter(should=[
+            models.FieldCondition(key='doc_id', match=models.MatchAny(any=batch)),
+            models.FieldCondition(key='doc_ids', match=models.MatchAny(any=batch)),
+        ])
+        offset = None
+        while True:
+            points, offset = vector_store.client.scroll(
+                collection_name, scroll_filter=scroll_filter, limit=1000, offset=offset,
+                with_payload=['doc_id', 'doc_ids'], with_vectors=False
+            )
+            for point in points:
+                for doc_id in point.payload.get('doc_ids', [point.payload['doc_id']]):
+                    if doc_id not in found:
+                        found.add(doc_id)
+                        frontier.append(doc_id)
+            if offset is None:
+                break
+    return found
 
-    for page in page_iterator:
-        for element in page['Contents']:
-            key = element['Key']
-            doc_id = key[key.rindex('/')+1:-5]
-            docs.append(Document(doc_id=doc_id))
 
-    downloader = S3DownloadAndTextJoining()
-    splitter = SentenceSplitter(chunk_size=256, chunk_overlap=40, paragraph_separator=PARAGRAPH_SEPARATOR)
-    embedding_model = HuggingFaceEmbedding("BAAI/bge-m3")
+def __upload_back_references(vector_store: QdrantVectorStore, collection_name: str,
+                             back_references: dict[str, list[str]]):
+    """Set the documents of the uploaded canonical chunks having duplicates in other documents."""
+    chunk_ids = list(back_references)
+    for start in range(0, len(chunk_ids), BACK_REFERENCE_BATCH_SIZE):
+        vector_store.client.batch_update_points(collection_name, [
+            models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload={'doc_ids': back_references[chunk_id]}, points=[chunk_id]
+            ))
+            for chunk_id in chunk_ids[start: start + BACK_REFERENCE_BATCH_SIZE]
+        ])
+
+
+def __start_stage(count: int, target, *args) -> list[Thread]:
+    threads = [Thread(target=target, args=args, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def __close_stage(threads: list[Thread], next_queue: Queue, next_stage_count: int):
+    """Wait for a stage to finish, then tell each thread of the next stage there's nothing left."""
+    for thread in threads:
+        thread.join()
+    for _ in range(next_stage_count):
+        next_queue.put(_DONE)
+
+
+def generate_embeddings_and_upload(db_url: str, qdrant_url: str, qdrant_api_key: str,
+                                   collection_name: str = "aicacia", only_changed: bool = True,
+                                   embedding_cache_dir: str | None = None,
+                                   embedding_cache_max_size_bytes: int | None = None):
+    """Embed the post-processed documents and upload their chunks to Qdrant.
+
+    Documents stream through concurrent S3 downloads, text joining and splitting, batched
+    embedding and parallel Qdrant uploads. The stages are connected by bounded queues, so
+    a slow stage holds back the ones feeding it and memory doesn't grow with the corpus.
+
+    With `only_changed`, documents whose post-processing output, collection, embedding
+    model and chunking are those recorded in the ingest manifest are skipped. The chunks
+    of a re-embedded document replace its previous ones.
+
+    Chunks identical or nearly identical to an earlier chunk of the run aren't embedded.
+    The canonical chunk lists the documents of all its duplicates in its `doc_ids` payload.
+
+    With `embedding_cache_dir`, chunk embeddings are cached there, so chunks unchanged
+    since an earlier run, or embedded by the evaluation or KG jobs, aren't embedded again.
+    """
+    code_version = ':'.join([STAGE_CODE_VERSIONS[EMBEDDING_STAGE], EMBEDDING_MODEL_NAME, str(CHUNK_SIZE), str(CHUNK_OVERLAP)])
+    output_location = f'qdrant://{collection_name}'
+    doc_inputs = {
+        doc_id: {'postprocess_output': etag, 'collection': collection_name}
+        for doc_id, etag in s3_etags(client, BUCKET_NAME, 'wri/postprocess_output/').items()
+    }
+
+    splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, paragraph_separator=PARAGRAPH_SEPARATOR)
+    embedding_model = HuggingFaceEmbedding(EMBEDDING_MODEL_NAME, embed_batch_size=EMBED_BATCH_SIZE)
+    if embedding_cache_dir:
+        embedding_model = CachedEmbedding(embedding_model, EmbeddingCache(embedding_cache_dir, embedding_cache_max_size_bytes))
 
     vector_store = QdrantVectorStore(
-        url="<URL>",
-        collection_name="aicacia",
-        api_key='<KEY>'
+        url=qdrant_url,
+        collection_name=collection_name,
+        api_key=qdrant_api_key
     )
+    replace_chunks = vector_store.client.collection_exists(collection_name)
 
-    pipeline = IngestionPipeline(
-        transformations=[downloader, splitter, embedding_model],
-        vector_store=vector_store,
-    )
+    with psycopg.connect(db_url, autocommit=True) as conn, conn.cursor() as cursor:
+        if only_changed:
+            doc_ids = changed_doc_ids(cursor, EMBEDDING_STAGE, doc_inputs, code_version)
+            if replace_chunks and doc_ids:
+                doc_ids = [doc_id for doc_id in __docs_sharing_chunks(vector_store, collection_name, doc_ids)
+                           if doc_id in doc_inputs]
+        else:
+            doc_ids = list(doc_inputs)
+
+        print(f"Embedding {len(doc_ids)} of {len(doc_inputs)} documents...")
 
-    nodes = pipeline.run(documents=docs, show_progress=True)
+        # Documents are recorded as soon as they are uploaded, so an interrupted run resumes there
+        state = _PipelineState(
+            len(doc_ids),
+            lambda doc_id: record(cursor, EMBEDDING_STAGE, doc_id, doc_inputs[doc_id], code_version, output_location)
+        )
+
+        doc_queue = Queue(maxsize=FETCH_WORKERS * 2)
+        fetched_queue = Queue(maxsize=FETCH_WORKERS)
+        node_queue = Queue(maxsize=EMBED_BATCH_SIZE * 2)
+        embedded_queue = Queue(maxsize=UPLOAD_WORKERS * 2)
+
+        fetchers = __start_stage(FETCH_WORKERS, __fetch_stage, doc_queue, fetched_queue, state)
+        deduplicator = ChunkDeduplicator()
+        splitters = __start_stage(1, __split_stage, fetched_queue, node_queue, splitter, deduplicator,
+                                  vector_store, replace_chunks, state)
+        embedders = __start_stage(1, __embed_stage, node_queue, embedded_queue, embedding_model, state)
+        collection_ready = Event()
+        if replace_chunks:
+            collection_ready.set()
+        uploaders = __start_stage(UPLOAD_WORKERS, __upload_stage, embedded_queue, vector_store, collection_ready, Lock(), state)
+
+        stop_reporting = Event()
+
+        def report_progress():
+            while not stop_reporting.wait(PROGRESS_INTERVAL_SECONDS):
+                print(state.report())
+
+        reporter = Thread(target=report_progress, daemon=True)
+        reporter.start()
+
+        for doc_id in doc_ids:
+            doc_queue.put(doc_id)
+        for _ in fetchers:
+            doc_queue.put(_DONE)
+
+        __close_stage(fetchers, fetched_queue, len(splitters))
+        __close_stage(splitters, node_queue, len(embedders))
+        __close_stage(embedders, embedded_queue, len(uploaders))
+        for thread in uploaders:
+            thread.join()
+
+        back_references = {
+            chunk_id: doc_ids for chunk_id, doc_ids in deduplicator.back_references().items()
+            if state.canonical_uploaded(chunk_id)
+        }
+        try:
+            __upload_back_references(vector_store, collection_name, back_references)
+        except Exception as e:
+            # Their documents were recorded, forget them so the next run embeds them again
+            referencing_doc_ids = {doc_id for doc_ids in back_references.values() for doc_id in doc_ids}
+            forget(cursor, EMBEDDING_STAGE, list(referencing_doc_ids))
+            print(f"Failed to upload the back-references of {len(referencing_doc_ids)} documents: {e}")
+
+        stop_reporting.set()
+        print(state.report())
+
+
+if __name__ == '__main__':
+    generate_embeddings_and_upload("<DB_URL>", "<URL>", '<KEY>')
@@ -0,0 +1,97 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+# Words per shingle of the MinHash signatures
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+# Bands of the LSH index, chunks sharing a band of their signature are compared.
+# 8 bands of 8 rows find most pairs above a Jaccard similarity of about 0.77
+LSH_BANDS = 8
+# Estimated Jaccard similarity of the shingles from which chunks are near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.85
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_permutations = np.random.default_rng(1).integers(1, (1 << 32) - 1, size=(2, NUM_PERMUTATIONS), dtype=np.uint64)
+
+
+def normalize_chunk(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    words = normalize_chunk(text).split(' ')
+    shingles = {' '.join(words[i: i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    a, b = _permutations
+    # Products stay below 2^64, the shingle hashes and permutation parameters being below 2^32
+    permuted = ((a[:, None] * hashes[None, :] + b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+class ChunkDeduplicator:
+    """Finds the chunks identical or nearly identical to an earlier one.
+
+    Identical chunks, up to case and spacing, are found by hash. Near-duplicates are
+    found with MinHash signatures of their word shingles in an LSH index, and confirmed
+    by the similarity of the signatures. The first of a group of duplicates is the
+    canonical chunk, it keeps back-references to the documents of its duplicates.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.__by_hash: dict[bytes, str] = {}
+        self.__signatures: dict[str, np.ndarray] = {}
+        self.__buckets: dict[tuple[int, bytes], list[str]] = {}
+        self.__doc_ids: dict[str, dict[str, None]] = {}
+        self.duplicates = 0
+
+    def canonical(self, chunk_id: str, doc_id: str, text: str) -> str | None:
+        """The id of the canonical chunk `text` duplicates, None if it is the first of its kind.
+
+        Chunks that aren't duplicates become canonical chunks.
+        """
+        text_hash = hashlib.sha256(normalize_chunk(text).encode('utf-8')).digest()
+        canonical_id = self.__by_hash.get(text_hash)
+
+        signature = None
+        band_keys = []
+        if canonical_id is None:
+            signature = minhash_signature(text)
+            rows = NUM_PERMUTATIONS // LSH_BANDS
+            band_keys = [(band, signature[band * rows: (band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+            canonical_id = self.__near_duplicate(signature, band_keys)
+
+        if canonical_id is not None:
+            self.__doc_ids[canonical_id][doc_id] = None
+            self.duplicates += 1
+            return canonical_id
+
+        self.__by_hash[text_hash] = chunk_id
+        self.__signatures[chunk_id] = signature
+        for key in band_keys:
+            self.__buckets.setdefault(key, []).append(chunk_id)
+        self.__doc_ids[chunk_id] = {doc_id: None}
+        return None
+
+    def __near_duplicate(self, signature: np.ndarray, band_keys: list[tuple[int, bytes]]) -> str | None:
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        for key in band_keys:
+            for candidate_id in self.__buckets.get(key, ()):
+                if candidate_id in seen:
+                    continue
+                seen.add(candidate_id)
+                similarity = np.count_nonzero(self.__signatures[candidate_id] == signature) / NUM_PERMUTATIONS
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate_id, similarity
+        return best_id
+
+    def back_references(self) -> dict[str, list[str]]:
+        """Documents of the canonical chunks having duplicates in other documents, by canonical chunk id."""
+        return {chunk_id: list(doc_ids) for chunk_id, doc_ids in self.__doc_ids.items() if len(doc_ids) > 1}
@@ -0,0 +1,71 @@
+import hashlib
+import json
+from datetime import datetime
+
+from psycopg.types.json import Json
+
+POSTPROCESS_STAGE = 'postprocess'
+EMBEDDING_STAGE = 'embeddings'
+
+# Bump a stage's version when a change of its code changes its output, to reprocess every document
+STAGE_CODE_VERSIONS = {
+    POSTPROCESS_STAGE: '1',
+    EMBEDDING_STAGE: '2',
+}
+
+
+def input_hash(inputs: dict[str, str | None], code_version: str) -> str:
+    return hashlib.sha256(json.dumps([inputs, code_version], sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def s3_etags(s3_client, bucket_name: str, prefix: str) -> dict[str, str]:
+    """ETags of the objects directly under `prefix`, keyed by file name without extension.
+
+    One listing covers the whole prefix, instead of a request per document.
+    """
+    etags = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter='/'):
+        for element in page.get('Contents', []):
+            name = element['Key'][len(prefix):]
+            etags[name.rsplit('.', 1)[0]] = element['ETag'].strip('"')
+
+    return etags
+
+
+def changed_doc_ids(db_cursor, stage: str, doc_inputs: dict[str, dict[str, str | None]], code_version: str) -> list[str]:
+    """Documents the stage never processed, or processed with other inputs or code version."""
+    db_cursor.execute('SELECT doc_id, input_hash FROM ingest_manifest WHERE stage = %s', [stage])
+    recorded = {str(doc_id): recorded_hash for doc_id, recorded_hash in db_cursor.fetchall()}
+
+    return [
+        doc_id for doc_id, inputs in doc_inputs.items()
+        if recorded.get(doc_id) != input_hash(inputs, code_version)
+    ]
+
+
+def record(db_cursor, stage: str, doc_id: str, inputs: dict[str, str | None], code_version: str,
+           output_location: str | None, output_hash: str | None = None):
+    now = datetime.utcnow()
+    db_cursor.execute(
+        '''
+        INSERT INTO ingest_manifest
+            (created_at, updated_at, doc_id, stage, input_hash, inputs, code_version, output_location, output_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (stage, doc_id) DO UPDATE SET
+            updated_at = EXCLUDED.updated_at,
+            input_hash = EXCLUDED.input_hash,
+            inputs = EXCLUDED.inputs,
+            code_version = EXCLUDED.code_version,
+            output_location = EXCLUDED.output_location,
+            output_hash = EXCLUDED.output_hash
+        ''',
+        [now, now, doc_id, stage, input_hash(inputs, code_version), Json(inputs), code_version,
+         output_location, output_hash]
+    )
+
+
+def forget(db_cursor, stage: str, doc_ids: list[str]):
+    """Drop the records of the documents, so the stage processes them again."""
+    db_cursor.execute('DELETE FROM ingest_manifest WHERE stage = %s AND doc_id = ANY(%s::uuid[])', [stage, doc_ids])
@@ -0,0 +1,136 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Iterable
+
+from data_ingest.entities.Document import SourcedDocumentMetadata
+
+# Documents written per transaction
+METADATA_BATCH_SIZE = 1000
+
+_DOCUMENT_COLUMNS = [
+    'title', 'source_corpus', 'sourced_at', 'authors', 'doi', 'page_link', 'abstract', 'geo_location',
+    'revision_date', 'license', 'tags', '"references"', 'other_metadata'
+]
+# Filled by post-processing, metadata sources don't provide them
+_POSTPROCESSED_COLUMNS = ['"references"']
+
+
+def __natural_key(doc: SourcedDocumentMetadata) -> tuple[str, str, str] | None:
+    """Documents are identified by their page link, or by their DOI when they have no page."""
+    if doc.page_link:
+        return doc.source_corpus.value, 'page_link', doc.page_link
+    if doc.doi:
+        return doc.source_corpus.value, 'doi', doc.doi
+    return None
+
+
+def __document_row(row_no: int, doc_id: uuid.UUID, doc: SourcedDocumentMetadata) -> tuple:
+    return (
+        row_no, doc_id, doc.title, doc.source_corpus.value, doc.sourced_at, json.dumps(doc.authors), doc.doi,
+        doc.page_link, doc.abstract, doc.geo_location, doc.revision_date, doc.license, json.dumps(doc.tags),
+        json.dumps(doc.references), json.dumps(doc.other_metadata)
+    )
+
+
+def write_articles_metadata(db_cursor, docs: list[SourcedDocumentMetadata]) -> tuple[int, int]:
+    """Upsert the documents and insert their new source links, in a few set-based statements.
+
+    The documents and links are copied to temporary tables, then matched to the existing
+    documents by page link or DOI. Existing documents get the new metadata but keep their
+    id, relevance, post-processing state and the references found by post-processing.
+    Returns the numbers of inserted and updated documents.
+    """
+    # The last occurrence of a document wins, like a later write would
+    by_key: dict = {}
+    for doc in docs:
+        by_key[__natural_key(doc) or object()] = doc
+    docs = list(by_key.values())
+
+    db_cursor.execute('''
+        CREATE TEMPORARY TABLE metadata_staging (
+            row_no integer PRIMARY KEY,
+            doc_id uuid NOT NULL,
+            existing boolean NOT NULL DEFAULT false,
+            title varchar, source_corpus varchar, sourced_at timestamp, authors jsonb, doi varchar,
+            page_link varchar, abstract varchar, geo_location varchar, revision_date timestamp,
+            license varchar, tags jsonb, "references" jsonb, other_metadata jsonb
+        ) ON COMMIT DROP
+    ''')
+    db_cursor.execute('''
+        CREATE TEMPORARY TABLE source_links_staging (
+            id uuid NOT NULL, row_no integer NOT NULL, link varchar NOT NULL, type varchar NOT NULL
+        ) ON COMMIT DROP
+    ''')
+
+    with db_cursor.copy(f'COPY metadata_staging (row_no, doc_id, {", ".join(_DOCUMENT_COLUMNS)}) FROM STDIN') as copy:
+        for row_no, doc in enumerate(docs):
+            copy.write_row(__document_row(row_no, uuid.uuid4(), doc))
+    with db_cursor.copy('COPY source_links_staging (id, row_no, link, type) FROM STDIN') as copy:
+        for row_no, doc in enumerate(docs):
+            for source_link in doc.source_links:
+                copy.write_row((uuid.uuid4(), row_no, source_link.link, source_link.type))
+
+    # Separate statements, so each lookup uses its column's index
+    db_cursor.execute('''
+        UPDATE metadata_staging s SET doc_id = d.doc_id, existing = true
+        FROM sourced_documents d
+        WHERE s.page_link IS NOT NULL AND d.page_link = s.page_link AND d.source_corpus = s.source_corpus
+    ''')
+    db_cursor.execute('''
+        UPDATE metadata_staging s SET doc_id = d.doc_id, existing = true
+        FROM sourced_documents d
+        WHERE s.page_link IS NULL AND s.doi IS NOT NULL AND d.doi = s.doi AND d.source_corpus = s.source_corpus
+    ''')
+
+    now = datetime.utcnow()
+    db_cursor.execute(f'''
+        UPDATE sourced_documents d SET updated_at = %s,
+            {", ".join(f"{column} = s.{column}" for column in _DOCUMENT_COLUMNS if column not in _POSTPROCESSED_COLUMNS)}
+        FROM metadata_staging s
+        WHERE s.existing AND d.doc_id = s.doc_id
+    ''', [now])
+    updated = db_cursor.rowcount
+    db_cursor.execute(f'''
+        INSERT INTO sourced_documents (doc_id, created_at, updated_at, is_relevant, postprocess_status, {", ".join(_DOCUMENT_COLUMNS)})
+        SELECT doc_id, %s, %s, false, 'pending', {", ".join(_DOCUMENT_COLUMNS)}
+        FROM metadata_staging
+        WHERE NOT existing
+    ''', [now, now])
+    inserted = db_cursor.rowcount
+
+    # Links already known keep their id and S3 location
+    db_cursor.execute('''
+        INSERT INTO source_links (id, doc_id, link, type, created_at, updated_at)
+        SELECT DISTINCT ON (s.doc_id, l.link) l.id, s.doc_id, l.link, l.type, %s, %s
+        FROM source_links_staging l
+        JOIN metadata_staging s USING (row_no)
+        WHERE NOT EXISTS (SELECT 1 FROM source_links e WHERE e.doc_id = s.doc_id AND e.link = l.link)
+    ''', [now, now])
+
+    return inserted, updated
+
+
+def write_articles_metadata_in_batches(db_conn, docs: Iterable[SourcedDocumentMetadata],
+                                       batch_size: int = METADATA_BATCH_SIZE) -> tuple[int, int]:
+    """Write the documents in transactions of `batch_size` documents, as they are generated."""
+    inserted = updated = 0
+    batch = []
+
+    def write():
+        nonlocal inserted, updated
+        with db_conn.transaction(), db_conn.cursor() as cursor:
+            batch_inserted, batch_updated = write_articles_metadata(cursor, batch)
+        inserted += batch_inserted
+        updated += batch_updated
+        print(f"Saved {inserted + updated} documents ({inserted} new, {updated} updated)")
+        batch.clear()
+
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            write()
+    if batch:
+        write()
+
+    return inserted, updated
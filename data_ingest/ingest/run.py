@@ -1,167 +1,325 @@
 import json
+import multiprocessing
 import os
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
 from enum import Enum
 
 import boto3
+import cv2
 import psycopg
 from psycopg.types.json import Json
-from sqlmodel import Session, SQLModel, and_, create_engine, select
 
-from api.server.db.models.sourced_documents import SourcedDocument, SourceLink
-from data_ingest.entities.Document import SourcedDocumentMetadata
-from data_ingest.postprocess.page_layout_detection import detect_pages_layout
-from data_ingest.postprocess.pdf_to_images import convert
+from data_ingest.entities.postprocess_models import PostprocessResult
+from data_ingest.ingest.metadata_writer import write_articles_metadata_in_batches
+from data_ingest.ingest.manifest import (
+    POSTPROCESS_STAGE, STAGE_CODE_VERSIONS, changed_doc_ids, record, s3_etags
+)
+from data_ingest.postprocess.element_index import ElementIndex
+from data_ingest.postprocess.page_layout_detection import VERTICAL_SLICE_WIDTH, detect_pages_layout_from_bands
+from data_ingest.postprocess.pdf_to_images import render_gutter_bands, rendered_page_size
 from data_ingest.postprocess.pdla_output_reader import read_json
 from data_ingest.postprocess.postprocess_pdla_output import postprocess
-from data_ingest.sources.ser_metadata import extract_ser_metadata
-from data_ingest.sources.wri_metadata import extract_wri_metadata, stream_relevant_links
+from data_ingest.sources.wri_metadata import stream_relevant_links
 
+BUCKET_NAME = 'aicacia-extracted-data'
 
-def mark_articles_as_relevant(db_url: str):
-    engine = create_engine(db_url)
-    SQLModel.metadata.create_all(engine)
+# Relevant article links marked per UPDATE
+RELEVANT_LINKS_BATCH_SIZE = 1000
 
-    with Session(engine) as session:
-        batch = []
+POSTPROCESS_PENDING = 'pending'
+POSTPROCESS_DONE = 'done'
+POSTPROCESS_FAILED = 'failed'
 
-        for doc_link in stream_relevant_links():
-            statement = select(SourcedDocument).where(SourcedDocument.page_link == doc_link)
-            result: SourcedDocument | None = session.exec(statement).first()
+# Prefix of the temporary directories documents are downloaded to for post-processing
+POSTPROCESS_WORKSPACE_PREFIX = 'aicacia-postprocess-'
 
-            if result:
-                result.is_relevant = True
-                batch.append(result)
+# Set by __init_postprocess_worker in each worker process
+_worker_s3_client = None
 
-            if len(batch) > 10:
-                session.add_all(batch)
-                session.commit()
-                batch.clear()
 
-        if batch:
-            session.add_all(batch)
-            session.commit()
+def mark_articles_as_relevant(db_url: str):
+    marked = 0
+    with psycopg.connect(db_url, autocommit=True) as conn, conn.cursor() as cursor:
+        batch = []
+
+        def mark():
+            nonlocal marked
+            # Articles marked by previous runs are left as they are
+            cursor.execute(
+                'UPDATE sourced_documents SET is_relevant = true, updated_at = %s '
+                'WHERE page_link = ANY(%s) AND NOT is_relevant',
+                [datetime.utcnow(), batch]
+            )
+            marked += cursor.rowcount
             batch.clear()
 
-# generator is a function that yields SourcedDocumentMetadata objects
-def extract_and_save_articles_metadata(db_url: str, generator):
-    engine = create_engine(db_url)
-    SQLModel.metadata.create_all(engine)
+        for doc_link in stream_relevant_links():
+            batch.append(doc_link)
+            if len(batch) == RELEVANT_LINKS_BATCH_SIZE:
+                mark()
+        if batch:
+            mark()
 
-    with Session(engine) as session:
-        batch = []
+    print(f"Marked {marked} articles as relevant")
 
-        for doc in generator: #type: SourcedDocumentMetadata
-            db_entity = SourcedDocument(
-                title=doc.title,
-                source_corpus=doc.source_corpus.value,
-                sourced_at=doc.sourced_at,
-                source_links=[SourceLink(link=src.link, type=src.type) for src in doc.source_links],
-                authors=doc.authors,
-                doi=doc.doi,
-                page_link=doc.page_link,
-                abstract=doc.abstract,
-                geo_location=doc.geo_location,
-                revision_date=doc.revision_date,
-                license=doc.license,
-                tags=doc.tags,
-                references=doc.references,
-                other_metadata=doc.other_metadata
-            )
 
-            batch.append(db_entity)
+# generator is a function that yields SourcedDocumentMetadata objects
+def extract_and_save_articles_metadata(db_url: str, generator):
+    with psycopg.connect(db_url) as conn:
+        write_articles_metadata_in_batches(conn, generator)
 
-            if len(batch) > 10:
-                session.add_all(batch)
-                session.commit()
-                batch.clear()
 
-        if batch:
-            session.add_all(batch)
-            session.commit()
-            batch.clear()
+def __recursive_serializer(obj):
+    if isinstance(obj, Enum):
+        return obj.value
+    elif hasattr(obj, '__dict__'):
+        return {key: __recursive_serializer(value) for key, value in obj.__dict__.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [__recursive_serializer(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: __recursive_serializer(value) for key, value in obj.items()}
+    else:
+        return obj
 
-def run_post_processing(db_cursor, s3_client, doc_id: str):
-    bucket_name = 'aicacia-extracted-data'
-    source_file = './source.pdf'
-    pdla_file = './pdla.json'
-    images_dir = './images'
-
-    def recursive_serializer(obj):
-        if isinstance(obj, Enum):
-            return obj.value
-        elif hasattr(obj, '__dict__'):
-            return {key: recursive_serializer(value) for key, value in obj.__dict__.items()}
-        elif isinstance(obj, (list, tuple)):
-            return [recursive_serializer(item) for item in obj]
-        elif isinstance(obj, dict):
-            return {key: recursive_serializer(value) for key, value in obj.items()}
-        else:
-            return obj
-
-    print("Downloading source file...")
+
+def __download_inputs(s3_client, doc_id: str, source_file: str, pdla_file: str):
     with open(source_file, 'wb') as f:
-        s3_client.download_fileobj(bucket_name, f'wri/{doc_id}.pdf', f)
+        s3_client.download_fileobj(BUCKET_NAME, f'wri/{doc_id}.pdf', f)
 
-    print("Downloading pdla_output file...")
     with open(pdla_file, 'wb') as f:
-        s3_client.download_fileobj(bucket_name, f'wri/pdla_output/{doc_id}.json', f)
-
-    print("Extracting pages from source pdf...")
-    height, width = convert(source_file, images_dir)
-    print("Reading pdla_output file...")
-    extracted_elements = read_json(pdla_file, width)
-    print("Detecting pages layouts...")
-    page_layouts = detect_pages_layout(images_dir, extracted_elements)
-    print("Processing...")
-    postprocess_result = postprocess(extracted_elements, page_layouts, width, height)
+        s3_client.download_fileobj(BUCKET_NAME, f'wri/pdla_output/{doc_id}.json', f)
+
 
-    print("Saving result file in S3...")
-    json_result = json.dumps(postprocess_result, default=recursive_serializer, indent=2).encode('utf-8')
+def __document_inputs(s3_client, doc_id: str) -> dict[str, str | None]:
+    return {
+        'source_pdf': s3_client.head_object(Bucket=BUCKET_NAME, Key=f'wri/{doc_id}.pdf')['ETag'].strip('"'),
+        'pdla_json': s3_client.head_object(Bucket=BUCKET_NAME, Key=f'wri/pdla_output/{doc_id}.json')['ETag'].strip('"'),
+    }
 
-    # with open('./result.json', 'wb') as f:
-    #     f.write(json_result)
 
-    s3_client.put_object(
-        Bucket=bucket_name,
-        Key=f'wri/postprocess_output/{doc_id}.json',
+def __postprocess_document(s3_client, doc_id: str, source_file: str, pdla_file: str) -> tuple[PostprocessResult, str]:
+    """Post-process a downloaded document, save the result file in S3 and return it with its ETag."""
+    # Only the parts of the pages the layout detection looks at are rendered, in memory
+    height, width = rendered_page_size(source_file)
+    extracted_elements = ElementIndex(read_json(pdla_file, width))
+    page_bands = render_gutter_bands(source_file, VERTICAL_SLICE_WIDTH)
+    page_layouts = detect_pages_layout_from_bands(page_bands, extracted_elements)
+    postprocess_result = postprocess(extracted_elements, page_layouts, width, height)
+
+    json_result = json.dumps(postprocess_result, default=__recursive_serializer, indent=2).encode('utf-8')
+
+    response = s3_client.put_object(
+        Bucket=BUCKET_NAME,
+        Key=__postprocess_output_key(doc_id),
         Body=json_result,
         ContentType='application/json'
     )
 
-    print("Saving references in db...")
-    if postprocess_result.references:
+    return postprocess_result, response['ETag'].strip('"')
+
+
+def __postprocess_output_key(doc_id: str) -> str:
+    return f'wri/postprocess_output/{doc_id}.json'
+
+
+def __save_success(db_cursor, doc_id: str, references: list[str], inputs: dict[str, str | None], output_etag: str):
+    if references:
         db_cursor.execute(
             'UPDATE sourced_documents SET "references" = %s WHERE doc_id = %s',
-            [Json(postprocess_result.references), doc_id]
+            [Json(references), doc_id]
         )
+    db_cursor.execute(
+        'UPDATE sourced_documents SET postprocess_status = %s, postprocess_error = NULL, postprocessed_at = %s '
+        'WHERE doc_id = %s',
+        [POSTPROCESS_DONE, datetime.utcnow(), doc_id]
+    )
+    record(
+        db_cursor, POSTPROCESS_STAGE, doc_id, inputs, STAGE_CODE_VERSIONS[POSTPROCESS_STAGE],
+        f's3://{BUCKET_NAME}/{__postprocess_output_key(doc_id)}', output_etag
+    )
+
+
+def __save_failure(db_cursor, doc_id: str, error: Exception):
+    db_cursor.execute(
+        'UPDATE sourced_documents SET postprocess_status = %s, postprocess_error = %s, postprocessed_at = %s '
+        'WHERE doc_id = %s',
+        [POSTPROCESS_FAILED, f"{type(error).__name__}: {error}", datetime.utcnow(), doc_id]
+    )
+
 
-    print("Cleaning up...")
-    os.remove(source_file)
-    os.remove(pdla_file)
-    for f in os.listdir(images_dir):
-        os.remove(os.path.join(images_dir, f))
+def __relevant_doc_inputs(db_cursor, s3_client, only_changed: bool) -> dict[str, dict[str, str | None]]:
+    """Inputs of the relevant documents to post-process, all of them or those with new inputs only."""
+    db_cursor.execute('SELECT doc_id FROM sourced_documents WHERE is_relevant = TRUE')
+    relevant_doc_ids = [str(doc_id) for (doc_id, ) in db_cursor.fetchall()]
 
+    source_etags = s3_etags(s3_client, BUCKET_NAME, 'wri/')
+    pdla_etags = s3_etags(s3_client, BUCKET_NAME, 'wri/pdla_output/')
+    doc_inputs = {
+        doc_id: {'source_pdf': source_etags.get(doc_id), 'pdla_json': pdla_etags.get(doc_id)}
+        for doc_id in relevant_doc_ids
+    }
 
-def run_post_processing_for_all_relevant(db_url):
+    if only_changed:
+        changed = changed_doc_ids(db_cursor, POSTPROCESS_STAGE, doc_inputs, STAGE_CODE_VERSIONS[POSTPROCESS_STAGE])
+        print(f"{len(relevant_doc_ids) - len(changed)} of {len(relevant_doc_ids)} articles unchanged since processed")
+        doc_inputs = {doc_id: doc_inputs[doc_id] for doc_id in changed}
+
+    return doc_inputs
+
+
+def __workspace_files(doc_dir: str) -> tuple[str, str]:
+    """Source PDF and PDLA output of the document downloaded in `doc_dir`."""
+    return os.path.join(doc_dir, 'source.pdf'), os.path.join(doc_dir, 'pdla.json')
+
+
+def __download_to_workspace(s3_client, doc_id: str, workspace_dir: str) -> str:
+    doc_dir = os.path.join(workspace_dir, doc_id)
+    os.makedirs(doc_dir)
+    try:
+        __download_inputs(s3_client, doc_id, *__workspace_files(doc_dir))
+    except Exception:
+        shutil.rmtree(doc_dir, ignore_errors=True)
+        raise
+
+    return doc_dir
+
+
+def run_post_processing(db_cursor, s3_client, doc_id: str, inputs: dict[str, str | None] | None = None):
+    inputs = inputs or __document_inputs(s3_client, doc_id)
+
+    # Its own workspace, like the documents of the parallel runs
+    with tempfile.TemporaryDirectory(prefix=POSTPROCESS_WORKSPACE_PREFIX) as workspace_dir:
+        print("Downloading source and pdla_output files...")
+        doc_dir = __download_to_workspace(s3_client, doc_id, workspace_dir)
+
+        print("Processing...")
+        postprocess_result, output_etag = __postprocess_document(s3_client, doc_id, *__workspace_files(doc_dir))
+
+    print("Saving references in db...")
+    __save_success(db_cursor, doc_id, postprocess_result.references, inputs, output_etag)
+
+
+def run_post_processing_for_all_relevant(db_url, only_changed: bool = True):
     conn = psycopg.connect(db_url)
     conn.autocommit = True
 
     cursor = conn.cursor()
+    client = boto3.client("s3")
 
-    cursor.execute('SELECT doc_id FROM sourced_documents WHERE is_relevant = TRUE')
-    relevant_doc_ids = [str(doc_id) for (doc_id, ) in cursor.fetchall()]
-
-    print(f"Processing {len(relevant_doc_ids)} articles...")
+    doc_inputs = __relevant_doc_inputs(cursor, client, only_changed)
 
-    client = boto3.client("s3")
+    print(f"Processing {len(doc_inputs)} articles...")
 
-    for i, doc_id in enumerate(relevant_doc_ids):
-        print(f"Processing {doc_id} ({i+1}/{len(relevant_doc_ids)}):")
+    for i, (doc_id, inputs) in enumerate(doc_inputs.items()):
+        print(f"Processing {doc_id} ({i+1}/{len(doc_inputs)}):")
         try:
-            run_post_processing(cursor, client, doc_id)
+            run_post_processing(cursor, client, doc_id, inputs)
         except Exception as e:
             print(f"Exception occurred: {e}")
+            __save_failure(cursor, doc_id, e)
 
     cursor.close()
     conn.close()
     client.close()
+
+
+def __init_postprocess_worker():
+    global _worker_s3_client
+
+    # One process per core already, OpenCV's own threads would only oversubscribe them
+    cv2.setNumThreads(1)
+    _worker_s3_client = boto3.client("s3")
+
+
+def __postprocess_in_worker(doc_id: str, doc_dir: str) -> tuple[list[str], str]:
+    try:
+        result, output_etag = __postprocess_document(_worker_s3_client, doc_id, *__workspace_files(doc_dir))
+    finally:
+        shutil.rmtree(doc_dir, ignore_errors=True)
+
+    return result.references, output_etag
+
+
+def run_parallel_post_processing_for_all_relevant(
+    db_url,
+    workers: int | None = None,
+    prefetch: int | None = None,
+    download_threads: int = 8,
+    only_changed: bool = True
+):
+    """Post-process the relevant documents in a pool of `workers` processes (one per core by default).
+
+    Downloads run ahead of the workers in a thread pool, with at most `prefetch` documents
+    (as many as workers by default) waiting on disk. Every document gets its own directory
+    under a temporary workspace, removed once it is processed. The outcome of
+    each document is saved in sourced_documents.postprocess_status. With `only_changed`,
+    documents whose inputs are those recorded in the ingest manifest are skipped, so only
+    new or changed documents are processed and an interrupted run can be resumed.
+    """
+    workers = workers or os.cpu_count()
+    prefetch = workers if prefetch is None else prefetch
+
+    conn = psycopg.connect(db_url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    s3_client = boto3.client("s3")
+
+    doc_inputs = __relevant_doc_inputs(cursor, s3_client, only_changed)
+    total = len(doc_inputs)
+    print(f"Processing {total} articles with {workers} workers...")
+
+    pending_doc_ids = iter(doc_inputs)
+    downloads, processing = {}, {}
+    finished = failed = 0
+
+    # forkserver, as forking while download threads hold locks could deadlock the workers
+    with tempfile.TemporaryDirectory(prefix=POSTPROCESS_WORKSPACE_PREFIX) as workspace_dir, \
+            ThreadPoolExecutor(max_workers=download_threads) as downloader, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'),
+                                initializer=__init_postprocess_worker) as pool:
+
+        def fill_downloads():
+            while len(downloads) + len(processing) < workers + prefetch:
+                doc_id = next(pending_doc_ids, None)
+                if doc_id is None:
+                    return
+                downloads[downloader.submit(__download_to_workspace, s3_client, doc_id, workspace_dir)] = doc_id
+
+        fill_downloads()
+        while downloads or processing:
+            done, _ = wait([*downloads, *processing], return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future in downloads:
+                    doc_id = downloads.pop(future)
+                    try:
+                        processing[pool.submit(__postprocess_in_worker, doc_id, future.result())] = doc_id
+                        continue
+                    except Exception as e:
+                        error = e
+                else:
+                    doc_id = processing.pop(future)
+                    try:
+                        references, output_etag = future.result()
+                        __save_success(cursor, doc_id, references, doc_inputs[doc_id], output_etag)
+                        finished += 1
+                        print(f"Processed {doc_id} ({finished + failed}/{total})")
+                        continue
+                    except Exception as e:
+                        error = e
+
+                failed += 1
+                print(f"Failed {doc_id} ({finished + failed}/{total}): {error}")
+                __save_failure(cursor, doc_id, error)
+
+            fill_downloads()
+
+    print(f"Done: {finished} processed, {failed} failed")
+
+    cursor.close()
+    conn.close()
+    s3_client.close()
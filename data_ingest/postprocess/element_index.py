@@ -0,0 +1,47 @@
+from bisect import bisect_left, bisect_right
+
+from data_ingest.entities.postprocess_models import Bounds, Element
+
+
+class ElementIndex:
+    """Elements of a document grouped by page once, for the layout detection and the postprocessing.
+
+    Each page's elements are also sorted by their top edge, so a zone containment query
+    only checks the elements starting within the zone's rows.
+    """
+
+    def __init__(self, elements: list[Element]):
+        self.elements = elements
+        self._pages: dict[int, list[Element]] = {}
+        for element in elements:
+            self._pages.setdefault(element.page_num, []).append(element)
+
+        # Per page: tops in ascending order, and the matching positions in the page's list
+        self._tops: dict[int, tuple[list[int], list[int]]] = {}
+        for page_number, page_elements in self._pages.items():
+            positions = sorted(range(len(page_elements)), key=lambda i: page_elements[i].bounds.top)
+            self._tops[page_number] = ([page_elements[i].bounds.top for i in positions], positions)
+
+    def page(self, page_number: int) -> list[Element]:
+        """Elements of the page, in document order."""
+        return self._pages.get(page_number, [])
+
+    def page_bounds(self, page_number: int) -> list[Bounds]:
+        return [e.bounds for e in self.page(page_number)]
+
+    def inside(self, page_number: int, zone: Bounds, tol: int = 0) -> list[Element]:
+        """Elements of the page inside `zone` grown by `tol` on every side, in document order."""
+        page_elements = self.page(page_number)
+        if not page_elements:
+            return []
+
+        tops, positions = self._tops[page_number]
+        # Elements inside the zone start in its rows, as their top is above their bottom
+        candidates = positions[bisect_left(tops, zone.top - tol): bisect_right(tops, zone.bottom + tol)]
+
+        return [
+            page_elements[i] for i in sorted(candidates)
+            if page_elements[i].bounds.left >= zone.left - tol
+            and page_elements[i].bounds.right <= zone.right + tol
+            and page_elements[i].bounds.bottom <= zone.bottom + tol
+        ]
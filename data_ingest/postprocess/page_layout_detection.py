@@ -1,8 +1,11 @@
-import os
+from typing import Iterable
+
 import cv2
 import numpy as np
 
-from data_ingest.entities.postprocess_models import Bounds, LayoutType, Element
+from data_ingest.entities.postprocess_models import Bounds, LayoutType
+from data_ingest.postprocess.element_index import ElementIndex
+from data_ingest.postprocess.pdf_to_images import PageGutterBand
 
 VERTICAL_SLICE_WIDTH = 20
 
@@ -26,43 +29,42 @@ def __has_elements_inside(outer: Bounds, elements: list[Bounds]):
 
 def __most_frequent_colour(page_image: cv2.typing.MatLike):
     small_page_image = cv2.resize(page_image, (100, 100))
-    pixels = small_page_image.reshape(-1, 3)
-    values, counts = np.unique(pixels, axis=0, return_counts=True)
-    most_frequent_colour = values[np.argmax(counts)]
-    return most_frequent_colour
+    # Colours packed in one integer sort like the (B, G, R) rows they come from
+    packed = small_page_image.reshape(-1, 3).astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32)
+    values, counts = np.unique(packed, return_counts=True)
+    most_frequent = values[np.argmax(counts)]
+    return np.array([most_frequent >> 16, (most_frequent >> 8) & 0xFF, most_frequent & 0xFF], dtype=page_image.dtype)
 
 
-def __are_pixels_same_colour(image: cv2.typing.MatLike, colour) -> bool:
-    pixels = image.reshape(-1, 3)
-    unique_colors = np.unique(pixels, axis=0)
-    unique_count, _ = unique_colors.shape
+def __rows_different_from_colour(band: cv2.typing.MatLike, colour) -> np.ndarray:
+    """Sorted indices of the rows of `band` having a pixel of another colour, in one pass over the band."""
+    return np.flatnonzero(np.any(band != colour, axis=(1, 2)))
 
-    if unique_count > 1:
-        return False
-    elif np.all(unique_colors == colour):
-        return True
-    else:
-        return False
+
+def __has_row_between(rows: np.ndarray, top, bottom) -> bool:
+    return np.searchsorted(rows, top) < np.searchsorted(rows, bottom)
 
 
-def __first_upward_row_different_from_colour(top, bottom, left, right, image: cv2.typing.MatLike, colour, mid_row=None) -> int:
+def __first_upward_row_different_from_colour(top, bottom, different_rows: np.ndarray, mid_row=None) -> int:
     if not mid_row:
         mid_row = (bottom + top) // 2
 
-    for r in range(mid_row, top, -1):
-        if not __are_pixels_same_colour(image[r][left: right], colour):
-            return r
+    # Last different row in (top, mid_row]
+    i = np.searchsorted(different_rows, mid_row, side='right') - 1
+    if i >= 0 and different_rows[i] > top:
+        return int(different_rows[i])
 
     return 0
 
 
-def __first_downward_row_different_from_colour(top, bottom, left, right, image: cv2.typing.MatLike, colour, mid_row=None) -> int:
+def __first_downward_row_different_from_colour(top, bottom, different_rows: np.ndarray, mid_row=None) -> int:
     if not mid_row:
         mid_row = (bottom + top) // 2
 
-    for r in range(mid_row, bottom):
-        if not __are_pixels_same_colour(image[r][left: right], colour):
-            return r
+    # First different row in [mid_row, bottom)
+    i = np.searchsorted(different_rows, mid_row, side='left')
+    if i < len(different_rows) and different_rows[i] < bottom:
+        return int(different_rows[i])
 
     return bottom
 
@@ -107,8 +109,14 @@ def __first_downward_slice_row_intersecting_box(top, bottom, left, right, page_b
         return bottom
 
 
-def __detect(page_image: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[tuple[Bounds, LayoutType]]:
-    search_area = Bounds(top=0, left=0, bottom=page_image.shape[0], right=page_image.shape[1])
+def __vertical_slice_columns(width: int) -> tuple[int, int]:
+    center_x = Bounds(top=0, left=0, bottom=0, right=width).center_x()
+    return center_x - (VERTICAL_SLICE_WIDTH // 2), center_x + (VERTICAL_SLICE_WIDTH // 2)
+
+
+def __detect_zones(height: int, width: int, background_colour, vertical_slice: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[tuple[Bounds, LayoutType]]:
+    """Zones of a page of `height` x `width` pixels, given the pixels of its vertical slice."""
+    search_area = Bounds(top=0, left=0, bottom=height, right=width)
 
     # If no elements are on page, return empty list
     if not page_boxes:
@@ -117,13 +125,13 @@ def __detect(page_image: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[t
     # Set up vertical slice bounds
     y_top = min([element.top for element in page_boxes])
     y_bottom = max([element.bottom for element in page_boxes])
-    vertical_slice_left = search_area.center_x() - (VERTICAL_SLICE_WIDTH // 2)
-    vertical_slice_right = search_area.center_x() + (VERTICAL_SLICE_WIDTH // 2)
+    vertical_slice_left, vertical_slice_right = __vertical_slice_columns(width)
 
-    background_colour = __most_frequent_colour(page_image)
+    # Every check below looks up rows of the vertical slice, so they are all compared at once
+    different_rows = __rows_different_from_colour(vertical_slice, background_colour)
 
     # Check if all colours in vertical slice are the same and both columns are not empty
-    if __are_pixels_same_colour(page_image[y_top: y_bottom, vertical_slice_left: vertical_slice_right], background_colour):
+    if not __has_row_between(different_rows, y_top, y_bottom):
         page_zones = [
             (Bounds(top=y_top, left=search_area.left, bottom=y_bottom, right=vertical_slice_left), LayoutType.TWO_COLUMNS_LEFT),
             (Bounds(top=y_top, left=vertical_slice_right, bottom=y_bottom, right=search_area.right), LayoutType.TWO_COLUMNS_RIGHT)
@@ -138,12 +146,12 @@ def __detect(page_image: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[t
     mid = (y_top + y_bottom) // 2
 
     slice_upper_border = max(
-        __first_upward_row_different_from_colour(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_image, background_colour, mid_row=mid),
+        __first_upward_row_different_from_colour(y_top, y_bottom, different_rows, mid_row=mid),
         __first_upward_slice_row_intersecting_box(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_boxes, mid_row=mid)
     )
 
     slice_lower_border = min(
-        __first_downward_row_different_from_colour(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_image, background_colour, mid_row=mid),
+        __first_downward_row_different_from_colour(y_top, y_bottom, different_rows, mid_row=mid),
         __first_downward_slice_row_intersecting_box(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_boxes, mid_row=mid)
     )
 
@@ -159,12 +167,12 @@ def __detect(page_image: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[t
     mid = int(y_top + (y_bottom - y_top) * 0.25)
 
     slice_upper_border = max(
-        __first_upward_row_different_from_colour(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_image, background_colour, mid_row=mid),
+        __first_upward_row_different_from_colour(y_top, y_bottom, different_rows, mid_row=mid),
         __first_upward_slice_row_intersecting_box(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_boxes, mid_row=mid)
     )
 
     slice_lower_border = min(
-        __first_downward_row_different_from_colour(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_image, background_colour, mid_row=mid),
+        __first_downward_row_different_from_colour(y_top, y_bottom, different_rows, mid_row=mid),
         __first_downward_slice_row_intersecting_box(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_boxes, mid_row=mid)
     )
 
@@ -182,12 +190,12 @@ def __detect(page_image: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[t
     mid = int(y_top + (y_bottom - y_top) * 0.75)
 
     slice_upper_border = max(
-        __first_upward_row_different_from_colour(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_image, background_colour, mid_row=mid),
+        __first_upward_row_different_from_colour(y_top, y_bottom, different_rows, mid_row=mid),
         __first_upward_slice_row_intersecting_box(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_boxes, mid_row=mid)
     )
 
     slice_lower_border = min(
-        __first_downward_row_different_from_colour(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_image, background_colour, mid_row=mid),
+        __first_downward_row_different_from_colour(y_top, y_bottom, different_rows, mid_row=mid),
         __first_downward_slice_row_intersecting_box(y_top, y_bottom, vertical_slice_left, vertical_slice_right, page_boxes, mid_row=mid)
     )
 
@@ -205,16 +213,21 @@ def __detect(page_image: cv2.typing.MatLike, page_boxes: list[Bounds]) -> list[t
     return [(search_area, LayoutType.DEFAULT)]
 
 
-def detect_pages_layout(images_dir, all_elements: list[Element]) -> dict[int, list[tuple[Bounds, LayoutType]]]:
+def detect_pages_layout_from_bands(pages: Iterable[PageGutterBand], elements: ElementIndex) -> dict[int, list[tuple[Bounds, LayoutType]]]:
+    """Layouts of pages rendered by `pdf_to_images.render_gutter_bands` with `VERTICAL_SLICE_WIDTH`.
+
+    Only the vertical slice and a thumbnail of each page are needed, the element bounds
+    stay in full page coordinates.
+    """
     result = {}
 
-    for file_name in os.listdir(images_dir):
-        page_image = cv2.imread(f"{images_dir}/{file_name}")
-        page_number = int(file_name[file_name.find('-') + 1:-4])
-        page_boxes = [e.bounds for e in all_elements if e.page_num == page_number]
+    for page in pages:
+        if page.left != __vertical_slice_columns(page.width)[0] or page.band.shape[1] != VERTICAL_SLICE_WIDTH:
+            raise ValueError(f"Page {page.page_number} band doesn't match the vertical slice")
+
+        page_boxes = elements.page_bounds(page.page_number)
+        background_colour = __most_frequent_colour(page.thumbnail)
+        result[page.page_number] = __detect_zones(page.height, page.width, background_colour, page.band, page_boxes)
 
-        #print(f"Processing page #{page_number}...")
-        page_zones = __detect(page_image, page_boxes)
-        result[page_number] = page_zones
+    return result
 
-    return result
\ No newline at end of file
@@ -1,14 +1,71 @@
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import numpy as np
 import pymupdf
 
-def convert(input_pdf, output_dir) -> tuple[int, int]:
-    doc = pymupdf.open(input_pdf)
+DPI = 150
+
+THUMBNAIL_SIZE = 100
+
+
+@dataclass
+class PageGutterBand:
+    page_number: int
+    # Size of the whole page rendered at the same resolution
+    height: int
+    width: int
+    # Column of the page where the band starts
+    left: int
+    band: np.ndarray
+    thumbnail: np.ndarray
+    # Pixmaps whose samples `band` and `thumbnail` view, kept alive as long as the arrays
+    pixmaps: tuple[pymupdf.Pixmap, ...] = field(default=(), repr=False)
+
+
+def __pixels(pix: pymupdf.Pixmap) -> np.ndarray:
+    """The samples of `pix` as an array, without copying them. Only valid while `pix` is alive."""
+    return np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+
+def rendered_page_size(input_pdf, dpi=DPI) -> tuple[int, int]:
+    """Height and width in pixels of the last page rendered at `dpi`."""
+    with pymupdf.open(input_pdf) as doc:
+        if not doc.page_count:
+            return 0, 0
+        rect = doc[-1].rect * pymupdf.Matrix(dpi / 72, dpi / 72)
+        return rect.irect.height, rect.irect.width
+
+
+def render_gutter_bands(input_pdf, band_width: int, dpi=DPI, thumbnail_size=THUMBNAIL_SIZE) -> Iterator[PageGutterBand]:
+    """Render only the vertical band of `band_width` pixels around the center of each page at `dpi`,
+    and a thumbnail of about `thumbnail_size` pixels, which is all the layout detection looks at.
+
+    Pages are rendered one at a time, the arrays are views of the rendered pixmaps.
+    """
+    zoom = pymupdf.Matrix(dpi / 72, dpi / 72)
+
+    with pymupdf.open(input_pdf) as doc:
+        for page in doc:
+            page_rect = (page.rect * zoom).irect
+            left = page_rect.width // 2 - band_width // 2
+            clip = pymupdf.Rect(
+                page.rect.x0 + left * 72 / dpi, page.rect.y0,
+                page.rect.x0 + (left + band_width) * 72 / dpi, page.rect.y1
+            )
+            pix = page.get_pixmap(matrix=zoom, clip=clip, alpha=False)
 
-    height, width = 0, 0
+            if (pix.x - page_rect.x0, pix.width, pix.height) == (left, band_width, page_rect.height):
+                band = __pixels(pix)
+            else:
+                # Rounding moved the clip off the page's pixel grid
+                pix = page.get_pixmap(matrix=zoom, alpha=False)
+                band = __pixels(pix)[:, left: left + band_width]
 
-    for page in doc:
-        pix = page.get_pixmap(dpi=150)
-        pix.save(f"{output_dir}/page-{page.number + 1}.png")
-        height = pix.height
-        width = pix.width
+            thumbnail_zoom = thumbnail_size / max(page.rect.width, page.rect.height)
+            thumbnail_pix = page.get_pixmap(matrix=pymupdf.Matrix(thumbnail_zoom, thumbnail_zoom), alpha=False)
 
-    return height, width
\ No newline at end of file
+            yield PageGutterBand(
+                page.number + 1, page_rect.height, page_rect.width, left, band, __pixels(thumbnail_pix),
+                pixmaps=(pix, thumbnail_pix)
+            )
@@ -4,6 +4,10 @@ from data_ingest.entities.postprocess_models import (
     Bounds, LayoutType, Element, PostprocessResult,
     PostprocessPageResult, PostprocessPageZoneResult
 )
+from data_ingest.postprocess.element_index import ElementIndex
+
+# Elements sticking out of a zone by up to this many pixels still belong to it
+ZONE_TOLERANCE = 10
 
 
 def __cleanup_text(text: str) -> str:
@@ -28,8 +32,10 @@ def __find_references_title_index(all_elements: list[Element]) -> int:
         'REFERENCES'
     ]
 
+    section_headers = [e for e in all_elements if __is_section_header(e)]
+
     for possible_title in possible_titles:
-        matches = [e for e in all_elements if __is_section_header(e) and e.text.upper() == possible_title]
+        matches = [e for e in section_headers if e.text.upper() == possible_title]
         if len(matches) == 1:
             return matches[0].index
 
@@ -102,15 +108,6 @@ def __is_junk(element: Element) -> bool:
         return False
 
 
-def __is_inside(inner: Bounds, outer: Bounds, tol=10) -> bool:
-    return (
-        inner.left      >= outer.left   - tol and
-        inner.right     <= outer.right  + tol and
-        inner.top       >= outer.top    - tol and
-        inner.bottom    <= outer.bottom + tol
-    )
-
-
 def __filter_out_junk_elements(elements: list[Element]) -> list[Element]:
     return [
         e for e in elements
@@ -189,24 +186,23 @@ def __postprocess_ref_section(elements: list[Element], ref_start=-1) -> tuple[li
         return refs, False
 
 
-def postprocess(all_elements: list[Element], page_layouts: dict[int, list[tuple[Bounds, LayoutType]]], width, height) -> PostprocessResult:
+def postprocess(elements: ElementIndex, page_layouts: dict[int, list[tuple[Bounds, LayoutType]]], width, height) -> PostprocessResult:
     result = PostprocessResult([], [])
 
     in_ref_section = False
     stop = False
-    ref_title_index = __find_references_title_index(all_elements)
+    ref_title_index = __find_references_title_index(elements.elements)
 
     for page_number in range(1, len(page_layouts) + 1):
         if stop: break
 
         page_layout = page_layouts[page_number]
-        page_elements = [e for e in all_elements if e.page_num == page_number]
         page_result = PostprocessPageResult(page_number, [])
 
         for zone_box, zone_type in page_layout:
             if stop: break
 
-            zone_elements = [e for e in page_elements if __is_inside(e.bounds, zone_box)]
+            zone_elements = elements.inside(page_number, zone_box, tol=ZONE_TOLERANCE)
 
             if in_ref_section:
                 refs, is_ref_section_ended = __postprocess_ref_section(zone_elements)
@@ -32,6 +32,8 @@ class KGConfig:
     max_nodes: Optional[int] = None
     # Embedding Configuration
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Directory of the embedding cache shared with the ingest and evaluation, None to not cache
+    embedding_cache_dir: Optional[str] = None
     
     # Relationship Building Configuration
     cosine_threshold: float = 0.7
@@ -233,6 +235,12 @@ class KG_fromS3:
             embedding_model = HuggingFaceEmbeddings(
                 model=self.config.embedding_model
             )
+            if self.config.embedding_cache_dir:
+                # Requires the repository root on the Python path
+                from data_ingest.embedding_cache import maybe_cached
+                embedding_model.model = maybe_cached(
+                    embedding_model.model, self.config.embedding_model, self.config.embedding_cache_dir
+                )
             emb_extractor = EmbeddingExtractor(
                 embedding_model=embedding_model,
                 property_name="embedding",
@@ -45,6 +45,8 @@ class EvaluationConfig:
     # Performance configuration
     show_progress: bool = True
     log_level: str = "INFO"
+    # Directory of the embedding cache shared with the ingest, None to not cache
+    embedding_cache_dir: Optional[str] = None
     
     @classmethod
     def from_yaml(cls, config_path: str) -> 'EvaluationConfig':
@@ -135,7 +137,8 @@ class EvaluationConfig:
             generate_plots=output_config.get('generate_plots', True),
             generate_report=output_config.get('generate_report', True),
             show_progress=performance_config.get('show_progress', True),
-            log_level=performance_config.get('log_level', 'INFO')
+            log_level=performance_config.get('log_level', 'INFO'),
+            embedding_cache_dir=performance_config.get('embedding_cache_dir')
         )
     
     def to_yaml(self, output_path: str):
@@ -206,7 +209,8 @@ class EvaluationConfig:
             },
             'performance': {
                 'show_progress': self.show_progress,
-                'log_level': self.log_level
+                'log_level': self.log_level,
+                'embedding_cache_dir': self.embedding_cache_dir
             }
         }
         
@@ -39,7 +39,8 @@ class BaseEvaluator(ABC):
         relevant_docs: Dict[str, Set[str]],
         method_name: str,
         k_values: List[int] = [1, 3, 5, 10, 20],
-        show_progress: bool = True
+        show_progress: bool = True,
+        embedding_cache_dir: Optional[str] = None
     ):
         """
         Initialize the base evaluator.
@@ -51,6 +52,7 @@ class BaseEvaluator(ABC):
             method_name: Name of the retrieval method
             k_values: List of k values for evaluation metrics
             show_progress: Whether to show progress bars
+            embedding_cache_dir: Directory of the embedding cache shared with the ingest, None to not cache
         """
         self.queries = queries
         self.corpus = corpus
@@ -58,6 +60,7 @@ class BaseEvaluator(ABC):
         self.method_name = method_name
         self.k_values = k_values
         self.show_progress = show_progress
+        self.embedding_cache_dir = embedding_cache_dir
         
         # Performance tracking
         self.start_time = None
@@ -65,6 +68,14 @@ class BaseEvaluator(ABC):
         
         logger.info(f"Initialized {method_name} evaluator with {len(queries)} queries and {len(corpus)} documents")
     
+    def maybe_cached(self, model: Any, model_id: str) -> Any:
+        """The SentenceTransformer `model`, encoding through the embedding cache when one is configured."""
+        if not self.embedding_cache_dir:
+            return model
+        # Requires the repository root on the Python path
+        from data_ingest.embedding_cache import maybe_cached
+        return maybe_cached(model, model_id, self.embedding_cache_dir)
+    
     def _start_profiling(self):
         """Start performance profiling."""
         self.start_time = time.time()
@@ -104,7 +104,8 @@ class ComprehensiveEvaluator:
             device=model_config.device,
             batch_size=model_config.batch_size,
             k_values=self.config.k_values,
-            show_progress=self.config.show_progress
+            show_progress=self.config.show_progress,
+            embedding_cache_dir=self.config.embedding_cache_dir
         )
     
     def _create_sparse_evaluator(self, model_config) -> Any:
@@ -49,7 +49,9 @@ class BGEM3Evaluator(BaseEvaluator):
         
         # Initialize model
         logger.info(f"Loading BGE-M3 model: {model_id}")
-        self.model = SentenceTransformer(model_id, trust_remote_code=trust_remote_code, device=device)
+        self.model = self.maybe_cached(
+            SentenceTransformer(model_id, trust_remote_code=trust_remote_code, device=device), model_id
+        )
         
         # Pre-compute document embeddings
         logger.info("Computing document embeddings...")
@@ -53,7 +53,9 @@ class CustomDenseEvaluator(BaseEvaluator):
         
         # Initialize model
         logger.info(f"Loading custom model: {model_id}")
-        self.model = SentenceTransformer(model_id, trust_remote_code=trust_remote_code, device=device)
+        self.model = self.maybe_cached(
+            SentenceTransformer(model_id, trust_remote_code=trust_remote_code, device=device), model_id
+        )
         
         # Pre-compute document embeddings
         logger.info("Computing document embeddings...")
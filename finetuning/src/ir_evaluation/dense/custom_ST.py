@@ -54,7 +54,9 @@ class STDenseEvaluator(BaseEvaluator):
         
         # Initialize model
         logger.info(f"Loading custom model: {model_id}")
-        self.model = SentenceTransformer(model_id, trust_remote_code=trust_remote_code, device=device)
+        self.model = self.maybe_cached(
+            SentenceTransformer(model_id, trust_remote_code=trust_remote_code, device=device), model_id
+        )
         
         # Pre-compute document and query embeddings
         logger.info("Computing document and query embeddings...")
@@ -90,10 +90,18 @@ def create_embedding_class(config):
     params = embedding_config[embedding_class]
 
     try:
-        return globals()[embedding_class](**params)
+        embed_model = globals()[embedding_class](**params)
     except:
         raise ValueError(f"Unsupported embedding class: {embedding_class}")
 
+    cache_config = config.get('embedding-cache')
+    if cache_config:
+        from data_ingest.embedding_cache import CachedEmbedding, EmbeddingCache
+        embed_model = CachedEmbedding(embed_model, EmbeddingCache(
+            cache_config['path'], cache_config.get('max_size_bytes'), cache_config.get('dtype', 'float16')
+        ))
+    return embed_model
+
 
 def create_file_extractor(config):
     file_extractor_config = config.get('file_extractor', {})